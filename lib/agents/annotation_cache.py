@@ -0,0 +1,196 @@
+"""On-disk cache of gnomAD, ClinVar and VEP lookup results.
+
+The same gene is curated across many papers, so the same variants are
+annotated over and over. Each lookup's annotation fields are stored under its
+source and a key built from the normalized identifiers it queried with (see
+``lookup_key``), and reused until the source's TTL expires. A lookup that
+found nothing is cached too, as an empty entry with the shorter
+``ANNOTATION_CACHE_NEGATIVE_TTL_DAYS``; failed requests are never cached.
+
+The store is a SQLite file shared by every process on the host; each process
+keeps one connection to it. Its calls block, so async callers run them in a
+thread. Entries are dropped manually with ``lib.bin.invalidate_annotation_cache``.
+"""
+
+import contextlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from lib.core.environment import env
+
+logger = logging.getLogger(__name__)
+
+GNOMAD = 'gnomad'
+CLINVAR = 'clinvar'
+VEP = 'vep'
+SOURCES = (GNOMAD, CLINVAR, VEP)
+
+DAY_S = 24 * 60 * 60
+# How long to wait for another process's write lock: short, since a busy cache
+# only costs a miss.
+BUSY_TIMEOUT_S = 1.0
+
+_RSID = re.compile(r'rs\d+', re.IGNORECASE)
+_CAID = re.compile(r'CA\d+', re.IGNORECASE)
+_GNOMAD_COORDINATES = re.compile(
+    r'(?:chr)?[0-9XYM]{1,2}-\d+-[ACGTN]+-[ACGTN]+', re.IGNORECASE
+)
+
+
+def normalize_identifier(identifier: str) -> str:
+    """Canonical spelling of a variant identifier or gene symbol.
+
+    rsIDs are lower-cased, CAids and gnomAD-style coordinates upper-cased
+    (coordinates without a ``chr`` prefix); HGVS is case-sensitive and only
+    stripped.
+    """
+    identifier = identifier.strip()
+    if _RSID.fullmatch(identifier):
+        return identifier.lower()
+    if _CAID.fullmatch(identifier):
+        return identifier.upper()
+    if _GNOMAD_COORDINATES.fullmatch(identifier):
+        identifier = identifier.upper()
+        return identifier.removeprefix('CHR')
+    return identifier
+
+
+def lookup_key(*identifiers: str | None) -> str:
+    """Cache key for a lookup: its normalized identifiers joined by ``|``."""
+    return '|'.join(normalize_identifier(i) for i in identifiers if i)
+
+
+class AnnotationCache:
+    """SQLite store of lookup results by source and key, expiring by TTL.
+
+    Lookups and writes never raise: a broken cache file degrades to misses.
+    """
+
+    def __init__(
+        self, path: Path, ttl_s: dict[str, float], negative_ttl_s: float
+    ) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """The process's connection, opened (and the table created) on first
+        use, inside a transaction; one caller at a time."""
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(
+                    self.path, timeout=BUSY_TIMEOUT_S, check_same_thread=False
+                )
+                try:
+                    with conn:
+                        conn.execute(
+                            'CREATE TABLE IF NOT EXISTS annotations ('
+                            'source TEXT NOT NULL, key TEXT NOT NULL, '
+                            'fields TEXT NOT NULL, found INTEGER NOT NULL, '
+                            'stored_at REAL NOT NULL, PRIMARY KEY (source, key))'
+                        )
+                except sqlite3.Error:
+                    conn.close()
+                    raise
+                self._conn = conn
+            with self._conn:
+                yield self._conn
+
+    def _expires_at(self, source: str, found: bool, stored_at: float) -> float:
+        ttl = self.ttl_s[source] if found else self.negative_ttl_s
+        return stored_at + ttl
+
+    def get(self, source: str, key: str) -> dict[str, Any] | None:
+        """Cached annotation fields, ``{}`` for a cached not-found, or ``None``."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT fields, found, stored_at FROM annotations '
+                    'WHERE source = ? AND key = ?',
+                    (source, key),
+                ).fetchone()
+        except sqlite3.Error:
+            logger.warning('Annotation cache lookup failed', exc_info=True)
+            return None
+        if row is None:
+            return None
+        fields, found, stored_at = row
+        if time.time() >= self._expires_at(source, bool(found), stored_at):
+            return None
+        return dict(json.loads(fields))
+
+    def put(self, source: str, key: str, fields: dict[str, Any]) -> None:
+        """Store a lookup's annotation fields; empty ``fields`` means not found."""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO annotations '
+                    '(source, key, fields, found, stored_at) VALUES (?, ?, ?, ?, ?)',
+                    (source, key, json.dumps(fields), bool(fields), time.time()),
+                )
+        except sqlite3.Error:
+            logger.warning('Annotation cache write failed', exc_info=True)
+
+    def invalidate(
+        self,
+        source: str | None = None,
+        identifier: str | None = None,
+        not_found_only: bool = False,
+    ) -> int:
+        """Delete matching entries, returning how many were deleted.
+
+        Args:
+            source: Only this source's entries
+            identifier: Only entries whose key includes this identifier
+            not_found_only: Only cached not-found results
+        """
+        clauses: list[str] = []
+        params: list[Any] = []
+        if source is not None:
+            clauses.append('source = ?')
+            params.append(source)
+        if identifier is not None:
+            clauses.append("instr('|' || key || '|', ?) > 0")
+            params.append(f'|{normalize_identifier(identifier)}|')
+        if not_found_only:
+            clauses.append('found = 0')
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        with self._connect() as conn:
+            return conn.execute(f'DELETE FROM annotations{where}', params).rowcount
+
+    def purge_expired(self) -> int:
+        """Delete entries past their TTL, returning how many were deleted."""
+        now = time.time()
+        with self._connect() as conn:
+            expired = [
+                (source, key)
+                for source, key, found, stored_at in conn.execute(
+                    'SELECT source, key, found, stored_at FROM annotations'
+                ).fetchall()
+                if now >= self._expires_at(source, bool(found), stored_at)
+            ]
+            conn.executemany(
+                'DELETE FROM annotations WHERE source = ? AND key = ?', expired
+            )
+        return len(expired)
+
+
+annotation_cache = AnnotationCache(
+    env.annotation_cache_dir / 'annotations.sqlite3',
+    ttl_s={
+        GNOMAD: env.GNOMAD_CACHE_TTL_DAYS * DAY_S,
+        CLINVAR: env.CLINVAR_CACHE_TTL_DAYS * DAY_S,
+        VEP: env.VEP_CACHE_TTL_DAYS * DAY_S,
+    },
+    negative_ttl_s=env.ANNOTATION_CACHE_NEGATIVE_TTL_DAYS * DAY_S,
+)
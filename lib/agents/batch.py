@@ -0,0 +1,370 @@
+"""OpenAI Batch API execution for bulk backfills.
+
+In batch mode (``LLM_BATCH_MODE``), bulk-lane agent runs that need a single
+model call -- no tools, no handoffs -- are not sent to the Responses API
+directly. ``run_agent`` hands their request body to the process-wide
+``BatchCollector``, which gathers requests for up to ``LLM_BATCH_COLLECT_S``
+seconds (or ``LLM_BATCH_MAX_REQUESTS`` requests), submits them as one Batch API
+job, polls it to completion, and resolves each waiting run with its response.
+The calling handler then persists the result exactly as for a direct run.
+
+``LocalBatchClient`` mimics the subset of the OpenAI client the collector
+uses, answering each request with a local ``responder``, so the whole path can
+be exercised offline (``LLM_BATCH_ENDPOINT=local``).
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+from agents import Agent, AgentOutputSchema, RunContextWrapper
+from agents.agent_output import AgentOutputSchemaBase
+from agents.items import ModelResponse, TResponseInputItem
+from agents.models.openai_responses import Converter
+from agents.result import RunResult
+from agents.usage import Usage
+from openai import AsyncOpenAI
+from openai.types.responses.response_usage import (
+    InputTokensDetails,
+    OutputTokensDetails,
+)
+
+from lib.core.environment import env
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = '/v1/responses'
+TERMINAL_BATCH_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+class BatchRequestError(Exception):
+    """A batched request came back with an error or without a response."""
+
+
+def batch_request_body(
+    agent: Agent[Any], input: str | list[TResponseInputItem]
+) -> dict[str, Any] | None:
+    """Responses API request body for a single-call run, or ``None`` if ineligible.
+
+    The agent's model settings are carried over as the SDK would send them.
+    Runs that may need several model turns (tools, handoffs) or whose prompt is
+    computed at run time cannot be expressed as one batched request.
+    """
+    if agent.tools or agent.handoffs or agent.mcp_servers:
+        return None
+    if not isinstance(agent.instructions, str | None):
+        return None
+    if not isinstance(agent.model, str):
+        return None
+    body: dict[str, Any] = {'model': agent.model, 'input': input}
+    if agent.instructions:
+        body['instructions'] = agent.instructions
+    text_format = Converter.get_response_format(_output_schema(agent))
+    if isinstance(text_format, dict):
+        body['text'] = text_format
+    settings = agent.model_settings
+    for name, value in (
+        ('temperature', settings.temperature),
+        ('top_p', settings.top_p),
+        ('truncation', settings.truncation),
+        ('max_output_tokens', settings.max_tokens),
+        ('top_logprobs', settings.top_logprobs),
+        ('metadata', settings.metadata),
+        ('prompt_cache_retention', settings.prompt_cache_retention),
+        ('include', settings.response_include),
+    ):
+        if value is not None:
+            body[name] = value
+    if settings.reasoning is not None:
+        body['reasoning'] = settings.reasoning.model_dump(exclude_none=True)
+    if settings.verbosity is not None:
+        body['text'] = {**body.get('text', {}), 'verbosity': settings.verbosity}
+    # Passed through as request body fields, as the SDK does for direct calls.
+    if isinstance(settings.extra_body, dict):
+        body.update(settings.extra_body)
+    body.update(settings.extra_args or {})
+    return body
+
+
+def _output_schema(agent: Agent[Any]) -> AgentOutputSchemaBase | None:
+    if agent.output_type is None or agent.output_type is str:
+        return None
+    if isinstance(agent.output_type, AgentOutputSchemaBase):
+        return agent.output_type
+    return AgentOutputSchema(agent.output_type)
+
+
+def response_output_text(response: dict[str, Any]) -> str:
+    """Concatenated ``output_text`` of a Responses API response body."""
+    if response.get('status') not in (None, 'completed'):
+        raise BatchRequestError(
+            f'Response {response.get("id")} is {response.get("status")}: '
+            f'{response.get("incomplete_details") or response.get("error")}'
+        )
+    return ''.join(
+        part.get('text', '')
+        for item in response.get('output', [])
+        if item.get('type') == 'message'
+        for part in item.get('content', [])
+        if part.get('type') == 'output_text'
+    )
+
+
+def batch_run_result(
+    agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    response: dict[str, Any],
+) -> RunResult:
+    """A ``RunResult`` for a batched response, with its usage as the raw response."""
+    text = response_output_text(response)
+    schema = _output_schema(agent)
+    final_output = schema.validate_json(text) if schema is not None else text
+    usage = response.get('usage') or {}
+    input_details = usage.get('input_tokens_details') or {}
+    output_details = usage.get('output_tokens_details') or {}
+    model_response = ModelResponse(
+        output=[],
+        usage=Usage(
+            requests=1,
+            input_tokens=usage.get('input_tokens', 0),
+            input_tokens_details=InputTokensDetails(
+                cached_tokens=input_details.get('cached_tokens', 0)
+            ),
+            output_tokens=usage.get('output_tokens', 0),
+            output_tokens_details=OutputTokensDetails(
+                reasoning_tokens=output_details.get('reasoning_tokens', 0)
+            ),
+            total_tokens=usage.get('total_tokens', 0),
+        ),
+        response_id=response.get('id'),
+    )
+    return RunResult(
+        input=input,
+        new_items=[],
+        raw_responses=[model_response],
+        final_output=final_output,
+        input_guardrail_results=[],
+        output_guardrail_results=[],
+        tool_input_guardrail_results=[],
+        tool_output_guardrail_results=[],
+        context_wrapper=RunContextWrapper(context=None),
+        _last_agent=agent,
+    )
+
+
+@dataclass
+class _PendingRequest:
+    custom_id: str
+    body: dict[str, Any]
+    future: 'asyncio.Future[dict[str, Any]]'
+
+
+class BatchCollector:
+    """Gathers request bodies into Batch API jobs and resolves each with its response.
+
+    A job is submitted once ``max_requests`` requests are waiting or
+    ``collect_window_s`` after the first one arrived, whichever comes first.
+    Use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        max_requests: int,
+        collect_window_s: float,
+        poll_interval_s: float,
+    ) -> None:
+        self.client_factory = client_factory
+        self.max_requests = max_requests
+        self.collect_window_s = collect_window_s
+        self.poll_interval_s = poll_interval_s
+        self._pending: list[_PendingRequest] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # Strong references to in-flight jobs so they are not garbage collected.
+        self._jobs: set[asyncio.Task[None]] = set()
+
+    async def run(self, body: dict[str, Any]) -> dict[str, Any]:
+        """Queue one request for the next job and wait for its response body."""
+        loop = asyncio.get_running_loop()
+        request = _PendingRequest(uuid.uuid4().hex, body, loop.create_future())
+        self._pending.append(request)
+        if len(self._pending) >= self.max_requests:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.collect_window_s, self._flush)
+        return await request.future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        requests, self._pending = self._pending, []
+        # Runs cancelled while waiting (e.g. a lost lease) are not submitted.
+        requests = [r for r in requests if not r.future.done()]
+        if not requests:
+            return
+        job = asyncio.create_task(self._submit(requests))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _submit(self, requests: list[_PendingRequest]) -> None:
+        try:
+            results = await self._execute(requests)
+        except Exception as e:
+            logger.exception(f'Batch of {len(requests)} requests failed')
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request in requests:
+            if request.future.done():
+                continue
+            row = results.get(request.custom_id)
+            response = (row or {}).get('response') or {}
+            if row is None or row.get('error') or response.get('status_code') != 200:
+                request.future.set_exception(
+                    BatchRequestError(
+                        f'Batched request {request.custom_id} failed: '
+                        f'{(row or {}).get("error") or response.get("body") or "no result"}'
+                    )
+                )
+            else:
+                request.future.set_result(response['body'])
+
+    async def _execute(
+        self, requests: list[_PendingRequest]
+    ) -> dict[str, dict[str, Any]]:
+        client = self.client_factory()
+        jsonl = '\n'.join(
+            json.dumps(
+                {
+                    'custom_id': r.custom_id,
+                    'method': 'POST',
+                    'url': BATCH_ENDPOINT,
+                    'body': r.body,
+                }
+            )
+            for r in requests
+        )
+        input_file = await client.files.create(
+            file=('batch.jsonl', jsonl.encode()), purpose='batch'
+        )
+        job = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window='24h',
+        )
+        started = time.monotonic()
+        logger.info(f'Submitted batch {job.id} with {len(requests)} requests')
+        while job.status not in TERMINAL_BATCH_STATUSES:
+            await asyncio.sleep(self.poll_interval_s)
+            job = await client.batches.retrieve(job.id)
+        logger.info(
+            f'Batch {job.id} {job.status} after {time.monotonic() - started:.0f}s'
+        )
+
+        results: dict[str, dict[str, Any]] = {}
+        for file_id in (job.output_file_id, job.error_file_id):
+            if not file_id:
+                continue
+            content = await client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    row = json.loads(line)
+                    results[row['custom_id']] = row
+        return results
+
+
+@dataclass
+class LocalBatchClient:
+    """In-memory stand-in for the Batch API subset ``BatchCollector`` uses.
+
+    Jobs complete on the first ``retrieve``; each request body is answered by
+    ``responder``, which returns a Responses API response body. Without a
+    responder, requests are sent to the Responses API one by one, which
+    exercises the batch path end to end without waiting on a real batch.
+    """
+
+    responder: Callable[[dict[str, Any]], Awaitable[dict[str, Any]]] | None = None
+    _files: dict[str, str] = field(default_factory=dict)
+    _batches: dict[str, SimpleNamespace] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(
+            create=self._create_batch, retrieve=self._retrieve_batch
+        )
+
+    async def _respond(self, body: dict[str, Any]) -> dict[str, Any]:
+        if self.responder is not None:
+            return await self.responder(body)
+        client = AsyncOpenAI(api_key=env.OPENAI_API_KEY)
+        response = await client.responses.create(**body)
+        return response.model_dump(mode='json')
+
+    async def _create_file(self, file: tuple[str, bytes], purpose: str) -> Any:
+        file_id = f'file-{uuid.uuid4().hex}'
+        self._files[file_id] = file[1].decode()
+        return SimpleNamespace(id=file_id)
+
+    async def _content(self, file_id: str) -> Any:
+        return SimpleNamespace(text=self._files[file_id])
+
+    async def _create_batch(
+        self, input_file_id: str, endpoint: str, completion_window: str
+    ) -> Any:
+        batch = SimpleNamespace(
+            id=f'batch-{uuid.uuid4().hex}',
+            status='validating',
+            input_file_id=input_file_id,
+            output_file_id=None,
+            error_file_id=None,
+        )
+        self._batches[batch.id] = batch
+        return batch
+
+    async def _retrieve_batch(self, batch_id: str) -> Any:
+        batch = self._batches[batch_id]
+        if batch.status in TERMINAL_BATCH_STATUSES:
+            return batch
+        rows = []
+        for line in self._files[batch.input_file_id].splitlines():
+            request = json.loads(line)
+            try:
+                body = await self._respond(request['body'])
+                row = {
+                    'custom_id': request['custom_id'],
+                    'response': {'status_code': 200, 'body': body},
+                    'error': None,
+                }
+            except Exception as e:
+                row = {
+                    'custom_id': request['custom_id'],
+                    'response': None,
+                    'error': {'message': str(e)},
+                }
+            rows.append(json.dumps(row))
+        batch.output_file_id = f'file-{uuid.uuid4().hex}'
+        self._files[batch.output_file_id] = '\n'.join(rows)
+        batch.status = 'completed'
+        return batch
+
+
+def _batch_client() -> Any:
+    if env.LLM_BATCH_ENDPOINT == 'local':
+        return LocalBatchClient()
+    return AsyncOpenAI(api_key=env.OPENAI_API_KEY)
+
+
+batch_collector = BatchCollector(
+    client_factory=_batch_client,
+    max_requests=env.LLM_BATCH_MAX_REQUESTS,
+    collect_window_s=env.LLM_BATCH_COLLECT_S,
+    poll_interval_s=env.LLM_BATCH_POLL_INTERVAL_S,
+)
@@ -14,7 +14,7 @@ from lib.models.patient import PatientDB
 from lib.models.phenotype import PhenotypeDB
 from lib.models.variant import VariantDB
 from lib.tasks.misc import enqueue_task
-from lib.tasks.models import TaskDB, TaskStatus, TaskType
+from lib.tasks.models import TaskDB, TaskPriority, TaskStatus, TaskType
 
 
 class ChatRoutingOutput(BaseModel):
@@ -111,7 +111,7 @@ Pick the most relevant task type from the list below. Use EXACTLY one of these v
 - **Entity-specific agents** operate on a specific entity instance and require routing to a matched entity:
   Segregation Evidence Extraction (per-family), Segregation Analysis Computed (per-family),
   Variant Harmonization (per-variant), Patient Demographics (per-patient),
-  Phenotype Extraction (per-patient), HPO Linking (per-phenotype).
+  Phenotype Extraction (per-patient), HPO Linking (per-patient, or per-phenotype for a single re-link).
 
 Step 3 — Route the request
 **Critical distinction for global agents:**
@@ -307,6 +307,8 @@ def _make_queue_task_tool(paper_id: int, user_id: int) -> Any:
                 additional_context=additional_context,
                 skip_successors=skip_successors,
                 updated_by_user_id=user_id,
+                # A curator is waiting in the chat for this one.
+                priority=TaskPriority.INTERACTIVE,
             )
             # Build the confirmation from the real task while the session is open.
             target = f' for "{entity_label}"' if entity_label else ''
@@ -0,0 +1,140 @@
+"""Agent conversation history, in OpenAI's Conversations API or our own DB.
+
+Each task keeps the conversation of its agent runs so a curator's follow-up
+(``build_followup_prompt``) continues where the first run left off. By default
+conversations live server-side; with ``LLM_CONVERSATION_STORE=local`` new
+conversations are kept in the ``conversation_items`` table instead, which
+saves the ``conversations.create`` round trip before every run. A local
+conversation's items are replayed as input on the next turn and the turn's
+items appended once it succeeds.
+
+Local conversation ids carry ``LOCAL_CONVERSATION_PREFIX``, so conversations
+created before switching stores keep working against the store they live in.
+"""
+
+import asyncio
+import uuid
+import weakref
+from typing import Any
+
+from agents.items import TResponseInputItem
+from openai import AsyncOpenAI
+from sqlalchemy import select
+
+from lib.api.db import session_scope
+from lib.core.environment import env
+from lib.models.conversation import ConversationItemDB
+
+LOCAL_CONVERSATION_PREFIX = 'local_'
+
+
+# The client's httpx pool is bound to the event loop that opened its connections.
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _client() -> AsyncOpenAI:
+    """The shared OpenAI client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOpenAI(api_key=env.OPENAI_API_KEY)
+    return client
+
+
+def is_local_conversation(conversation_id: str) -> bool:
+    return conversation_id.startswith(LOCAL_CONVERSATION_PREFIX)
+
+
+async def create_conversation() -> str:
+    """Start a conversation in the configured store and return its id."""
+    if env.LLM_CONVERSATION_STORE == 'local':
+        return f'{LOCAL_CONVERSATION_PREFIX}{uuid.uuid4().hex}'
+    conversation = await _client().conversations.create()
+    return conversation.id
+
+
+def conversation_items(conversation_id: str) -> list[TResponseInputItem]:
+    """All items of a local conversation, oldest first."""
+    with session_scope() as session:
+        return list(
+            session.scalars(
+                select(ConversationItemDB.item)
+                .where(ConversationItemDB.conversation_id == conversation_id)
+                .order_by(ConversationItemDB.id)
+            )
+        )
+
+
+def add_conversation_items(conversation_id: str, items: list[Any]) -> None:
+    """Append items to a local conversation."""
+    with session_scope() as session:
+        session.add_all(
+            ConversationItemDB(conversation_id=conversation_id, item=item)
+            for item in items
+        )
+
+
+async def append_to_conversation(conversation_id: str, items: list[Any]) -> None:
+    """Append items to a conversation in whichever store holds it."""
+    if is_local_conversation(conversation_id):
+        add_conversation_items(conversation_id, items)
+        return
+    await _client().conversations.items.create(conversation_id, items=items)
+
+
+async def delete_conversation_items_from(
+    conversation_id: str, first_item_id: str, preceding: int = 0
+) -> int:
+    """Delete a server-side conversation's items from ``first_item_id`` on,
+    plus the ``preceding`` items right before it, returning how many were
+    deleted. Nothing is deleted if ``first_item_id`` is not in the conversation.
+    """
+    client = _client()
+    items = client.conversations.items.list(conversation_id, order='desc')
+    stale: list[str] = []
+    found = False
+    async for item in items:
+        if not item.id:
+            continue
+        if found and not preceding:
+            break
+        stale.append(item.id)
+        if found:
+            preceding -= 1
+        found = found or item.id == first_item_id
+    if not found:
+        return 0
+    for item_id in stale:
+        await client.conversations.items.delete(
+            item_id, conversation_id=conversation_id
+        )
+    return len(stale)
+
+
+async def respond_in_conversation(conversation_id: str, message: str) -> str:
+    """Answer a user message with a plain model call that continues a conversation."""
+    client = _client()
+    if not is_local_conversation(conversation_id):
+        resp = await client.responses.create(
+            model=env.OPENAI_API_DEPLOYMENT,
+            input=message,
+            conversation=conversation_id,
+        )
+        return resp.output_text or ''
+
+    user_item = {'type': 'message', 'role': 'user', 'content': message}
+    resp = await client.responses.create(
+        model=env.OPENAI_API_DEPLOYMENT,
+        input=[*conversation_items(conversation_id), user_item],  # type: ignore[list-item]
+    )
+    response_text = resp.output_text or ''
+    add_conversation_items(
+        conversation_id,
+        [
+            user_item,
+            {'type': 'message', 'role': 'assistant', 'content': response_text},
+        ],
+    )
+    return response_text
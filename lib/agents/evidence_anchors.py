@@ -0,0 +1,231 @@
+"""Compact evidence output: agents cite passage anchors instead of quoting.
+
+Output tokens dominate generation time, and most of an extraction agent's
+output is ``EvidenceBlock.quote`` text copied back from the paper. With
+``COMPACT_EVIDENCE`` enabled, paper context is rendered with an anchor before
+every sentence and table row (see ``lib.misc.pdf.passages``), and
+``run_evidence_agent`` runs agents whose output contains ``EvidenceBlock``
+fields with an equivalent schema that has ``AnchoredEvidenceBlock`` in their
+place. Each quote is then reconstructed from the paper's passage index, so
+callers receive the agent's usual output type and the stored evidence is
+unchanged. Output whose anchors leave some evidence without a source is
+re-run once in the usual quoting mode.
+"""
+
+import functools
+import logging
+import operator
+import types
+from typing import Annotated, Any, Union, get_args, get_origin
+
+from agents import Agent
+from agents.items import TResponseInputItem
+from agents.result import RunResult
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+
+from lib.agents.runner import run_agent
+from lib.core.environment import env
+from lib.misc.pdf.passages import Anchor, anchor_index, load_passages
+from lib.models.evidence_block import AnchoredEvidenceBlock, EvidenceBlock
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_ANCHOR_INSTRUCTIONS = """EVIDENCE ANCHORS:
+The paper text is marked with anchors: [pN.M] before each sentence and [pN] before each table row.
+Evidence fields take "anchors" instead of a verbatim quote: list the anchor ids of the consecutive sentences or table rows that support the value, in document order.
+Wherever the extraction rules ask for a quote, cite anchors instead; never copy the text itself.
+To cite only part of the anchored text, give "start" and "end" as character offsets into it (the anchored sentences joined as they appear); otherwise leave both null.
+table_id, image_id, is_supplement and reasoning keep their usual meaning."""
+
+
+def compact_output_type(output_type: Any) -> Any:
+    """``output_type`` with every ``EvidenceBlock[T]`` replaced by
+    ``AnchoredEvidenceBlock[T]``; types without evidence are returned as is."""
+    if isinstance(output_type, type) and issubclass(output_type, EvidenceBlock):
+        args = output_type.__pydantic_generic_metadata__['args']
+        if args:
+            return AnchoredEvidenceBlock[compact_output_type(args[0])]  # type: ignore[misc]
+        return output_type
+    if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+        return _compact_model(output_type)
+
+    origin, args = get_origin(output_type), get_args(output_type)
+    if origin is None or not args:
+        return output_type
+    if origin is Annotated:
+        inner = compact_output_type(args[0])
+        if inner == args[0]:
+            return output_type
+        return Annotated[inner, *output_type.__metadata__]
+    if origin not in (list, dict, Union, types.UnionType):
+        return output_type
+    compact_args = tuple(compact_output_type(arg) for arg in args)
+    if compact_args == args:
+        return output_type
+    if origin is types.UnionType:
+        return functools.reduce(operator.or_, compact_args)
+    if origin is Union:
+        return Union[compact_args]
+    return origin[compact_args]
+
+
+@functools.cache
+def _compact_model(model: type[BaseModel]) -> type[BaseModel]:
+    fields = {
+        name: (compact_output_type(field.annotation), field)
+        for name, field in model.model_fields.items()
+    }
+    if all(annotation == field.annotation for annotation, field in fields.values()):
+        return model
+    return create_model(  # type: ignore[call-overload]
+        f'{model.__name__}Compact',
+        __config__=model.model_config,
+        __doc__=model.__doc__,
+        **{
+            name: (annotation, field.__class__.merge_field_infos(field))
+            for name, (annotation, field) in fields.items()
+        },
+    )
+
+
+def _resolve_anchor(anchor_id: str, anchors: dict[str, Anchor]) -> list[Anchor]:
+    """The anchors an id refers to, tolerating a row/sentence mix-up.
+
+    ``p40.0`` for table row ``p40`` resolves to the row, and ``p12`` for a
+    paragraph to all of its sentences; other unknown ids resolve to nothing.
+    """
+    anchor_id = anchor_id.strip().strip('[]')
+    if anchor_id in anchors:
+        return [anchors[anchor_id]]
+    passage_id = anchor_id.partition('.')[0]
+    if passage_id in anchors:
+        return [anchors[passage_id]]
+    return [
+        anchor for key, anchor in anchors.items() if key.startswith(f'{passage_id}.')
+    ]
+
+
+def _reconstruct(
+    block: AnchoredEvidenceBlock[Any], anchors: dict[str, Anchor]
+) -> dict[str, Any]:
+    """The ``EvidenceBlock`` fields for an anchored block, with its quote.
+
+    Unknown anchors are dropped; a cited table row also fills in ``table_id``.
+    """
+    cited: list[Anchor] = []
+    for anchor_id in block.anchors:
+        resolved = _resolve_anchor(anchor_id, anchors)
+        if not resolved:
+            logger.warning(f'Ignoring unknown evidence anchor {anchor_id!r}')
+        cited += [anchor for anchor in resolved if anchor not in cited]
+    cited.sort(key=lambda anchor: (anchor.passage.id, anchor.start))
+
+    # Consecutive anchors of one passage are quoted as the exact text they
+    # span; anchors in different passages are joined by newlines.
+    parts: list[str] = []
+    previous: Anchor | None = None
+    start = 0
+    for anchor in cited:
+        if previous is not None and previous.passage.id == anchor.passage.id:
+            parts[-1] = anchor.passage.text[start : anchor.end]
+        else:
+            start = anchor.start
+            parts.append(anchor.text)
+        previous = anchor
+    quote = '\n'.join(parts) or None
+    if quote and block.start is not None and block.end is not None:
+        if 0 <= block.start < block.end <= len(quote):
+            quote = quote[block.start : block.end]
+
+    table_id = block.table_id
+    if table_id is None:
+        # Passage table ids count the main text's tables from 0, like
+        # EvidenceBlock.table_id; supplement tables are offset.
+        table_id = next(
+            (
+                anchor.passage.table_id
+                for anchor in cited
+                if anchor.passage.kind == 'table_row' and not anchor.passage.supplement
+            ),
+            None,
+        )
+
+    return {
+        'value': _expand(block.value, anchors),
+        'reasoning': block.reasoning,
+        'quote': quote,
+        'table_id': table_id,
+        'image_id': block.image_id,
+        'is_supplement': block.is_supplement
+        or any(anchor.passage.supplement for anchor in cited),
+    }
+
+
+def _expand(output: Any, anchors: dict[str, Anchor]) -> Any:
+    """Compact output as plain data, with anchored blocks turned into evidence."""
+    if isinstance(output, AnchoredEvidenceBlock):
+        return _reconstruct(output, anchors)
+    if isinstance(output, BaseModel):
+        return {
+            name: _expand(getattr(output, name), anchors)
+            for name in type(output).model_fields
+        }
+    if isinstance(output, list):
+        return [_expand(item, anchors) for item in output]
+    if isinstance(output, dict):
+        return {key: _expand(value, anchors) for key, value in output.items()}
+    return output
+
+
+def expand_evidence(output: Any, output_type: Any, anchors: dict[str, Anchor]) -> Any:
+    """Validate compact agent output as ``output_type``, reconstructing quotes."""
+    return TypeAdapter(output_type).validate_python(_expand(output, anchors))
+
+
+# Compact clone of each agent, by id of the original.
+_compact_agents: dict[int, Agent[Any]] = {}
+
+
+def compact_agent(agent: Agent[Any]) -> Agent[Any] | None:
+    """The agent with compact evidence output, or ``None`` if it has no evidence."""
+    if id(agent) in _compact_agents:
+        return _compact_agents[id(agent)]
+    output_type = compact_output_type(agent.output_type)
+    if output_type == agent.output_type or not isinstance(agent.instructions, str):
+        return None
+    compact = agent.clone(
+        instructions=f'{agent.instructions}\n\n{EVIDENCE_ANCHOR_INSTRUCTIONS}',
+        output_type=output_type,
+    )
+    _compact_agents[id(agent)] = compact
+    return compact
+
+
+async def run_evidence_agent(
+    agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    paper_id: int,
+    **kwargs: Any,
+) -> RunResult:
+    """``run_agent`` for an agent over a paper, in compact evidence mode if enabled.
+
+    The result's ``final_output`` is always of the agent's own output type.
+    When the cited anchors leave evidence without a source, the agent is run
+    again in the usual quoting mode.
+    """
+    compact = compact_agent(agent) if env.COMPACT_EVIDENCE else None
+    if compact is None:
+        return await run_agent(agent, input, **kwargs)
+    result = await run_agent(compact, input, **kwargs)
+    anchors = anchor_index(load_passages(paper_id))
+    try:
+        result.final_output = expand_evidence(
+            result.final_output, agent.output_type, anchors
+        )
+    except ValidationError as e:
+        logger.warning(
+            f'{agent.name}: compact evidence did not resolve '
+            f'({e.error_count()} errors); re-running with quotes'
+        )
+        return await run_agent(agent, input, **kwargs)
+    return result
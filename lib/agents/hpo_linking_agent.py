@@ -4,7 +4,7 @@ from agents import Agent, function_tool
 from lib.agents.base_instructions import BASE_SYSTEM_INSTRUCTIONS
 from lib.core.environment import env
 from lib.models.evidence_block import ReasoningBlock
-from lib.models.phenotype import HPOTerm
+from lib.models.phenotype import HPOTerm, PhenotypeHpoLink
 from lib.reference_data.hpo import find_matching_hpo_terms, get_ontology
 
 
@@ -365,3 +365,31 @@ agent = Agent(
     output_type=ReasoningBlock[HPOTerm],
     tools=[search_hpo_terms, get_hpo_term, get_hpo_parents, get_hpo_children],
 )
+
+BATCH_INSTRUCTIONS = """
+You will receive a JSON array of phenotypes, all from the same patient. Each
+element has the single-phenotype format described below (phenotype_id,
+concept, negated, uncertain, family_history, candidates).
+
+Apply the framework below to EACH phenotype independently, as if it were the
+only one provided. Phenotypes may share tool lookups, but never let the
+mapping of one phenotype influence another.
+
+Return a list with exactly one entry per input phenotype_id, each with:
+    - phenotype_id (int): copied from the input
+    - value: the HPOTerm object the framework below asks you to return
+    - reasoning: that phenotype's reasoning, as described under HPO REASONING
+      REQUIREMENTS
+
+---------------------------------------------------------------------
+"""
+
+HPO_BATCH_LINKING_AGENT_INSTRUCTIONS = BATCH_INSTRUCTIONS + INSTRUCTIONS
+
+batch_agent = Agent(
+    name='hpo_batch_linker',
+    instructions=BASE_SYSTEM_INSTRUCTIONS,
+    model=env.OPENAI_API_DEPLOYMENT,
+    output_type=list[PhenotypeHpoLink],
+    tools=[search_hpo_terms, get_hpo_term, get_hpo_parents, get_hpo_children],
+)
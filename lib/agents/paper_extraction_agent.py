@@ -3,12 +3,12 @@ from re import sub
 from typing import List, Tuple
 from xml.etree import ElementTree as ET
 
-import requests
 from agents import Agent, function_tool
 from pydantic import BaseModel
 
 from lib.agents.base_instructions import BASE_SYSTEM_INSTRUCTIONS
 from lib.core.environment import env
+from lib.core.http_client import http_session, in_thread
 from lib.models import PaperExtractionOutput
 
 ESEARCH_ENDPOINT = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi'
@@ -16,6 +16,7 @@ EFETCH_ENDPOINT = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi'
 
 
 @function_tool
+@in_thread
 def pubmed_search_and_titles(
     first_author: str, search_term: str = ''
 ) -> List[Tuple[str, str]]:
@@ -40,7 +41,7 @@ def pubmed_search_and_titles(
     if env.NCBI_EMAIL:
         params['email'] = env.NCBI_EMAIL
 
-    r = requests.get(ESEARCH_ENDPOINT, params=params, timeout=10)
+    r = http_session().get(ESEARCH_ENDPOINT, params=params, timeout=10)
     r.raise_for_status()
     pmids = r.json().get('esearchresult', {}).get('idlist', [])
 
@@ -58,7 +59,7 @@ def pubmed_search_and_titles(
     if env.NCBI_EMAIL:
         fetch_params['email'] = env.NCBI_EMAIL
 
-    r = requests.get(EFETCH_ENDPOINT, params=fetch_params, timeout=30)
+    r = http_session().get(EFETCH_ENDPOINT, params=fetch_params, timeout=30)
     r.raise_for_status()
 
     # Extract PMIDs and titles
@@ -79,6 +80,7 @@ def pubmed_search_and_titles(
 
 
 @function_tool
+@in_thread
 def pubmed_fetch_one(pmid: str) -> str:
     """
     Fetch a single PubMed record by PMID using efetch.
@@ -97,7 +99,7 @@ def pubmed_fetch_one(pmid: str) -> str:
     if env.NCBI_EMAIL:
         params['email'] = env.NCBI_EMAIL
 
-    r = requests.get(EFETCH_ENDPOINT, params=params, timeout=30)
+    r = http_session().get(EFETCH_ENDPOINT, params=params, timeout=30)
     r.raise_for_status()
 
     xml_text = unescape(r.text)
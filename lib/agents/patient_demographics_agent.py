@@ -3,7 +3,7 @@ from agents import Agent
 from lib.agents.base_instructions import BASE_SYSTEM_INSTRUCTIONS
 from lib.agents.core_extraction_rules import CORE_EXTRACTION_SPEC
 from lib.core.environment import env
-from lib.models.patient import PatientDemographics
+from lib.models.patient import BatchedPatientDemographics, PatientDemographics
 
 PATIENT_DEMOGRAPHICS_INSTRUCTIONS = """
 System: You are an expert clinical data curator.
@@ -106,3 +106,26 @@ agent = Agent(
     model=env.OPENAI_API_DEPLOYMENT,
     output_type=PatientDemographics,
 )
+
+BATCH_INSTRUCTIONS = """
+BATCHED REQUEST:
+- Instead of a single "Patient JSON", you receive a "Patients JSON" array of
+  already-identified patients from this paper. Each element has patient_id,
+  identifier, identifier_quote, proband_status and proband_identifier (the
+  proband of that patient's family).
+- Apply the instructions below to EACH patient independently, using only that
+  patient's own description; never copy values from one patient to another.
+- Return a list with exactly one entry per input patient_id: the patient_id
+  copied from the input plus that patient's demographic fields.
+"""
+
+PATIENT_DEMOGRAPHICS_BATCH_AGENT_INSTRUCTIONS = (
+    PATIENT_DEMOGRAPHICS_AGENT_INSTRUCTIONS + '\n\n' + BATCH_INSTRUCTIONS
+)
+
+batch_agent = Agent(
+    name='patient_demographics_batch_extractor',
+    instructions=BASE_SYSTEM_INSTRUCTIONS,
+    model=env.OPENAI_API_DEPLOYMENT,
+    output_type=list[BatchedPatientDemographics],
+)
@@ -0,0 +1,186 @@
+"""On-disk cache of agent final outputs for deterministic pipeline re-runs.
+
+A retry, a crash recovery, or a downstream-only rerun sends byte-identical
+prompts, so the structured ``final_output`` of the first run can be reused.
+Entries are keyed by a hash of everything that determines the answer: agent
+name, model, model settings, instructions, tool names, output schema and the
+input messages. The store is a SQLite file shared by every process on the
+host, bounded by ``LLM_CACHE_MAX_MB`` with least-recently-used eviction.
+
+Whether a run may use the cache is decided by the caller (see
+``lib.agents.runner.cache_responses``); ``run_agent`` does the lookup.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from agents import Agent, RunContextWrapper
+from agents.agent_output import AgentOutputSchemaBase
+from agents.items import TResponseInputItem
+from agents.result import RunResult
+from pydantic import TypeAdapter
+
+from lib.agents.conversations import append_to_conversation
+from lib.core.environment import env
+
+logger = logging.getLogger(__name__)
+
+
+def response_cache_key(
+    agent: Agent[Any], input: str | list[TResponseInputItem]
+) -> str | None:
+    """Content hash identifying a run, or ``None`` if the agent is not cacheable.
+
+    Agents with dynamic instructions, a custom model object, or a custom output
+    schema are never cached since their behaviour is not captured by the key.
+    """
+    if not isinstance(agent.instructions, str | None):
+        return None
+    if not isinstance(agent.model, str | None):
+        return None
+    if isinstance(agent.output_type, AgentOutputSchemaBase):
+        return None
+    payload = {
+        'agent': agent.name,
+        'model': agent.model,
+        'model_settings': agent.model_settings.to_json_dict(),
+        'instructions': agent.instructions,
+        'tools': sorted(tool.name for tool in agent.tools),
+        'output_schema': _output_adapter(agent).json_schema(),
+        'input': input,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _output_adapter(agent: Agent[Any]) -> TypeAdapter[Any]:
+    return TypeAdapter(agent.output_type or str)
+
+
+def dump_output(agent: Agent[Any], final_output: Any) -> str:
+    return _output_adapter(agent).dump_json(final_output).decode()
+
+
+def load_output(agent: Agent[Any], raw: str) -> Any:
+    return _output_adapter(agent).validate_json(raw)
+
+
+def cached_run_result(
+    agent: Agent[Any], input: str | list[TResponseInputItem], final_output: Any
+) -> RunResult:
+    """A ``RunResult`` for a cache hit: the output only, no model responses."""
+    return RunResult(
+        input=input,
+        new_items=[],
+        raw_responses=[],
+        final_output=final_output,
+        input_guardrail_results=[],
+        output_guardrail_results=[],
+        tool_input_guardrail_results=[],
+        tool_output_guardrail_results=[],
+        context_wrapper=RunContextWrapper(context=None),
+        _last_agent=agent,
+    )
+
+
+async def replay_into_conversation(
+    conversation_id: str, input: str | list[TResponseInputItem], raw_output: str
+) -> None:
+    """Append a cached exchange to a conversation so follow-ups still see it."""
+    items: list[Any] = (
+        [{'type': 'message', 'role': 'user', 'content': input}]
+        if isinstance(input, str)
+        else list(input)
+    )
+    items.append({'type': 'message', 'role': 'assistant', 'content': raw_output})
+    await append_to_conversation(conversation_id, items)
+
+
+class ResponseCache:
+    """SQLite store of serialized final outputs, evicted LRU by total size.
+
+    Lookups and writes never raise: a broken cache file degrades to misses.
+    """
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS responses ('
+                    'key TEXT PRIMARY KEY, output TEXT NOT NULL, '
+                    'size INTEGER NOT NULL, last_used REAL NOT NULL)'
+                )
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS ix_responses_last_used '
+                    'ON responses (last_used)'
+                )
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> str | None:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT output FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    'UPDATE responses SET last_used = ? WHERE key = ?',
+                    (time.time(), key),
+                )
+                return str(row[0])
+        except sqlite3.Error:
+            logger.warning('LLM response cache lookup failed', exc_info=True)
+            return None
+
+    def put(self, key: str, output: str) -> None:
+        size = len(output.encode())
+        if size > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, output, size, last_used) '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, output, size, time.time()),
+                )
+                self._evict(conn)
+        except sqlite3.Error:
+            logger.warning('LLM response cache write failed', exc_info=True)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute(
+            'SELECT key, size FROM responses ORDER BY last_used'
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+        logger.info(f'Evicted {len(stale)} entries from the LLM response cache')
+
+
+response_cache = ResponseCache(
+    env.llm_cache_dir / 'responses.sqlite3', env.LLM_CACHE_MAX_MB * 1024 * 1024
+)
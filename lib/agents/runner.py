@@ -0,0 +1,592 @@
+"""Shared entry point for running agents under an adaptive rate limiter.
+
+Every ``Runner.run`` call in the pipeline goes through ``run_agent`` so that all
+LLM traffic in a process shares one ``AdaptiveLimiter``. The limiter grows its
+concurrency additively while runs succeed and halves it (plus a short backoff
+pause) on 429s and timeouts, and it holds new runs back while the configured
+tokens-per-minute / requests-per-minute budgets are used up, counting an
+estimate for each run still in flight. Runs waiting for
+a slot are admitted highest ``run_priority`` first, and each successful run's
+token usage is added to the caller's ``run_usage`` accumulator, if one is set.
+When the caller sets ``cache_responses``, identical runs are served from the
+on-disk response cache (see ``lib.agents.response_cache``) without a model call,
+and when it sets ``batch_responses``, single-call runs are answered through the
+Batch API collector (see ``lib.agents.batch``). Runs for the same paper share a
+``prompt_cache_key`` so the provider routes them to the same prompt cache.
+When the caller sets a ``cascade_model``, runs are first answered by that
+(cheaper, faster) model and escalate to the agent's own model only if the
+answer fails validation or reports low confidence (see ``low_confidence``).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import Any
+
+import openai
+from agents import (
+    Agent,
+    ItemHelpers,
+    ModelSettings,
+    RunConfig,
+    RunContextWrapper,
+    RunHooks,
+    Runner,
+)
+from agents.exceptions import MaxTurnsExceeded, ModelBehaviorError
+from agents.items import ModelResponse, TResponseInputItem
+from agents.result import RunResult
+from pydantic import BaseModel
+
+from lib.agents.batch import batch_collector, batch_request_body, batch_run_result
+from lib.agents.conversations import (
+    add_conversation_items,
+    conversation_items,
+    delete_conversation_items_from,
+    is_local_conversation,
+)
+from lib.agents.response_cache import (
+    cached_run_result,
+    dump_output,
+    load_output,
+    replay_into_conversation,
+    response_cache,
+    response_cache_key,
+)
+from lib.core.environment import env
+
+logger = logging.getLogger(__name__)
+
+BUDGET_WINDOW_S = 60.0
+# Rough size of a token in characters, for estimating a run's input tokens.
+CHARS_PER_TOKEN = 4
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 60.0
+
+# Priority of LLM runs made from the current task (see TaskPriority); the worker
+# sets it per task so interactive work is admitted ahead of bulk work.
+run_priority: ContextVar[int] = ContextVar('run_priority', default=0)
+
+
+class LimiterSnapshot(BaseModel):
+    limit: float
+    in_flight: int
+    waiting: int
+    consecutive_failures: int
+    backoff_remaining_s: float
+    requests_last_minute: int
+    tokens_last_minute: int
+    requests_per_minute: int | None
+    tokens_per_minute: int | None
+
+
+@dataclass
+class RunUsage:
+    """LLM usage summed over the model responses of one or more agent runs."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    # Models that answered, in order of first use, and how many cascaded runs
+    # were escalated from the fast model (see ``cascade_model``).
+    models: list[str] = field(default_factory=list)
+    escalations: int = 0
+
+    def add(self, result: Any) -> None:
+        for resp in getattr(result, 'raw_responses', None) or []:
+            self.requests += 1
+            usage = getattr(resp, 'usage', None)
+            if usage is None:
+                continue
+            self.input_tokens += usage.input_tokens or 0
+            self.output_tokens += usage.output_tokens or 0
+            details = getattr(usage, 'input_tokens_details', None)
+            if details is not None:
+                self.cached_tokens += details.cached_tokens or 0
+
+    def add_model(self, model: str) -> None:
+        if model not in self.models:
+            self.models.append(model)
+
+
+# Usage accumulator for the current task; the worker sets a fresh one per task
+# attempt and records the totals with the attempt.
+run_usage: ContextVar[RunUsage | None] = ContextVar('run_usage', default=None)
+
+
+# Whether runs made from the current task may be served from and stored in the
+# response cache; the worker enables it per task type (see LLM_CACHE_TASK_TYPES).
+cache_responses: ContextVar[bool] = ContextVar('cache_responses', default=False)
+
+
+# Whether single-call runs made from the current task go through the Batch API
+# collector instead of a direct model call; the worker enables it for bulk-lane
+# tasks in LLM_BATCH_MODE.
+batch_responses: ContextVar[bool] = ContextVar('batch_responses', default=False)
+
+# Provider prompt cache key for runs made from the current task (see
+# lib.tasks.prompts.paper_prompt_cache_key); the worker sets it per task so all
+# of a paper's runs land on the cache holding its shared paper prefix.
+prompt_cache_key: ContextVar[str | None] = ContextVar('prompt_cache_key', default=None)
+
+# Fast model that runs made from the current task try first; the worker sets it
+# for the task types in LLM_CASCADE_TASK_TYPES when LLM_FAST_MODEL is set.
+cascade_model: ContextVar[str | None] = ContextVar('cascade_model', default=None)
+
+# Runner.run keyword arguments a batched run can honour: the conversation is
+# written after the fact and a single-call run never reaches max_turns.
+BATCHABLE_RUN_KWARGS = {'conversation_id', 'max_turns'}
+
+
+def estimate_tokens(input: str | list[TResponseInputItem]) -> int:
+    """Rough input token count of a run, reserved against the token budget."""
+    return len(str(input)) // CHARS_PER_TOKEN
+
+
+def usage_totals(result: Any) -> tuple[int, int]:
+    """Number of model responses and total tokens (input + output) in a run result."""
+    usage = RunUsage()
+    usage.add(result)
+    return usage.requests, usage.input_tokens + usage.output_tokens
+
+
+@dataclass(eq=False)
+class _Charge:
+    """Requests or tokens charged to a budget window at ``at``."""
+
+    at: float
+    count: int
+
+
+@dataclass
+class Reservation:
+    """The budget an admitted run holds until ``AdaptiveLimiter.release``."""
+
+    requests: _Charge
+    tokens: _Charge
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with rolling per-minute request and token budgets.
+
+    Not thread-safe: use it from a single event loop (one per process).
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        # Heap of (-priority, arrival, future): highest priority, then FIFO.
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._arrivals = itertools.count()
+        self._consecutive_failures = 0
+        self._backoff_until = 0.0
+        # Charges within the last BUDGET_WINDOW_S, oldest first: finished runs'
+        # usage and in-flight runs' reservations.
+        self._requests: deque[_Charge] = deque()
+        self._tokens: deque[_Charge] = deque()
+
+    def _prune(self, now: float) -> None:
+        for window in (self._requests, self._tokens):
+            while window and window[0].at <= now - BUDGET_WINDOW_S:
+                window.popleft()
+
+    def _admission_delay(self, now: float) -> float:
+        """Seconds until a budget or backoff allows a new run (0 = budgets allow it)."""
+        self._prune(now)
+        delay = max(0.0, self._backoff_until - now)
+        for window, budget in (
+            (self._requests, self.requests_per_minute),
+            (self._tokens, self.tokens_per_minute),
+        ):
+            if budget is not None and window and _total(window) >= budget:
+                delay = max(delay, window[0].at + BUDGET_WINDOW_S - now)
+        return delay
+
+    async def acquire(self, priority: int = 0, tokens: int = 0) -> Reservation:
+        """Wait for a slot, then reserve one request and ``tokens`` (an
+        estimate) against the budgets until ``release``."""
+        while True:
+            now = time.monotonic()
+            delay = self._admission_delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif self._in_flight < int(self._limit):
+                self._in_flight += 1
+                reservation = Reservation(_Charge(now, 1), _Charge(now, tokens))
+                self._requests.append(reservation.requests)
+                self._tokens.append(reservation.tokens)
+                return reservation
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                heapq.heappush(self._waiters, (-priority, next(self._arrivals), waiter))
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    # Pass a wakeup we may have received on to the next waiter.
+                    self._wake()
+                    raise
+
+    def _wake(self) -> None:
+        free = int(self._limit) - self._in_flight
+        while free > 0 and self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def release(
+        self,
+        requests: int = 0,
+        tokens: int = 0,
+        reservation: Reservation | None = None,
+    ) -> None:
+        """Free a slot and charge the finished run's usage to the budget
+        windows, in place of its reservation."""
+        now = time.monotonic()
+        self._in_flight -= 1
+        if reservation is not None:
+            for window, charge in (
+                (self._requests, reservation.requests),
+                (self._tokens, reservation.tokens),
+            ):
+                if charge in window:
+                    window.remove(charge)
+        if requests:
+            self._requests.append(_Charge(now, requests))
+        if tokens:
+            self._tokens.append(_Charge(now, tokens))
+        self._wake()
+
+    def on_success(self) -> None:
+        # Additive increase: roughly +1 slot per ``limit`` successful runs.
+        self._consecutive_failures = 0
+        self._limit = min(self.maximum, self._limit + 1 / self._limit)
+        self._wake()
+
+    def on_throttled(self, retry_after_s: float | None = None) -> float:
+        """Multiplicative decrease plus a pause on new runs; returns the pause length."""
+        self._consecutive_failures += 1
+        self._limit = max(self.minimum, self._limit / 2)
+        backoff = min(
+            BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** (self._consecutive_failures - 1)
+        )
+        if retry_after_s is not None:
+            backoff = max(backoff, retry_after_s)
+        self._backoff_until = max(self._backoff_until, time.monotonic() + backoff)
+        return backoff
+
+    def snapshot(self) -> LimiterSnapshot:
+        now = time.monotonic()
+        self._prune(now)
+        return LimiterSnapshot(
+            limit=round(self._limit, 2),
+            in_flight=self._in_flight,
+            waiting=sum(1 for _, _, w in self._waiters if not w.done()),
+            consecutive_failures=self._consecutive_failures,
+            backoff_remaining_s=round(max(0.0, self._backoff_until - now), 1),
+            requests_last_minute=_total(self._requests),
+            tokens_last_minute=_total(self._tokens),
+            requests_per_minute=self.requests_per_minute,
+            tokens_per_minute=self.tokens_per_minute,
+        )
+
+
+def _total(window: deque[_Charge]) -> int:
+    return sum(charge.count for charge in window)
+
+
+llm_limiter = AdaptiveLimiter(
+    initial=env.LLM_INITIAL_CONCURRENCY,
+    minimum=env.LLM_MIN_CONCURRENCY,
+    maximum=env.LLM_MAX_CONCURRENCY,
+    requests_per_minute=env.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=env.LLM_TOKENS_PER_MINUTE,
+)
+
+
+def _retry_after_s(error: Exception) -> float | None:
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after', ''))
+    except ValueError:
+        return None
+
+
+async def run_agent(
+    starting_agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    **kwargs: Any,
+) -> RunResult:
+    """``Runner.run`` under the shared limiter, retrying 429s and timeouts.
+
+    Accepts the same keyword arguments as ``Runner.run``. With
+    ``cache_responses`` set, a cached final output is returned without a model
+    call (and replayed into ``conversation_id``, if given), and fresh outputs
+    are stored. With ``batch_responses`` set, eligible runs wait for their
+    answer from a Batch API job instead, outside the limiter. With
+    ``cascade_model`` set, the fast model answers first (see ``_run_cascade``).
+    """
+    cache_key = (
+        response_cache_key(starting_agent, input) if cache_responses.get() else None
+    )
+    if cache_key is not None:
+        raw_output = response_cache.get(cache_key)
+        if raw_output is not None:
+            logger.info(f'{starting_agent.name} served from LLM response cache')
+            conversation_id = kwargs.get('conversation_id')
+            if conversation_id:
+                await replay_into_conversation(conversation_id, input, raw_output)
+            return cached_run_result(
+                starting_agent, input, load_output(starting_agent, raw_output)
+            )
+
+    fast_model = cascade_model.get()
+    model = getattr(starting_agent, 'model', None)
+    answered_by = model
+    if fast_model and isinstance(model, str) and model != fast_model:
+        result, answered_by = await _run_cascade(
+            starting_agent, input, fast_model, **kwargs
+        )
+    else:
+        result = await _run_model(starting_agent, input, **kwargs)
+
+    # The cache key is the agent's own model: a fast model's answer is not
+    # stored under it.
+    if (
+        cache_key is not None
+        and answered_by == model
+        and result.final_output is not None
+    ):
+        response_cache.put(cache_key, dump_output(starting_agent, result.final_output))
+    return result
+
+
+async def _run_model(
+    starting_agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    **kwargs: Any,
+) -> RunResult:
+    """One run on the agent's model, batched or direct, with usage recorded."""
+    cache_routing_key = prompt_cache_key.get()
+    body = (
+        batch_request_body(starting_agent, input)
+        if batch_responses.get() and set(kwargs) <= BATCHABLE_RUN_KWARGS
+        else None
+    )
+    if body is not None:
+        if cache_routing_key is not None:
+            body['prompt_cache_key'] = cache_routing_key
+        result = batch_run_result(
+            starting_agent, input, await batch_collector.run(body)
+        )
+        conversation_id = kwargs.get('conversation_id')
+        if conversation_id:
+            await replay_into_conversation(
+                conversation_id, input, dump_output(starting_agent, result.final_output)
+            )
+    else:
+        if cache_routing_key is not None:
+            kwargs['run_config'] = _with_prompt_cache_key(
+                kwargs.get('run_config'), cache_routing_key
+            )
+        conversation_id = kwargs.get('conversation_id')
+        if conversation_id and is_local_conversation(conversation_id):
+            result = await _run_in_local_conversation(starting_agent, input, **kwargs)
+        else:
+            result = await _run_limited(starting_agent, input, **kwargs)
+
+    usage = run_usage.get()
+    if usage is not None:
+        usage.add(result)
+        model = getattr(starting_agent, 'model', None)
+        if isinstance(model, str):
+            usage.add_model(model)
+    return result
+
+
+# Fast-model clone of each agent, by id of the original and model.
+_fast_agents: dict[tuple[int, str], Agent[Any]] = {}
+
+
+def _fast_agent(agent: Agent[Any], model: str) -> Agent[Any]:
+    key = (id(agent), model)
+    if key not in _fast_agents:
+        _fast_agents[key] = agent.clone(model=model)
+    return _fast_agents[key]
+
+
+def low_confidence(output: Any) -> bool:
+    """Whether the output's top-level ``confidence`` field is ``'low'``.
+
+    Agents opt in to confidence-based escalation by giving their output type
+    a top-level ``confidence`` field (a plain value, an enum, or a
+    ReasoningBlock wrapping either); other cascaded outputs escalate only when
+    they fail validation. A missing or null confidence is not low.
+    """
+    if (
+        not isinstance(output, BaseModel)
+        or 'confidence' not in type(output).model_fields
+    ):
+        return False
+    # Plain values, enums, or a ReasoningBlock wrapping either.
+    value = getattr(output, 'confidence')
+    value = getattr(value, 'value', value)
+    value = value.value if isinstance(value, Enum) else value
+    return isinstance(value, str) and value.lower() == 'low'
+
+
+async def _run_cascade(
+    starting_agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    fast_model: str,
+    conversation_id: str | None = None,
+    **kwargs: Any,
+) -> tuple[RunResult, str]:
+    """Answer with the fast model, escalating to the agent's model when unsure.
+
+    Returns the result and the model that answered. The fast run is made
+    outside the conversation; an accepted answer is then appended to it, so an
+    escalated run does not see the rejected one.
+    """
+    fast = _fast_agent(starting_agent, fast_model)
+    try:
+        result = await _run_model(fast, input, **kwargs)
+    except (ModelBehaviorError, MaxTurnsExceeded) as e:
+        reason = f'{type(e).__name__}: {e}'
+    else:
+        if not low_confidence(result.final_output):
+            if conversation_id:
+                await replay_into_conversation(
+                    conversation_id,
+                    input,
+                    dump_output(starting_agent, result.final_output),
+                )
+            return result, fast_model
+        reason = 'low confidence'
+
+    logger.info(
+        f'{starting_agent.name}: escalating from {fast_model} to '
+        f'{starting_agent.model} ({reason})'
+    )
+    usage = run_usage.get()
+    if usage is not None:
+        usage.escalations += 1
+    if conversation_id:
+        kwargs['conversation_id'] = conversation_id
+    result = await _run_model(starting_agent, input, **kwargs)
+    return result, str(starting_agent.model)
+
+
+def _with_prompt_cache_key(run_config: RunConfig | None, key: str) -> RunConfig:
+    """``run_config`` with ``prompt_cache_key`` added to its model settings."""
+    run_config = run_config or RunConfig()
+    settings = run_config.model_settings or ModelSettings()
+    return replace(
+        run_config,
+        model_settings=settings.resolve(
+            ModelSettings(extra_args={'prompt_cache_key': key})
+        ),
+    )
+
+
+async def _run_in_local_conversation(
+    starting_agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    conversation_id: str,
+    **kwargs: Any,
+) -> RunResult:
+    """Run with a local conversation's history prepended to the input.
+
+    The turn's items are stored only once the run succeeds, so throttled
+    retries do not duplicate them.
+    """
+    history = conversation_items(conversation_id)
+    result = await _run_limited(
+        starting_agent,
+        [*history, *ItemHelpers.input_to_new_input_list(input)],
+        **kwargs,
+    )
+    add_conversation_items(conversation_id, result.to_input_list()[len(history) :])
+    return result
+
+
+class _CreatedItems(RunHooks[Any]):
+    """Collects the ids of the output items of each model response of a run."""
+
+    def __init__(self) -> None:
+        self.item_ids: list[str] = []
+
+    async def on_llm_end(
+        self,
+        context: RunContextWrapper[Any],
+        agent: Agent[Any],
+        response: ModelResponse,
+    ) -> None:
+        for item in response.output:
+            if item_id := getattr(item, 'id', None):
+                self.item_ids.append(item_id)
+
+
+async def _run_limited(
+    starting_agent: Agent[Any],
+    input: str | list[TResponseInputItem],
+    **kwargs: Any,
+) -> RunResult:
+    """``Runner.run`` under the limiter, retrying 429s and timeouts.
+
+    A failed attempt whose model responses were already created has added its
+    input and their outputs to a server-side conversation; those items are
+    deleted before the retry. Attempts that failed before any response was
+    created added nothing, so they cost no extra round trip.
+    """
+    conversation_id = kwargs.get('conversation_id')
+    tokens = estimate_tokens(input)
+    attempt = 0
+    while True:
+        reservation = await llm_limiter.acquire(run_priority.get(), tokens)
+        created = _CreatedItems()
+        run_kwargs = {**kwargs, 'hooks': created} if conversation_id else kwargs
+        result: RunResult | None = None
+        try:
+            result = await Runner.run(starting_agent, input, **run_kwargs)
+        except (openai.RateLimitError, openai.APITimeoutError) as e:
+            backoff = llm_limiter.on_throttled(_retry_after_s(e))
+            attempt += 1
+            if attempt > env.LLM_MAX_THROTTLE_RETRIES:
+                raise
+            if conversation_id and created.item_ids:
+                await delete_conversation_items_from(
+                    conversation_id,
+                    created.item_ids[0],
+                    preceding=len(ItemHelpers.input_to_new_input_list(input)),
+                )
+            logger.warning(
+                f'{starting_agent.name} throttled ({type(e).__name__}); retry '
+                f'{attempt}/{env.LLM_MAX_THROTTLE_RETRIES} after {backoff:.0f}s, '
+                f'concurrency now {llm_limiter.snapshot().limit}'
+            )
+        else:
+            llm_limiter.on_success()
+            return result
+        finally:
+            llm_limiter.release(*usage_totals(result), reservation=reservation)
@@ -4,10 +4,11 @@ import json
 import logging
 from pathlib import Path
 
-from agents import Agent, Runner, function_tool
+from agents import Agent, function_tool
 from openai import OpenAI
 from pydantic import BaseModel
 
+from lib.agents.runner import run_agent
 from lib.core.environment import env
 from lib.core.logging import setup_logging
 from lib.misc.gcs import upload_and_sign_image
@@ -172,7 +173,7 @@ async def correct_tables(paper_id: int, supplement: bool = False) -> None:
         )
 
         # Run agent
-        result = await Runner.run(agent, message)
+        result = await run_agent(agent, message)
 
         if not result.final_output.is_corrupted:
             logger.info(f'Table {table_id} looks OK')
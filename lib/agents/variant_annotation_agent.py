@@ -1,12 +1,32 @@
+"""Variant annotation from gnomAD, ClinVar and Ensembl VEP.
+
+Lookups are async and go through the process's pooled client (see
+``lib.core.http_client``), so a paper's variants are annotated concurrently
+over kept-alive connections. Every request waits for its host's token bucket
+(see ``lib.core.rate_limit``), which keeps all concurrent annotation tasks in
+the process within each upstream's rate limit. Lookups
+fail soft: a failed source is logged and contributes no fields. Results are
+reused from the persistent annotation cache (see
+``lib.agents.annotation_cache``), so a known variant needs no requests.
+"""
+
+import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Optional, Tuple, cast
-
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple, cast
+
+import httpx
+
+from lib.agents.annotation_cache import (
+    CLINVAR,
+    GNOMAD,
+    VEP,
+    annotation_cache,
+    lookup_key,
+)
 from lib.core.environment import env
+from lib.core.http_client import async_client, async_request
 from lib.core.logging import setup_logging
 from lib.models.variant import AnnotatedVariant, HarmonizedVariant, SpliceAI
 
@@ -18,20 +38,88 @@ EUTILS_BASE = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils'
 VEP_BASE = 'https://rest.ensembl.org'
 
 
-def _get_session_with_retries() -> requests.Session:
-    """Create requests session with automatic retry logic."""
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=5,
-        backoff_factor=2,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=['GET', 'POST'],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
+@dataclass
+class _PendingLookup:
+    item: str
+    client: httpx.AsyncClient
+    future: 'asyncio.Future[Any]'
+
+
+class LookupBatcher:
+    """Gathers concurrent single-variant lookups into multi-variant requests.
+
+    ``send(client, group, items)`` makes one request for up to ``max_items``
+    distinct items of a group (e.g. a VEP endpoint) and returns the result of
+    each item it resolved. A request is sent once ``max_items`` lookups are
+    waiting in a group or ``collect_window_s`` after the first arrived, so the
+    annotation tasks of a paper, which run concurrently, share a few requests.
+    Each lookup resolves to its item's result, or to ``None`` if the request
+    failed or did not resolve it, for the caller to fall back to its
+    per-variant request. Use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        send: Callable[[httpx.AsyncClient, str, list[str]], Awaitable[dict[str, Any]]],
+        max_items: int,
+        collect_window_s: float,
+    ) -> None:
+        self.name = name
+        self.send = send
+        self.max_items = max_items
+        self.collect_window_s = collect_window_s
+        self._pending: dict[str, list[_PendingLookup]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        # Strong references to in-flight requests so they are not garbage collected.
+        self._requests: set[asyncio.Task[None]] = set()
+
+    async def lookup(
+        self, client: httpx.AsyncClient, item: str, group: str = ''
+    ) -> Any | None:
+        """Queue an item for the group's next request and wait for its result."""
+        loop = asyncio.get_running_loop()
+        pending = _PendingLookup(item, client, loop.create_future())
+        queue = self._pending.setdefault(group, [])
+        queue.append(pending)
+        if len(queue) >= self.max_items:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(
+                self.collect_window_s, self._flush, group
+            )
+        return await pending.future
+
+    def _flush(self, group: str) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        pending = [p for p in self._pending.pop(group, []) if not p.future.done()]
+        if not pending:
+            return
+        request = asyncio.create_task(self._send(group, pending))
+        self._requests.add(request)
+        request.add_done_callback(self._requests.discard)
+
+    async def _send(self, group: str, pending: list[_PendingLookup]) -> None:
+        items = list(dict.fromkeys(p.item for p in pending))
+        results: dict[str, Any] = {}
+        try:
+            logger.info(f'{self.name} batch request: {len(items)} variants')
+            results = await self.send(pending[0].client, group, items)
+        except Exception as e:
+            logger.error(f'{self.name} batch of {len(items)} variants failed: {e}')
+        for p in pending:
+            if not p.future.done():
+                p.future.set_result(results.get(p.item))
+
+
+def _batching() -> bool:
+    return env.ANNOTATION_BATCH_COLLECT_S > 0
+
 
+# Most UIDs per ESummary request.
+CLINVAR_BATCH_MAX_UIDS = 200
 
 CLINVAR_GOLD_STARS_LOOKUP = {
     'no classification for the single variant': 0,
@@ -46,20 +134,63 @@ CLINVAR_GOLD_STARS_LOOKUP = {
 }
 
 
-def clinvar_lookup(
+def _ncbi_credentials() -> dict[str, str]:
+    params = {}
+    if env.NCBI_API_KEY:
+        params['api_key'] = env.NCBI_API_KEY
+    if env.NCBI_EMAIL:
+        params['email'] = env.NCBI_EMAIL
+    return params
+
+
+async def _fetch_clinvar_summaries(
+    client: httpx.AsyncClient, group: str, uids: list[str]
+) -> dict[str, dict[str, Any]]:
+    """ESummary records by UID, for ``clinvar_summary_batcher``."""
+    r = await async_request(
+        client,
+        'GET',
+        f'{EUTILS_BASE}/esummary.fcgi',
+        params={
+            'db': 'clinvar',
+            'id': ','.join(uids),
+            'retmode': 'json',
+            'rettype': 'vcv',
+            **_ncbi_credentials(),
+        },
+        headers={'content-type': 'application/json'},
+        timeout=30,
+    )
+    summary = r.json().get('result', {})
+    # UIDs ESummary could not summarize come back as {'uid': ..., 'error': ...}.
+    return {
+        uid: summary[uid]
+        for uid in summary.get('uids', [])
+        if uid in summary and 'error' not in summary[uid]
+    }
+
+
+clinvar_summary_batcher = LookupBatcher(
+    'ClinVar esummary',
+    _fetch_clinvar_summaries,
+    CLINVAR_BATCH_MAX_UIDS,
+    env.ANNOTATION_BATCH_COLLECT_S,
+)
+
+
+async def _fetch_clinvar(
+    client: httpx.AsyncClient,
     rsid: Optional[str],
     caid: Optional[str],
     hgvs_g: Optional[str],
     hgvs_c: Optional[str],
-) -> AnnotatedVariant:
+) -> Optional[AnnotatedVariant]:
     headers = {'content-type': 'application/json'}
     result_variant = AnnotatedVariant(rsid=rsid, caid=caid)
 
     if not (caid or rsid or hgvs_g or hgvs_c):
         return result_variant
 
-    session = _get_session_with_retries()
-
     term_parts = []
 
     if rsid:
@@ -88,64 +219,70 @@ def clinvar_lookup(
         },
     )
 
-    if env.NCBI_API_KEY:
-        esearch_params['api_key'] = env.NCBI_API_KEY
-    if env.NCBI_EMAIL:
-        esearch_params['email'] = env.NCBI_EMAIL
+    esearch_params.update(_ncbi_credentials())
 
     try:
-        r = session.get(
+        r = await async_request(
+            client,
+            'GET',
             f'{EUTILS_BASE}/esearch.fcgi',
             params=esearch_params,
             headers=headers,
             timeout=10,
         )
-        r.raise_for_status()
         ids = r.json().get('esearchresult', {}).get('idlist', [])
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f'ClinVar esearch failed for {term}: {e}')
-        return result_variant
+        return None
     except ValueError as e:
         logger.error(f'ClinVar esearch JSON parse failed for {term}: {e}')
-        return result_variant
+        return None
 
     if not ids:
         return result_variant
 
-    # Step 2: ESummary
+    # Step 2: ESummary of the most relevant record, batched with other lookups
+    if _batching():
+        record = await clinvar_summary_batcher.lookup(client, ids[0])
+        if record is not None:
+            return _clinvar_annotations(result_variant, record)
+
     esummary_params = {
         'db': 'clinvar',
         'id': ','.join(ids),
         'retmode': 'json',
         'rettype': 'vcv',
+        **_ncbi_credentials(),
     }
 
-    if env.NCBI_API_KEY:
-        esummary_params['api_key'] = env.NCBI_API_KEY
-    if env.NCBI_EMAIL:
-        esummary_params['email'] = env.NCBI_EMAIL
-
     try:
-        r = session.get(
+        r = await async_request(
+            client,
+            'GET',
             f'{EUTILS_BASE}/esummary.fcgi',
             params=esummary_params,
             headers=headers,
             timeout=10,
         )
-        r.raise_for_status()
         summary = r.json().get('result', {})
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f'ClinVar esummary failed for {term}: {e}')
-        return result_variant
+        return None
     except ValueError as e:
         logger.error(f'ClinVar esummary JSON parse failed for {term}: {e}')
-        return result_variant
+        return None
 
     uids = summary.get('uids', [])
     if not uids:
         return result_variant
 
-    record = summary.get(uids[0], {})
+    return _clinvar_annotations(result_variant, summary.get(uids[0], {}))
+
+
+def _clinvar_annotations(
+    result_variant: AnnotatedVariant, record: dict[str, Any]
+) -> AnnotatedVariant:
+    """Fill in classification fields from a ClinVar ESummary record."""
     germline = record.get('germline_classification', {})
 
     result_variant.pathogenicity = germline.get('description', '')
@@ -157,48 +294,94 @@ def clinvar_lookup(
     return result_variant
 
 
-def vep_lookup(
+VEP_OPTIONS = 'mane=1&numbers=1&SpliceAI=2&REVEL=1&AlphaMissense=1'
+# Ensembl's limit on notations or IDs per VEP POST request.
+VEP_BATCH_MAX_NOTATIONS = 200
+# VEP POST body field for each endpoint.
+VEP_BATCH_FIELDS = {'hgvs': 'hgvs_notations', 'id': 'ids'}
+
+
+async def _post_vep(
+    client: httpx.AsyncClient, endpoint: str, notations: list[str]
+) -> dict[str, dict[str, Any]]:
+    """VEP result entries by notation, for ``vep_batcher``.
+
+    Entries are matched to notations by VEP's ``input`` echo; notations VEP
+    could not parse are left out of the response.
+    """
+    r = await async_request(
+        client,
+        'POST',
+        f'{VEP_BASE}/vep/human/{endpoint}?{VEP_OPTIONS}',
+        json={VEP_BATCH_FIELDS[endpoint]: notations},
+        headers={'Content-Type': 'application/json'},
+        timeout=120,
+    )
+    entries: dict[str, dict[str, Any]] = {}
+    for entry in r.json():
+        entries.setdefault(entry.get('input'), entry)
+    return entries
+
+
+vep_batcher = LookupBatcher(
+    'VEP', _post_vep, VEP_BATCH_MAX_NOTATIONS, env.ANNOTATION_BATCH_COLLECT_S
+)
+
+
+async def _fetch_vep(
+    client: httpx.AsyncClient,
     rsid: str | None,
     hgvs_g: str | None,
     hgvs_c: str | None,
     gene_symbol: str,
-) -> AnnotatedVariant:
-    """Query Ensembl VEP for a given variant identifier and extract key annotations from the most relevant transcript."""
+) -> AnnotatedVariant | None:
+    """Query Ensembl VEP for a given variant identifier and extract key annotations from the most relevant transcript.
+
+    With ``ANNOTATION_BATCH_COLLECT_S`` set the lookup goes through
+    ``vep_batcher``, falling back to a GET for this variant if the batch did
+    not resolve it.
+    """
     if hgvs_g is not None:
-        ext = f'/vep/human/hgvs/{hgvs_g}?mane=1&numbers=1&SpliceAI=2&REVEL=1&AlphaMissense=1'
-        variant_id = hgvs_g
+        endpoint, variant_id = 'hgvs', hgvs_g
     elif hgvs_c is not None:
-        ext = f'/vep/human/hgvs/{hgvs_c}?mane=1&numbers=1&SpliceAI=2&REVEL=1&AlphaMissense=1'
-        variant_id = hgvs_c
+        endpoint, variant_id = 'hgvs', hgvs_c
     elif rsid is not None:
-        ext = (
-            f'/vep/human/id/{rsid}?mane=1&numbers=1&SpliceAI=2&REVEL=1&AlphaMissense=1'
-        )
-        variant_id = rsid
+        endpoint, variant_id = 'id', rsid
     else:
         raise ValueError('Requires rsid or hgvs_g or hgvs_c')
 
-    session = _get_session_with_retries()
+    if _batching():
+        entry = await vep_batcher.lookup(client, variant_id, endpoint)
+        if entry is not None:
+            return _vep_annotations(entry, rsid, gene_symbol)
+
+    ext = f'/vep/human/{endpoint}/{variant_id}?{VEP_OPTIONS}'
     headers = {'Content-Type': 'application/json'}
 
     try:
         logger.info(f'VEP request: {VEP_BASE + ext}')
-        r = session.get(VEP_BASE + ext, headers=headers, timeout=30)
-        r.raise_for_status()
+        r = await async_request(
+            client, 'GET', VEP_BASE + ext, headers=headers, timeout=30
+        )
         data = r.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f'VEP lookup failed for {variant_id}: {e}')
-        return AnnotatedVariant(rsid=rsid)
+        return None
     except ValueError as e:
         logger.error(f'VEP JSON parse failed for {variant_id}: {e}')
+        return None
+
+    if not data:
         return AnnotatedVariant(rsid=rsid)
+    return _vep_annotations(data[0], rsid, gene_symbol)
 
-    result_variant = AnnotatedVariant(rsid=rsid)
 
-    if not data:
-        return result_variant
+def _vep_annotations(
+    variant: dict[str, Any], rsid: str | None, gene_symbol: str
+) -> AnnotatedVariant:
+    """Annotations from the most relevant transcript of one VEP result entry."""
+    result_variant = AnnotatedVariant(rsid=rsid)
 
-    variant = data[0]
     transcripts = variant.get('transcript_consequences', [])
     if not transcripts:
         return result_variant
@@ -239,14 +422,7 @@ def vep_lookup(
     return result_variant
 
 
-def gnomad_lookup(gnomad_style_coordinates: str) -> AnnotatedVariant:
-    headers = {'content-type': 'application/json'}
-
-    result_variant = AnnotatedVariant(gnomad_style_coordinates=gnomad_style_coordinates)
-
-    query = """
-    query ($variantId: String!) {
-      variant(variantId: $variantId, dataset: gnomad_r4) {
+GNOMAD_VARIANT_FIELDS = """{
         variantId
         joint {
           ac
@@ -257,44 +433,133 @@ def gnomad_lookup(gnomad_style_coordinates: str) -> AnnotatedVariant:
             an
           }
         }
-      }
-    }
+      }"""
+# Most variants per aliased gnomAD GraphQL query.
+GNOMAD_BATCH_MAX_VARIANTS = 50
+GNOMAD_HEADERS = {
+    'content-type': 'application/json',
+    'User-Agent': 'Mozilla/5.0',  # required by gnomAD
+}
+
+
+def _gnomad_not_found(errors: list[dict[str, Any]]) -> bool:
+    """Whether GraphQL errors only say the variant is absent from gnomAD."""
+    return all('not found' in str(error.get('message', '')).lower() for error in errors)
+
+
+async def _query_gnomad_batch(
+    client: httpx.AsyncClient, group: str, coordinates: list[str]
+) -> dict[str, AnnotatedVariant]:
+    """Annotations by coordinates from one aliased query, for ``gnomad_batcher``.
+
+    Each variant is queried under its own alias, so errors (which carry the
+    alias as their path) are attributed to single variants. Variants with
+    errors other than "not found" are left out.
     """
+    aliases = {f'v{i}': c for i, c in enumerate(coordinates)}
+    declarations = ', '.join(f'${alias}: String!' for alias in aliases)
+    selections = '\n'.join(
+        f'{alias}: variant(variantId: ${alias}, dataset: gnomad_r4) '
+        f'{GNOMAD_VARIANT_FIELDS}'
+        for alias in aliases
+    )
+    r = await async_request(
+        client,
+        'POST',
+        GNOMAD_BASE,
+        json={
+            'query': f'query ({declarations}) {{\n{selections}\n}}',
+            'variables': aliases,
+        },
+        headers=GNOMAD_HEADERS,
+        timeout=30,
+    )
+    payload = r.json()
+    data = payload.get('data') or {}
+    errors: dict[str | None, list[dict[str, Any]]] = {}
+    for error in payload.get('errors') or []:
+        path = error.get('path') or [None]
+        errors.setdefault(path[0], []).append(error)
+    if None in errors:
+        logger.error(f'gnomAD batch query error: {errors[None]}')
+
+    results = {}
+    for alias, gnomad_style_coordinates in aliases.items():
+        if alias in errors:
+            if not _gnomad_not_found(errors[alias]):
+                continue
+        elif alias not in data:
+            continue
+        results[gnomad_style_coordinates] = _gnomad_annotations(
+            gnomad_style_coordinates, data.get(alias)
+        )
+    return results
+
+
+gnomad_batcher = LookupBatcher(
+    'gnomAD',
+    _query_gnomad_batch,
+    GNOMAD_BATCH_MAX_VARIANTS,
+    env.ANNOTATION_BATCH_COLLECT_S,
+)
 
-    session = _get_session_with_retries()
+
+async def _fetch_gnomad(
+    client: httpx.AsyncClient, gnomad_style_coordinates: str
+) -> AnnotatedVariant | None:
+    if _batching():
+        result = await gnomad_batcher.lookup(client, gnomad_style_coordinates)
+        if result is not None:
+            return cast(AnnotatedVariant, result)
+
+    query = f"""
+    query ($variantId: String!) {{
+      variant(variantId: $variantId, dataset: gnomad_r4) {GNOMAD_VARIANT_FIELDS}
+    }}
+    """
 
     # ---------------------
     # Step 1: GraphQL POST
     # ---------------------
     try:
-        r = session.post(
+        r = await async_request(
+            client,
+            'POST',
             GNOMAD_BASE,
             json={
                 'query': query,
                 'variables': {'variantId': gnomad_style_coordinates},
             },
-            headers={
-                **headers,
-                'User-Agent': 'Mozilla/5.0',  # required by gnomAD
-            },
+            headers=GNOMAD_HEADERS,
             timeout=10,
         )
-        r.raise_for_status()
         payload = r.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f'gnomAD lookup failed for {gnomad_style_coordinates}: {e}')
-        return result_variant
+        return None
     except ValueError as e:
         logger.error(f'gnomAD JSON parse failed for {gnomad_style_coordinates}: {e}')
-        return result_variant
+        return None
 
     if 'errors' in payload:
+        # A variant absent from gnomAD is a result, not a failure.
+        if _gnomad_not_found(payload['errors']):
+            return AnnotatedVariant(gnomad_style_coordinates=gnomad_style_coordinates)
         logger.error(
             f'gnomAD GraphQL error for {gnomad_style_coordinates}: {payload["errors"]}'
         )
-        return result_variant
+        return None
+
+    return _gnomad_annotations(
+        gnomad_style_coordinates, payload.get('data', {}).get('variant')
+    )
 
-    variant = payload.get('data', {}).get('variant')
+
+def _gnomad_annotations(
+    gnomad_style_coordinates: str, variant: dict[str, Any] | None
+) -> AnnotatedVariant:
+    """Allele frequencies from a gnomAD variant, or none if it is absent."""
+    result_variant = AnnotatedVariant(gnomad_style_coordinates=gnomad_style_coordinates)
     if not variant:
         return result_variant
 
@@ -349,49 +614,123 @@ def gnomad_lookup(gnomad_style_coordinates: str) -> AnnotatedVariant:
     return result_variant
 
 
-def enrich_variant(hv: HarmonizedVariant, gene_symbol: str) -> AnnotatedVariant:
+# Fields a lookup echoes from its query rather than annotates.
+IDENTIFIER_FIELDS = {'gnomad_style_coordinates', 'rsid', 'caid'}
+
+
+async def _cached_lookup(
+    source: str,
+    key: str,
+    fetch: Callable[[], Awaitable[AnnotatedVariant | None]],
+    bare: AnnotatedVariant,
+) -> AnnotatedVariant:
+    """Serve a lookup from the annotation cache, or fetch and cache it.
+
+    ``bare`` holds the queried identifiers; it is the result of a failed
+    fetch, which is not cached.
+    """
+    if env.ANNOTATION_CACHE:
+        fields = await asyncio.to_thread(annotation_cache.get, source, key)
+        if fields is not None:
+            return AnnotatedVariant.model_validate(
+                {**bare.model_dump(exclude_none=True), **fields}
+            )
+    result = await fetch()
+    if result is None:
+        return bare
+    if env.ANNOTATION_CACHE:
+        await asyncio.to_thread(
+            annotation_cache.put,
+            source,
+            key,
+            result.model_dump(
+                mode='json', exclude=IDENTIFIER_FIELDS, exclude_none=True
+            ),
+        )
+    return result
+
+
+async def clinvar_lookup(
+    client: httpx.AsyncClient,
+    rsid: Optional[str],
+    caid: Optional[str],
+    hgvs_g: Optional[str],
+    hgvs_c: Optional[str],
+) -> AnnotatedVariant:
+    if not (caid or rsid or hgvs_g or hgvs_c):
+        return AnnotatedVariant(rsid=rsid, caid=caid)
+    return await _cached_lookup(
+        CLINVAR,
+        lookup_key(rsid, caid, hgvs_g, hgvs_c),
+        lambda: _fetch_clinvar(client, rsid, caid, hgvs_g, hgvs_c),
+        AnnotatedVariant(rsid=rsid, caid=caid),
+    )
+
+
+async def vep_lookup(
+    client: httpx.AsyncClient,
+    rsid: str | None,
+    hgvs_g: str | None,
+    hgvs_c: str | None,
+    gene_symbol: str,
+) -> AnnotatedVariant:
+    # The transcript is chosen within the paper's gene, so it is part of the key.
+    variant_id = hgvs_g or hgvs_c or rsid
+    if variant_id is None:
+        raise ValueError('Requires rsid or hgvs_g or hgvs_c')
+    return await _cached_lookup(
+        VEP,
+        lookup_key(variant_id, gene_symbol),
+        lambda: _fetch_vep(client, rsid, hgvs_g, hgvs_c, gene_symbol),
+        AnnotatedVariant(rsid=rsid),
+    )
+
+
+async def gnomad_lookup(
+    client: httpx.AsyncClient, gnomad_style_coordinates: str
+) -> AnnotatedVariant:
+    return await _cached_lookup(
+        GNOMAD,
+        lookup_key(gnomad_style_coordinates),
+        lambda: _fetch_gnomad(client, gnomad_style_coordinates),
+        AnnotatedVariant(gnomad_style_coordinates=gnomad_style_coordinates),
+    )
+
+
+async def enrich_variant(
+    client: httpx.AsyncClient, hv: HarmonizedVariant, gene_symbol: str
+) -> AnnotatedVariant:
     annotated = AnnotatedVariant(
         gnomad_style_coordinates=hv.gnomad_style_coordinates,
         rsid=hv.rsid,
         caid=hv.caid,
     )
 
-    futures = []
-    results: List[AnnotatedVariant] = []
+    lookups = []
+    # Submit lookups conditionally
+    if hv.gnomad_style_coordinates:
+        lookups.append(gnomad_lookup(client, hv.gnomad_style_coordinates))
 
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        # Submit tasks conditionally
-        if hv.gnomad_style_coordinates:
-            futures.append(executor.submit(gnomad_lookup, hv.gnomad_style_coordinates))
+    if hv.rsid or hv.caid or hv.hgvs_g or hv.hgvs_c:
+        lookups.append(clinvar_lookup(client, hv.rsid, hv.caid, hv.hgvs_g, hv.hgvs_c))
 
-        if hv.rsid or hv.caid or hv.hgvs_g or hv.hgvs_c:
-            futures.append(
-                executor.submit(clinvar_lookup, hv.rsid, hv.caid, hv.hgvs_g, hv.hgvs_c)
-            )
+    if hv.rsid or hv.hgvs_g or hv.hgvs_c:
+        lookups.append(vep_lookup(client, hv.rsid, hv.hgvs_g, hv.hgvs_c, gene_symbol))
 
-        if hv.rsid or hv.hgvs_g or hv.hgvs_c:
-            futures.append(
-                executor.submit(vep_lookup, hv.rsid, hv.hgvs_g, hv.hgvs_c, gene_symbol)
+    results: List[AnnotatedVariant] = []
+    for result in await asyncio.gather(*lookups, return_exceptions=True):
+        if isinstance(result, AnnotatedVariant):
+            results.append(result)
+        elif isinstance(result, Exception):
+            # Fail-soft: log individual tool failure
+            variant_id = (
+                hv.gnomad_style_coordinates or hv.rsid or hv.hgvs_g or hv.hgvs_c
+            )
+            logger.error(
+                f'Enrichment tool failed for {variant_id}: {result}', exc_info=result
             )
 
-        # Collect results as they complete
-        for future in as_completed(futures):
-            try:
-                result = future.result()
-                if isinstance(result, AnnotatedVariant):
-                    results.append(result)
-            except Exception as e:
-                # Fail-soft: log individual tool failure
-                variant_id = (
-                    hv.gnomad_style_coordinates or hv.rsid or hv.hgvs_g or hv.hgvs_c
-                )
-                logger.error(
-                    f'Enrichment tool failed for {variant_id}: {e}', exc_info=True
-                )
-                continue
-
-    # Deterministic merge phase
-    # (merge after all threads complete to avoid race conditions)
+    # Deterministic merge phase, in lookup order once all have finished
     for result in results:
         for field_name, field_info in result.model_fields.items():
             value = getattr(result, field_name, None)
@@ -400,20 +739,27 @@ def enrich_variant(hv: HarmonizedVariant, gene_symbol: str) -> AnnotatedVariant:
     return annotated
 
 
-def enrich_variants_batch(
+async def enrich_variants_batch(
     harmonized_variants: List[HarmonizedVariant],
     gene_symbol: str,
+    client: httpx.AsyncClient | None = None,
 ) -> List[AnnotatedVariant]:
-    results: List[AnnotatedVariant] = []
+    """Annotate variants concurrently; variants that fail entirely are skipped.
 
-    for i, hv in enumerate(harmonized_variants, 1):
-        logger.info(
-            f'Enriching variant {i}/{len(harmonized_variants)}: {hv.gnomad_style_coordinates or hv.rsid}'
-        )
-        try:
-            annotated = enrich_variant(hv, gene_symbol)
-            results.append(annotated)
-        except Exception as e:
-            logger.exception(f'Failed to enrich variant: {e}')
+    ``client`` defaults to the shared ``async_client()``.
+    """
+    client = client or async_client()
+    logger.info(f'Enriching {len(harmonized_variants)} variants')
+
+    enriched = await asyncio.gather(
+        *(enrich_variant(client, hv, gene_symbol) for hv in harmonized_variants),
+        return_exceptions=True,
+    )
 
+    results: List[AnnotatedVariant] = []
+    for result in enriched:
+        if isinstance(result, AnnotatedVariant):
+            results.append(result)
+        elif isinstance(result, Exception):
+            logger.error(f'Failed to enrich variant: {result}', exc_info=result)
     return results
@@ -18,8 +18,8 @@ import requests
 from agents import Agent, function_tool
 
 from lib.agents.base_instructions import BASE_SYSTEM_INSTRUCTIONS
-from lib.agents.variant_annotation_agent import _get_session_with_retries
 from lib.core.environment import env
+from lib.core.http_client import http_session, in_thread
 from lib.models.evidence_block import ReasoningBlock
 from lib.models.variant import (
     GenomeBuild,
@@ -45,6 +45,7 @@ VV_VARIANT_VALIDATOR_ENSEMBL_ENDPOINT = (
 
 
 @function_tool
+@in_thread
 def clinvar_lookup(query: str) -> List[Dict[str, Any]]:
     """
     Search ClinVar and return structured info for each matching record:
@@ -75,7 +76,7 @@ def clinvar_lookup(query: str) -> List[Dict[str, Any]]:
     if env.NCBI_EMAIL:
         esearch_params['email'] = env.NCBI_EMAIL
 
-    session = _get_session_with_retries()
+    session = http_session()
     r = session.get(esearch_url, params=esearch_params, headers=headers, timeout=10)
     r.raise_for_status()
     search_data = r.json()
@@ -137,6 +138,7 @@ def clinvar_lookup(query: str) -> List[Dict[str, Any]]:
 
 
 @function_tool
+@in_thread
 def dbsnp_lookup(query: str) -> List[str]:
     """
     Search dbSNP and return genomic HGVS (HGVSg) strings
@@ -145,7 +147,7 @@ def dbsnp_lookup(query: str) -> List[str]:
 
     headers = {'content-type': 'application/json'}
     hgvs_results: List[str] = []
-    session = _get_session_with_retries()
+    session = http_session()
 
     # ---------------------
     # Step 1: ESearch
@@ -221,6 +223,7 @@ def dbsnp_lookup(query: str) -> List[str]:
 
 
 @function_tool
+@in_thread
 def allele_registry_resolver(
     rsid: str | None = None,
     caid: str | None = None,
@@ -259,7 +262,7 @@ def allele_registry_resolver(
 
     url = f'{CLINGEN_ALLELE_REGISTRY_ENDPOINT}/{suffix}'
     headers = {'content-type': 'application/json'}
-    session = _get_session_with_retries()
+    session = http_session()
 
     r = session.get(url, headers=headers, timeout=10)
     r.raise_for_status()
@@ -428,6 +431,7 @@ def allele_registry_resolver(
 
 
 @function_tool
+@in_thread
 def gnomad_style_ids_from_variant_validator(variant_description: str) -> list[str]:
     """
     Given an arbitrary variant_description (hgvsg, hgvsc, hgvsp), use VariantValidator
@@ -444,7 +448,7 @@ def gnomad_style_ids_from_variant_validator(variant_description: str) -> list[st
     )
     url = f'{endpoint}/{GenomeBuild.GRCh38.value}/{encoded_variant_description}/select'
     headers = {'content-type': 'application/json'}
-    session = _get_session_with_retries()
+    session = http_session()
 
     r = session.get(url, headers=headers, timeout=10)
     r.raise_for_status()
@@ -486,6 +490,7 @@ def gnomad_style_ids_from_variant_validator(variant_description: str) -> list[st
 
 
 @function_tool
+@in_thread
 def genomic_accession_for_gene_and_transcript(
     gene_symbol: str, transcript: str
 ) -> Optional[dict[GenomeBuild, str]]:
@@ -501,7 +506,7 @@ def genomic_accession_for_gene_and_transcript(
 
     url = f'{VV_GENE2TRANSCRIPTSV1_ENDPOINT}/{gene_symbol}'
     headers = {'content-type': 'application/json'}
-    session = _get_session_with_retries()
+    session = http_session()
 
     r = session.get(url, headers=headers, timeout=10)
     r.raise_for_status()
@@ -548,6 +553,7 @@ def genomic_accession_for_gene_and_transcript(
 
 
 @function_tool
+@in_thread
 def select_canonical_transcript(
     gene_symbol: str,
     genome_build: GenomeBuild | None,
@@ -575,7 +581,7 @@ def select_canonical_transcript(
     genome_build = GenomeBuild.GRCh38 if not genome_build else genome_build
     url = f'{VV_GENE2TRANSCRIPTSV2_ENDPOINT}/{gene_symbol}/select/all/{genome_build.value}'
     headers = {'content-type': 'application/json'}
-    session = _get_session_with_retries()
+    session = http_session()
 
     r = session.get(url, headers=headers, timeout=10)
     r.raise_for_status()
@@ -634,6 +640,7 @@ def select_canonical_transcript(
 
 
 @function_tool
+@in_thread
 def resolve_transcript_version(transcript: str) -> Optional[dict[str, str]]:
     """
     Resolve an unversioned (or any) transcript to the most recent supported version
@@ -653,7 +660,7 @@ def resolve_transcript_version(transcript: str) -> Optional[dict[str, str]]:
 
     url = f'{VV_GENE2TRANSCRIPTSV1_ENDPOINT}/{base}'
     headers = {'content-type': 'application/json'}
-    session = _get_session_with_retries()
+    session = http_session()
 
     r = session.get(url, headers=headers, timeout=10)
     r.raise_for_status()
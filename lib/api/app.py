@@ -1,4 +1,5 @@
 import asyncio
+import datetime
 import json
 import logging
 import secrets
@@ -9,7 +10,6 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, AsyncGenerator, Optional
 
-from agents import Runner
 from fastapi import (
     Body,
     Depends,
@@ -26,7 +26,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from openai import AsyncOpenAI
 from sqlalchemy import delete, func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload, selectinload
@@ -41,6 +40,7 @@ from lib.agents.chat_routing_agent import (
     ChatRunContext,
     make_routing_agent,
 )
+from lib.agents.conversations import respond_in_conversation
 from lib.agents.general_paper_qa_agent import (
     GENERAL_PAPER_QA_INSTRUCTIONS,
 )
@@ -48,10 +48,17 @@ from lib.agents.general_paper_qa_agent import (
     agent as general_paper_qa_agent,
 )
 from lib.agents.run_tracking import ensure_agent_run
+from lib.agents.runner import (
+    LimiterSnapshot,
+    llm_limiter,
+    prompt_cache_key,
+    run_agent,
+)
 from lib.api.auth import get_current_user, get_current_user_optional
 from lib.api.db import get_session, session_scope
 from lib.api.middleware import make_log_request_middleware
 from lib.core.environment import env
+from lib.core.http_client import HostHttpStats, http_stats
 from lib.core.logging import setup_logging
 from lib.core.security import (
     create_access_token,
@@ -81,7 +88,6 @@ from lib.misc.pdf.paths import (
     pdf_supplements_dir,
     pdf_thumbnail_path,
     pdf_words_json_path,
-    relevant_sections_md,
 )
 from lib.models import (
     AgentRunDB,
@@ -148,9 +154,18 @@ from lib.models.patient import (
     TwinType,
 )
 from lib.models.segregation_analysis import SegregationAnalysisComputedNestedResp
-from lib.tasks import TaskCreateRequest, TaskResp, enqueue_all_instances, enqueue_task
-from lib.tasks.handlers import ensure_conversation_id, format_paper_context
-from lib.tasks.models import TaskStatus, TaskType
+from lib.tasks import (
+    TaskCreateRequest,
+    TaskPriority,
+    TaskResp,
+    enqueue_all_instances,
+    enqueue_task,
+)
+from lib.tasks.handlers import ensure_conversation_id
+from lib.tasks.models import TaskStatsResp, TaskStatus, TaskType
+from lib.tasks.prompts import build_fulltext_context, paper_prompt_cache_key
+from lib.tasks.stats import task_type_stats
+from lib.tasks.wakeup import notify_workers_on_commit
 
 logger = logging.getLogger(__name__)
 
@@ -207,6 +222,32 @@ def get_status() -> dict[str, str]:
     return {'status': 'ok'}
 
 
+@app.get('/status/llm', response_model=LimiterSnapshot, tags=['health'])
+def get_llm_limiter_status() -> Any:
+    """Adaptive LLM limiter state for this API process (chat traffic)."""
+    return llm_limiter.snapshot()
+
+
+@app.get('/status/http', response_model=list[HostHttpStats], tags=['health'])
+def get_http_status() -> Any:
+    """External API call counts and latency per host for this API process."""
+    return http_stats.snapshot()
+
+
+@app.get('/tasks/stats', response_model=TaskStatsResp, tags=['health'])
+def get_task_stats(
+    window_hours: float = Query(24, gt=0),
+    session: Session = Depends(get_session),
+) -> Any:
+    """Queue wait, run time, latency percentiles and throughput per task type.
+
+    Covers task attempts that finished within the last ``window_hours``.
+    """
+    until = datetime.datetime.now(datetime.timezone.utc)
+    since = until - datetime.timedelta(hours=window_hours)
+    return task_type_stats(session, since, until)
+
+
 @app.post(
     '/auth/register',
     response_model=UserResp,
@@ -343,6 +384,7 @@ def put_paper(
         )
         paper_db.tasks.append(task)
         session.flush()
+        notify_workers_on_commit(session)
 
         pdf_raw_path(paper_db.id).parent.mkdir(parents=True, exist_ok=True)
         with open(pdf_raw_path(paper_db.id), 'wb') as f:
@@ -681,6 +723,7 @@ def create_task(
             skip_successors=request.skip_successors,
             additional_context=request.additional_context,
             updated_by_user_id=current_user.id,
+            priority=TaskPriority.INTERACTIVE,
         )
     else:
         task = enqueue_task(
@@ -695,6 +738,7 @@ def create_task(
             skip_successors=request.skip_successors,
             additional_context=request.additional_context,
             updated_by_user_id=current_user.id,
+            priority=TaskPriority.INTERACTIVE,
         )
         tasks = [task]
     return tasks
@@ -1738,7 +1782,7 @@ async def init_chat(
         routing_input = (
             f'{CHAT_ROUTING_INSTRUCTIONS}\n\nUser question: {request.message}'
         )
-        routing_result = await Runner.run(
+        routing_result = await run_agent(
             make_routing_agent(paper_id, current_user.id),
             routing_input,
             context=chat_ctx,
@@ -1879,8 +1923,7 @@ def _build_qa_context(
         'segregation_analysis': [row_to_dict(r) for r in seg_computed],
     }
 
-    paper_md = relevant_sections_md(paper_id, paper_db.supplement_format)
-    paper_context = format_paper_context(paper_md)
+    paper_context = build_fulltext_context(paper_id, paper_db.supplement_format)
     db_state_context = f'CAA Extracted State:\n{json.dumps(db_state, default=str)}'
 
     return paper_context, db_state_context, GENERAL_PAPER_QA_INSTRUCTIONS
@@ -1942,19 +1985,16 @@ async def generate_chat_response(
             f'User question: {last_user_message}'
         )
         new_conv_id = await ensure_conversation_id(None)
-        result = await Runner.run(
+        prompt_cache_key.set(paper_prompt_cache_key(paper_id))
+        result = await run_agent(
             general_paper_qa_agent, qa_input, conversation_id=new_conv_id
         )
         response_text = result.final_output
         conversation_db.conversation_id = new_conv_id
     else:
-        client = AsyncOpenAI(api_key=env.OPENAI_API_KEY)
-        resp = await client.responses.create(
-            model=env.OPENAI_API_DEPLOYMENT,
-            input=last_user_message,
-            conversation=conversation_db.conversation_id,
+        response_text = await respond_in_conversation(
+            conversation_db.conversation_id, last_user_message
         )
-        response_text = resp.output_text or ''
 
     conversation_db.messages = [
         *conversation_db.messages,
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Drop entries from the gnomAD/ClinVar/VEP annotation cache.
+
+Cached lookups are otherwise reused until their source's TTL expires (see
+``lib.agents.annotation_cache``). Use this after an upstream release or a
+ClinVar reclassification to force variants to be re-annotated; re-run the
+VARIANT_ANNOTATION tasks afterwards to refresh stored annotations.
+
+Usage:
+    uv run python -m lib.bin.invalidate_annotation_cache [--source SOURCE]
+        [--not-found-only] [IDENTIFIER ...]
+    uv run python -m lib.bin.invalidate_annotation_cache --all
+    uv run python -m lib.bin.invalidate_annotation_cache --expired
+
+Identifiers are rsIDs, CAids, gnomAD-style coordinates, HGVS strings or gene
+symbols; every entry whose lookup used one of them is dropped.
+"""
+
+import argparse
+import sys
+
+from lib.agents.annotation_cache import SOURCES, annotation_cache
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Drop entries from the variant annotation cache.'
+    )
+    parser.add_argument('identifiers', nargs='*', metavar='IDENTIFIER')
+    parser.add_argument('--source', choices=SOURCES)
+    parser.add_argument(
+        '--not-found-only',
+        action='store_true',
+        help='only drop cached "not found" results',
+    )
+    parser.add_argument('--all', action='store_true', help='drop every entry')
+    parser.add_argument(
+        '--expired', action='store_true', help='drop entries past their TTL'
+    )
+    args = parser.parse_args(argv)
+
+    if args.expired:
+        deleted = annotation_cache.purge_expired()
+    elif args.identifiers:
+        deleted = sum(
+            annotation_cache.invalidate(args.source, identifier, args.not_found_only)
+            for identifier in args.identifiers
+        )
+    elif args.all or args.source or args.not_found_only:
+        deleted = annotation_cache.invalidate(
+            args.source, not_found_only=args.not_found_only
+        )
+    else:
+        print(
+            'Error: give identifiers, --source, --not-found-only, --all or --expired',
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    print(f'Dropped {deleted} annotation cache entries.')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,29 +4,112 @@ import datetime
 import logging
 import os
 import signal
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
 from types import FrameType
 from typing import Any
 
+from lib.agents.runner import (
+    RunUsage,
+    batch_responses,
+    cache_responses,
+    cascade_model,
+    llm_limiter,
+    prompt_cache_key,
+    run_priority,
+    run_usage,
+)
 from lib.api.db import session_scope
+from lib.core.environment import env
+from lib.core.http_client import http_stats
 from lib.core.logging import setup_logging
-from lib.models import TaskDB
+from lib.misc.pdf.parse import warm_parse_pool
 from lib.models.paper import PaperDB
 from lib.tasks.handlers import TASK_HANDLERS
 from lib.tasks.misc import enqueue_successors
-from lib.tasks.models import TaskStatus, TaskType
+from lib.tasks.models import (
+    TaskAttemptOutcome,
+    TaskDB,
+    TaskPriority,
+    TaskStatus,
+    TaskType,
+)
+from lib.tasks.prompts import paper_prompt_cache_key
+from lib.tasks.queue import (
+    ClaimedTask,
+    claim_tasks,
+    finish_attempt,
+    recover_expired_leases,
+    release_task,
+    renew_leases,
+    requeue_failed_tasks,
+    start_task,
+    worker_identity,
+)
+from lib.tasks.wakeup import listen_for_wakeups, notify_workers, wakeup_socket_path
 
-LEASE_TIMEOUT_S = 1800
-POLL_INTERVAL_S = 10
+# Held leases are renewed every HEARTBEAT_INTERVAL_S; a lease whose heartbeat is
+# older than LEASE_TIMEOUT_S belongs to a dead worker and is reclaimed.
+HEARTBEAT_INTERVAL_S = 15
+LEASE_TIMEOUT_S = 60
+# New work wakes the worker immediately (see lib.tasks.wakeup); this slow poll
+# only catches missed wakeups.
+POLL_INTERVAL_S = 60
 MAX_RETRIES = 2
 RETRY_DELAY_S = 30
 
-GLOBAL_CONCURRENCY = 30
+# Task types whose agents make one model call with no tools, so their bulk
+# runs can be answered through the Batch API (see lib.agents.batch).
+BATCHABLE_TASK_TYPES = {
+    TaskType.PAPER_CLASSIFIER,
+    TaskType.VARIANT_EXTRACTION,
+    TaskType.PATIENT_EXTRACTION,
+    TaskType.PATIENT_DEMOGRAPHICS,
+    TaskType.SEGREGATION_EVIDENCE_EXTRACTION,
+    TaskType.PATIENT_VARIANT_OCCURRENCES,
+    TaskType.COMPOUND_HET_EVALUATION,
+    TaskType.PHENOTYPE_EXTRACTION,
+}
+
+# Per-process limits: each worker claims only what it can run right now, so
+# throughput scales by starting more worker processes against the same DB. In
+# batch mode bulk tasks of batchable types just wait on a Batch API job, so a
+# worker holds enough of them to fill one job; other types keep their usual
+# limits, and direct model calls are still bounded by the LLM limiter.
+DEFAULT_CONCURRENCY = 20
+GLOBAL_CONCURRENCY = env.LLM_BATCH_MAX_REQUESTS + 30 if env.LLM_BATCH_MODE else 30
 TASK_CONCURRENCY: dict[TaskType, int] = {
-    TaskType.PDF_PARSING: 1,
+    # Conversion runs in the parse process pool, one document per process.
+    TaskType.PDF_PARSING: env.PDF_PARSE_WORKERS,
     TaskType.VARIANT_HARMONIZATION: 10,
-    TaskType.VARIANT_ANNOTATION: 10,
+    # Annotation is async I/O paced by per-host rate limits (lib.core.rate_limit),
+    # so a paper's variants can all be in flight at once.
+    TaskType.VARIANT_ANNOTATION: 25,
 }
-DEFAULT_CONCURRENCY = 20
+if env.LLM_BATCH_MODE:
+    TASK_CONCURRENCY |= dict.fromkeys(BATCHABLE_TASK_TYPES, env.LLM_BATCH_MAX_REQUESTS)
+
+# Slots of GLOBAL_CONCURRENCY that bulk work may never fill, so a curator's
+# interactive task starts immediately even while a large upload is processing.
+# Per type, interactive tasks are counted only against each other (bulk tasks
+# holding every slot of a type do not block them), so a type may briefly run
+# up to twice its TASK_CONCURRENCY.
+INTERACTIVE_RESERVED_SLOTS = 5
+
+
+def _task_types(setting: str) -> set[TaskType]:
+    """Task types named in a comma-separated setting, or all for 'all'."""
+    if setting.strip().lower() == 'all':
+        return set(TaskType)
+    return {TaskType[name.strip()] for name in setting.split(',') if name.strip()}
+
+
+# Task types whose agent runs may be answered from the LLM response cache.
+CACHED_TASK_TYPES = _task_types(env.LLM_CACHE_TASK_TYPES)
+# Task types whose agent runs try LLM_FAST_MODEL before the agent's model.
+CASCADE_TASK_TYPES = _task_types(env.LLM_CASCADE_TASK_TYPES)
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -35,6 +118,7 @@ logger = logging.getLogger(__name__)
 def _signal_handler(sig: int, frame: FrameType | None) -> None:
     """Handle SIGINT and SIGTERM by exiting immediately."""
     logger.info(f'Received signal {sig}, shutting down')
+    wakeup_socket_path().unlink(missing_ok=True)
     os._exit(0)
 
 
@@ -42,173 +126,243 @@ signal.signal(signal.SIGINT, _signal_handler)
 signal.signal(signal.SIGTERM, _signal_handler)
 
 
-async def execute_task(task_id: int) -> None:
-    """Execute a single task handler."""
+@dataclass
+class WorkerState:
+    """Per-process scheduling state: identity, held tasks, and the wakeup event.
+
+    ``running`` is written by the event loop and read by the heartbeat thread,
+    so access goes through ``lock``.
+    """
+
+    worker_id: str
+    wakeup: asyncio.Event
+    running: dict[int, tuple[ClaimedTask, 'asyncio.Task[None]']] = field(
+        default_factory=dict
+    )
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def free_capacity(
+        self,
+    ) -> tuple[dict[TaskType, int], dict[TaskType, int], int, int]:
+        """Interactive and bulk per-type slots, and total and bulk-lane slots,
+        this process can still fill."""
+        with self.lock:
+            claims = [claim for claim, _ in self.running.values()]
+        in_flight = Counter(claim.type for claim in claims)
+        interactive_in_flight = Counter(
+            claim.type for claim in claims if claim.priority >= TaskPriority.INTERACTIVE
+        )
+        limits = {
+            task_type: TASK_CONCURRENCY.get(task_type, DEFAULT_CONCURRENCY)
+            for task_type in TaskType
+        }
+        interactive_per_type = {
+            task_type: limit - interactive_in_flight[task_type]
+            for task_type, limit in limits.items()
+        }
+        bulk_per_type = {
+            task_type: limit - in_flight[task_type]
+            for task_type, limit in limits.items()
+        }
+        total = GLOBAL_CONCURRENCY - len(claims)
+        bulk = (
+            GLOBAL_CONCURRENCY
+            - INTERACTIVE_RESERVED_SLOTS
+            - (len(claims) - interactive_in_flight.total())
+        )
+        return interactive_per_type, bulk_per_type, total, min(total, bulk)
+
+
+async def execute_task(claim: ClaimedTask) -> None:
+    """Execute a single claimed task handler."""
     # Mark task as RUNNING, then close session before async work
-    task_type = None
     with session_scope() as session:
-        task = session.get(TaskDB, task_id)
-        if not task:
-            logger.warning(f'Task {task_id} not found')
+        attempt = start_task(session, claim.id, claim.lease_owner, claim.claimed_at)
+        if attempt is None:
+            logger.warning(f'Task {claim.id} lost its lease before starting')
             return
+        attempt_id = attempt.id
+        task = session.get(TaskDB, claim.id)
+        has_followup = task is not None and task.additional_context is not None
+        paper_id = task.paper_id if task is not None else None
 
-        task.status = TaskStatus.RUNNING
-        task.updated_at = datetime.datetime.now(datetime.timezone.utc)
-        task.tries += 1
-        task_type = task.type
+    # LLM calls made by this task queue in the limiter by the task's lane, and
+    # their token usage is recorded with the attempt. Follow-up questions
+    # always go to the model. In batch mode, bulk work is answered through
+    # Batch API jobs. All of a paper's runs share one provider prompt cache.
+    # Leaf task types try the fast model first; follow-ups get the main model.
+    run_priority.set(claim.priority)
+    prompt_cache_key.set(
+        paper_prompt_cache_key(paper_id) if paper_id is not None else None
+    )
+    cache_responses.set(claim.type in CACHED_TASK_TYPES and not has_followup)
+    batch_responses.set(
+        env.LLM_BATCH_MODE
+        and claim.type in BATCHABLE_TASK_TYPES
+        and claim.priority < TaskPriority.INTERACTIVE
+        and not has_followup
+    )
+    cascade_model.set(
+        env.LLM_FAST_MODEL
+        if claim.type in CASCADE_TASK_TYPES and not has_followup
+        else None
+    )
+    usage = RunUsage()
+    run_usage.set(usage)
 
     # Handler manages its own session - no session held across async boundaries
-    handler = TASK_HANDLERS[task_type]
+    handler = TASK_HANDLERS[claim.type]
     error_msg = None
     try:
-        await handler(task_id)
+        await handler(claim.id)
     except Exception as e:
-        logger.exception(f'Task {task_id} ({task_type}) failed')
+        logger.exception(f'Task {claim.id} ({claim.type}) failed')
         error_msg = str(e)
 
-    # Update final status in a new session
+    # Update final status in a new session, only if we still hold the lease
     with session_scope() as session:
-        task = session.get(TaskDB, task_id)
-        if task:
-            now = datetime.datetime.now(datetime.timezone.utc)
-            if error_msg is None:
-                task.status = TaskStatus.COMPLETED
-                task.updated_at = now
-                task.error_message = None
-                if not task.skip_successors:
-                    enqueue_successors(session, task)
-            else:
-                task.status = TaskStatus.FAILED
-                task.updated_at = now
-                task.error_message = error_msg
-            paper = session.get(PaperDB, task.paper_id)
-            if paper:
-                paper.updated_at = now
-
-
-async def execute_task_with_semaphore(
-    task_id: int,
-    global_semaphore: asyncio.Semaphore,
-    type_semaphore: asyncio.Semaphore,
-) -> None:
-    """Execute task, respecting global and type-specific concurrency limits."""
-    async with global_semaphore, type_semaphore:
-        await execute_task(task_id)
-
-
-async def poll_and_schedule_tasks(
-    global_semaphore: asyncio.Semaphore,
-    semaphores: dict[TaskType, asyncio.Semaphore],
-) -> None:
-    """Poll for pending tasks and schedule them (non-blocking)."""
-    with session_scope() as session:
-        now = datetime.datetime.now(datetime.timezone.utc)
-        expired_cutoff = now - datetime.timedelta(seconds=LEASE_TIMEOUT_S)
-
-        # Reset timed-out RUNNING/QUEUED tasks back to PENDING (only if retries remain)
-        timed_out_tasks = (
-            session.query(TaskDB)
-            .filter(
-                TaskDB.status.in_([TaskStatus.RUNNING, TaskStatus.QUEUED]),
-                TaskDB.updated_at < expired_cutoff,
-            )
-            .all()
+        task = release_task(
+            session,
+            claim.id,
+            claim.lease_owner,
+            TaskStatus.COMPLETED if error_msg is None else TaskStatus.FAILED,
+            error_msg,
         )
-        for task in timed_out_tasks:
-            if task.tries < MAX_RETRIES:
-                logger.info(
-                    f'Resetting timed-out task {task.id} ({task.type}) (attempt {task.tries + 1}/{MAX_RETRIES + 1})'
-                )
-                task.status = TaskStatus.PENDING
-                task.conversation_id = None
-            else:
-                logger.info(
-                    f'Abandoning timed-out task {task.id} ({task.type}) (exhausted retries at {task.tries})'
-                )
-                task.status = TaskStatus.FAILED
-                task.error_message = (
-                    f'Task exceeded lease timeout ({LEASE_TIMEOUT_S}s) and max retries'
-                )
-            task.updated_at = now
-
-        # Reset FAILED tasks that haven't exceeded retry limit back to PENDING
-        retry_cutoff = now - datetime.timedelta(seconds=RETRY_DELAY_S)
-        retriable_tasks = (
-            session.query(TaskDB)
-            .filter(
-                TaskDB.status == TaskStatus.FAILED,
-                TaskDB.tries <= MAX_RETRIES,
-                TaskDB.updated_at < retry_cutoff,
+        if task is None:
+            outcome = TaskAttemptOutcome.LEASE_LOST
+        elif error_msg is None:
+            outcome = TaskAttemptOutcome.COMPLETED
+        else:
+            outcome = TaskAttemptOutcome.FAILED
+        finish_attempt(session, attempt_id, outcome, error_msg, usage)
+        if task is None:
+            logger.warning(
+                f'Task {claim.id} ({claim.type}) lost its lease while running; '
+                'leaving its status to the new owner'
             )
-            .all()
+            return
+        if error_msg is None and not task.skip_successors:
+            enqueue_successors(session, task)
+        paper = session.get(PaperDB, task.paper_id)
+        if paper:
+            paper.updated_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+async def run_claimed_task(claim: ClaimedTask, state: WorkerState) -> None:
+    """Run a claimed task, then free its slot and wake the poller to refill it."""
+    try:
+        await execute_task(claim)
+    except asyncio.CancelledError:
+        logger.warning(
+            f'Task {claim.id} ({claim.type}) cancelled after losing its lease'
         )
-        for task in retriable_tasks:
-            logger.info(
-                f'Retrying task {task.id} ({task.type}) (attempt {task.tries + 1}/{MAX_RETRIES + 1})'
-            )
-            task.status = TaskStatus.PENDING
-            task.updated_at = now
-            task.error_message = None
-            task.conversation_id = None
-
-        session.flush()
-
-        # Fetch pending tasks grouped by type
-        pending_tasks: dict[TaskType, list[int]] = {}
-        for task_type in TaskType:
-            limit = TASK_CONCURRENCY.get(task_type, DEFAULT_CONCURRENCY)
-            tier_tasks = (
-                session.query(TaskDB)
-                .filter(
-                    TaskDB.type == task_type,
-                    TaskDB.status == TaskStatus.PENDING,
+    finally:
+        with state.lock:
+            state.running.pop(claim.id, None)
+        state.wakeup.set()
+
+
+def heartbeat(state: WorkerState, loop: asyncio.AbstractEventLoop) -> None:
+    """Renew held leases, reclaim dead ones, and requeue retriable failures.
+
+    Runs forever in a daemon thread so leases keep renewing even while a
+    handler hogs the event loop. A held task whose lease was not renewed has
+    been reclaimed by another worker, so it is cancelled here rather than left
+    to run twice.
+    """
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL_S)
+        try:
+            with state.lock:
+                held = dict(state.running)
+            with session_scope() as session:
+                renewed = renew_leases(
+                    session, {claim.lease_owner for claim, _ in held.values()}
                 )
-                .limit(limit)
-                .all()
-            )
-            if tier_tasks:
-                pending_tasks[task_type] = [t.id for t in tier_tasks]
-                # Mark as QUEUED to prevent re-scheduling before execution
-                for task in tier_tasks:
-                    task.status = TaskStatus.QUEUED
-                    task.updated_at = now
+                requeued = recover_expired_leases(
+                    session, LEASE_TIMEOUT_S, MAX_RETRIES
+                ) + requeue_failed_tasks(session, RETRY_DELAY_S, MAX_RETRIES)
+            for task_id, (claim, handle) in held.items():
+                if task_id not in renewed:
+                    logger.warning(
+                        f'Task {task_id} ({claim.type}) lost its lease; cancelling'
+                    )
+                    loop.call_soon_threadsafe(handle.cancel)
+            if requeued:
+                notify_workers()
+        except Exception:
+            logger.exception('Unexpected error in lease heartbeat')
+
+
+async def poll_and_schedule_tasks(state: WorkerState) -> None:
+    """Claim pending tasks up to this process's free capacity and start them.
 
-        session.flush()
+    The interactive lane is claimed first and may use every free slot, with
+    per-type limits counting only interactive tasks; bulk work then fills what
+    is left outside the interactive reservation, shared round-robin across
+    papers and capped per paper.
+    """
+    interactive_per_type, bulk_per_type, total, bulk = state.free_capacity()
+    with session_scope() as session:
+        claims = claim_tasks(
+            session,
+            state.worker_id,
+            interactive_per_type,
+            total,
+            lane=TaskPriority.INTERACTIVE,
+        )
+        for claim in claims:
+            bulk_per_type[claim.type] -= 1
+        claims += claim_tasks(
+            session,
+            state.worker_id,
+            bulk_per_type,
+            min(total - len(claims), bulk),
+            lane=TaskPriority.BULK,
+            paper_cap=env.MAX_IN_FLIGHT_TASKS_PER_PAPER,
+        )
 
-    if not pending_tasks:
+    if not claims:
         logger.info('Found no pending tasks')
         return
 
-    # Schedule tasks with global and type-specific semaphores (non-blocking)
-    total_scheduled = 0
-    for task_type, task_ids in pending_tasks.items():
-        for task_id in task_ids:
-            asyncio.create_task(
-                execute_task_with_semaphore(
-                    task_id, global_semaphore, semaphores[task_type]
-                )
-            )
-            total_scheduled += 1
-    logger.info(f'Scheduled {total_scheduled} tasks')
+    with state.lock:
+        for claim in claims:
+            handle = asyncio.create_task(run_claimed_task(claim, state))
+            state.running[claim.id] = (claim, handle)
+    logger.info(f'Scheduled {len(claims)} tasks')
 
 
 async def main_async() -> None:
-    """Main async loop: continuously poll for tasks and schedule them."""
-    # Create global and type-specific semaphores
-    global_semaphore = asyncio.Semaphore(GLOBAL_CONCURRENCY)
-    semaphores: dict[TaskType, asyncio.Semaphore] = {}
-    for task_type in TaskType:
-        limit = TASK_CONCURRENCY.get(task_type, DEFAULT_CONCURRENCY)
-        semaphores[task_type] = asyncio.Semaphore(limit)
-
-    logger.info('Starting task worker')
+    """Main async loop: schedule tasks whenever woken, or every POLL_INTERVAL_S."""
+    # Set by the local wakeup socket (API enqueues, other workers) and by
+    # run_claimed_task whenever a slot frees up.
+    state = WorkerState(worker_id=worker_identity(), wakeup=asyncio.Event())
+    listen_for_wakeups(state.wakeup)
+    # Load docling models in the background so the first PDF doesn't pay for it.
+    warm_parse_pool()
+    threading.Thread(
+        target=heartbeat,
+        args=(state, asyncio.get_running_loop()),
+        name='lease-heartbeat',
+        daemon=True,
+    ).start()
+
+    logger.info(f'Starting task worker {state.worker_id}')
     while True:
-        logger.info('Looking for work')
+        logger.info(f'Looking for work (LLM limiter: {llm_limiter.snapshot()})')
+        for host in http_stats.snapshot():
+            logger.info(f'HTTP calls: {host}')
+        # Clear before polling so a wakeup that lands mid-poll triggers another pass.
+        state.wakeup.clear()
         try:
-            await poll_and_schedule_tasks(global_semaphore, semaphores)
+            await poll_and_schedule_tasks(state)
         except Exception:
             logger.exception('Unexpected error in worker loop')
-        await asyncio.sleep(POLL_INTERVAL_S)
+        try:
+            await asyncio.wait_for(state.wakeup.wait(), timeout=POLL_INTERVAL_S)
+        except TimeoutError:
+            pass
 
 
 def main() -> None:
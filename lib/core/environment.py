@@ -2,7 +2,7 @@ import inspect
 import os
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 from urllib.parse import quote
 
 from pydantic import Field, field_validator, model_validator
@@ -22,6 +22,35 @@ class Env(BaseSettings):
     NCBI_API_KEY: Optional[str] = None
     NCBI_EMAIL: Optional[str] = None
 
+    # Upstream annotation API rate limits for the whole deployment (see
+    # lib.core.rate_limit); NCBI's follows from NCBI_API_KEY. Each process
+    # enforces its share, the limit divided by WORKER_PROCESSES, so set that
+    # to the number of worker processes sharing the limits.
+    ENSEMBL_REQUESTS_PER_S: float = 15.0
+    GNOMAD_REQUESTS_PER_S: float = 10.0
+    WORKER_PROCESSES: int = 1
+
+    # Shared HTTP clients for external APIs (see lib.core.http_client):
+    # keep-alive pool size per host, default timeout, and retries of
+    # throttling/server errors.
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_TIMEOUT_S: float = 30.0
+    HTTP_MAX_RETRIES: int = 5
+
+    # Annotation cache (see lib.agents.annotation_cache): gnomAD, ClinVar and
+    # VEP lookup results are reused until their source's TTL, and lookups that
+    # found nothing for ANNOTATION_CACHE_NEGATIVE_TTL_DAYS.
+    ANNOTATION_CACHE: bool = True
+    GNOMAD_CACHE_TTL_DAYS: float = 180
+    CLINVAR_CACHE_TTL_DAYS: float = 30
+    VEP_CACHE_TTL_DAYS: float = 90
+    ANNOTATION_CACHE_NEGATIVE_TTL_DAYS: float = 7
+
+    # gnomAD, ClinVar ESummary and VEP lookups made within this many seconds
+    # of each other are sent as multi-variant requests (see
+    # variant_annotation_agent.LookupBatcher); 0 sends one request per variant.
+    ANNOTATION_BATCH_COLLECT_S: float = 0.5
+
     # GCS configuration
     GCS_BUCKET_NAME: str = 'caa-static-resources'
     GCS_SIGNED_URL_EXPIRY_HOURS: int = 12
@@ -33,6 +62,56 @@ class Env(BaseSettings):
     OPENAI_VLM: str = 'gpt-5.6-sol'
     LOG_LEVEL: LogLevel = LogLevel.INFO
 
+    # LLM rate limiting (per process; see lib.agents.runner)
+    LLM_INITIAL_CONCURRENCY: int = 8
+    LLM_MIN_CONCURRENCY: int = 1
+    LLM_MAX_CONCURRENCY: int = 30
+    LLM_REQUESTS_PER_MINUTE: Optional[int] = None
+    LLM_TOKENS_PER_MINUTE: Optional[int] = None
+    LLM_MAX_THROTTLE_RETRIES: int = 4
+
+    # LLM response cache (see lib.agents.response_cache). Comma-separated
+    # TaskType names whose agent runs may be served from the cache, or 'all'.
+    LLM_CACHE_TASK_TYPES: str = ''
+    LLM_CACHE_MAX_MB: int = 512
+
+    # Batch API mode for bulk backfills (see lib.agents.batch). When enabled,
+    # single-call agent runs from bulk-lane tasks are submitted as Batch API
+    # jobs. LLM_BATCH_ENDPOINT is 'openai' or 'local' (in-process stand-in).
+    LLM_BATCH_MODE: bool = False
+    LLM_BATCH_ENDPOINT: str = 'openai'
+    LLM_BATCH_MAX_REQUESTS: int = 500
+    LLM_BATCH_COLLECT_S: float = 30
+    LLM_BATCH_POLL_INTERVAL_S: float = 60
+
+    # Model cascade (see lib.agents.runner.cascade_model): runs for these
+    # comma-separated TaskType names (or 'all') are answered by LLM_FAST_MODEL
+    # first and re-run on the agent's model when the answer fails validation or
+    # reports low confidence. Disabled while LLM_FAST_MODEL is unset.
+    LLM_FAST_MODEL: Optional[str] = None
+    LLM_CASCADE_TASK_TYPES: str = 'HPO_LINKING,MONDO_LINKING'
+
+    # Where agent conversations live (see lib.agents.conversations): 'openai'
+    # (Conversations API) or 'local' (conversation_items table). Existing
+    # conversations keep using the store they were created in.
+    LLM_CONVERSATION_STORE: Literal['openai', 'local'] = 'openai'
+
+    # Token budget for the paper excerpts sent to per-entity agents (see
+    # lib.tasks.prompts.build_entity_context); 0 sends the relevant sections.
+    RETRIEVAL_CONTEXT_MAX_TOKENS: int = 8000
+
+    # Compact evidence output (see lib.agents.evidence_anchors): agents cite
+    # sentence/table-row anchors instead of verbatim quotes, and quotes are
+    # reconstructed from the paper's passage index.
+    COMPACT_EVIDENCE: bool = False
+
+    # HPO linking fast path (see lib.reference_data.hpo.auto_link_hpo_term):
+    # phenotypes matching exactly one HPO name or synonym, or whose best fuzzy
+    # candidate scores at least HPO_AUTO_LINK_MIN_SIMILARITY (0-100) and beats
+    # the runner-up, are linked without the agent.
+    HPO_AUTO_LINK: bool = True
+    HPO_AUTO_LINK_MIN_SIMILARITY: float = 100.0
+
     # SMTP (optional — if unset, registration emails are logged but not sent)
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: int = 587
@@ -50,6 +129,9 @@ class Env(BaseSettings):
     SQLLITE_DIR: str = 'sqllite'
     EXTRACTED_PDF_DIR: str = 'extracted_pdfs'
     REFERENCE_DATA_DIR: str = 'reference_data'
+    WAKEUP_DIR: str = 'wakeup'
+    LLM_CACHE_DIR: str = 'llm_cache'
+    ANNOTATION_CACHE_DIR: str = 'annotation_cache'
 
     # Reference data
     MONDO_ONTOLOGY_URL: str = 'https://purl.obolibrary.org/obo/mondo.json'
@@ -65,6 +147,11 @@ class Env(BaseSettings):
     # Feature Flags
     SKIP_DATA_MIGRATIONS: bool = False
 
+    # Worker
+    PDF_PARSE_WORKERS: int = 2  # docling conversion processes per worker
+    PDF_PARSE_MAX_DOCS_PER_PROCESS: int = 50  # recycle a parse process after N docs
+    MAX_IN_FLIGHT_TASKS_PER_PAPER: int = 10  # bulk tasks, across all workers
+
     @model_validator(mode='after')
     def validate_ncbi_settings(self) -> 'Env':
         if self.NCBI_API_KEY and not self.NCBI_EMAIL:
@@ -88,6 +175,18 @@ class Env(BaseSettings):
     def reference_data_dir(self) -> Path:
         return Path(self.CAA_ROOT) / self.REFERENCE_DATA_DIR
 
+    @property
+    def wakeup_dir(self) -> Path:
+        return Path(self.CAA_ROOT) / self.WAKEUP_DIR
+
+    @property
+    def llm_cache_dir(self) -> Path:
+        return Path(self.CAA_ROOT) / self.LLM_CACHE_DIR
+
+    @property
+    def annotation_cache_dir(self) -> Path:
+        return Path(self.CAA_ROOT) / self.ANNOTATION_CACHE_DIR
+
     def init_dirs(self) -> None:
         root = Path(self.CAA_ROOT)
         if not root.is_absolute():
@@ -0,0 +1,253 @@
+"""Process-wide pooled HTTP clients for agent tools and annotation lookups.
+
+External API calls go through shared clients, so connections (and their TLS
+sessions) are kept alive and reused instead of being opened per lookup:
+
+- ``http_session()``: one ``requests.Session`` for synchronous callers such
+  as the agents' ``@function_tool`` lookups, shared by all threads. It blocks
+  (on I/O and on rate-limit waits), and the agents SDK runs sync tools on the
+  event loop, so such tools are wrapped with ``in_thread``.
+- ``async_request()``: sends through the running event loop's
+  ``httpx.AsyncClient`` (see ``async_client``), for annotation lookups.
+
+Both keep a pool of up to ``HTTP_MAX_CONNECTIONS_PER_HOST`` connections per
+host, wait for the host's rate limit (see ``lib.core.rate_limit``) before every
+attempt, retry throttling and server errors up to ``HTTP_MAX_RETRIES`` times
+with exponential backoff, and default to ``HTTP_TIMEOUT_S``. Every call is counted
+per host in ``http_stats``.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+import weakref
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, ParamSpec, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from lib.core.environment import env
+from lib.core.rate_limit import host_rate_limits, wait_for_host, wait_for_host_blocking
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+BACKOFF_FACTOR_S = 2.0
+# Distinct hosts whose connection pools the shared session keeps open.
+SESSION_POOL_HOSTS = 32
+
+
+class HostHttpStats(BaseModel):
+    host: str
+    requests: int
+    retries: int
+    errors: int
+    mean_latency_ms: float
+    max_latency_ms: float
+
+
+@dataclass
+class _HostCounters:
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    latency_s: float = 0.0
+    max_latency_s: float = 0.0
+
+
+class HttpStats:
+    """Per-host counters of calls made through the shared clients.
+
+    A call's latency is its wall time including rate-limit waits and retries;
+    it is an error if it raised or ended with an error status.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _HostCounters] = {}
+
+    def record(
+        self, host: str, latency_s: float, retries: int = 0, error: bool = False
+    ) -> None:
+        with self._lock:
+            counters = self._hosts.setdefault(host, _HostCounters())
+            counters.requests += 1
+            counters.retries += retries
+            counters.errors += error
+            counters.latency_s += latency_s
+            counters.max_latency_s = max(counters.max_latency_s, latency_s)
+
+    def snapshot(self) -> list[HostHttpStats]:
+        with self._lock:
+            return [
+                HostHttpStats(
+                    host=host,
+                    requests=c.requests,
+                    retries=c.retries,
+                    errors=c.errors,
+                    mean_latency_ms=round(1000 * c.latency_s / c.requests, 1),
+                    max_latency_ms=round(1000 * c.max_latency_s, 1),
+                )
+                for host, c in sorted(self._hosts.items())
+            ]
+
+
+http_stats = HttpStats()
+
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+
+def in_thread(func: Callable[P, R]) -> Callable[P, Awaitable[R]]:
+    """Run a blocking function in a worker thread; for sync ``@function_tool``s.
+
+    Apply below ``@function_tool``: the signature and docstring the tool
+    schema is built from are kept.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    return wrapper
+
+
+class _PooledSession(requests.Session):
+    """``requests.Session`` that applies the rate limit, retries, timeout and
+    counters. Blocking: call it off the event loop."""
+
+    def request(  # type: ignore[override]
+        self, method: str | bytes, url: str | bytes, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        host = urlsplit(url if isinstance(url, str) else url.decode()).hostname or ''
+        kwargs.setdefault('timeout', env.HTTP_TIMEOUT_S)
+        start = time.monotonic()
+        attempt = 0
+        error = True
+        try:
+            # Retried here rather than by urllib3 so every attempt waits for
+            # the host's rate limit.
+            for attempt in range(env.HTTP_MAX_RETRIES + 1):
+                wait_for_host_blocking(host)
+                try:
+                    response = super().request(method, url, *args, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == env.HTTP_MAX_RETRIES:
+                        raise
+                    retry_after = None
+                else:
+                    if (
+                        response.status_code not in RETRY_STATUSES
+                        or attempt == env.HTTP_MAX_RETRIES
+                    ):
+                        error = not response.ok
+                        return response
+                    retry_after = response.headers.get('retry-after')
+                time.sleep(_retry_delay(retry_after, attempt))
+        finally:
+            http_stats.record(
+                host, time.monotonic() - start, retries=attempt, error=error
+            )
+        raise AssertionError('unreachable')
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """The shared session for synchronous callers."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = _PooledSession()
+                adapter = HTTPAdapter(
+                    pool_connections=SESSION_POOL_HOSTS,
+                    pool_maxsize=env.HTTP_MAX_CONNECTIONS_PER_HOST,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+# httpx clients are bound to the event loop that opened their connections.
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+
+
+def async_client() -> httpx.AsyncClient:
+    """The shared async client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=env.HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=env.HTTP_MAX_CONNECTIONS_PER_HOST,
+        )
+        # httpx limits connections per transport, so each rate-limited
+        # upstream gets a transport (and pool) of its own.
+        client = httpx.AsyncClient(
+            limits=limits,
+            timeout=env.HTTP_TIMEOUT_S,
+            mounts={
+                f'https://{host}': httpx.AsyncHTTPTransport(limits=limits)
+                for host in host_rate_limits()
+            },
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _retry_delay(retry_after: str | None, attempt: int) -> float:
+    try:
+        if retry_after:
+            return float(retry_after)
+    except ValueError:
+        pass
+    return BACKOFF_FACTOR_S * 2**attempt
+
+
+async def async_request(
+    client: httpx.AsyncClient | None, method: str, url: str, **kwargs: Any
+) -> httpx.Response:
+    """Send a request within its host's rate limit, retrying throttling and
+    server errors with exponential backoff; raises ``httpx.HTTPError``.
+
+    ``client`` defaults to ``async_client()``.
+    """
+    client = client or async_client()
+    host = httpx.URL(url).host
+    start = time.monotonic()
+    attempt = 0
+    error = True
+    try:
+        for attempt in range(env.HTTP_MAX_RETRIES + 1):
+            await wait_for_host(host)
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == env.HTTP_MAX_RETRIES:
+                    raise
+                retry_after = None
+            else:
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or attempt == env.HTTP_MAX_RETRIES
+                ):
+                    response.raise_for_status()
+                    error = False
+                    return response
+                retry_after = response.headers.get('retry-after')
+            await asyncio.sleep(_retry_delay(retry_after, attempt))
+    finally:
+        http_stats.record(host, time.monotonic() - start, retries=attempt, error=error)
+    raise AssertionError('unreachable')
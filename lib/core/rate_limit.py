@@ -0,0 +1,92 @@
+"""Per-host request rate limits for upstream APIs (NCBI, Ensembl, gnomAD).
+
+Every request to a rate-limited host first waits for a token from that host's
+``TokenBucket``. Buckets are shared by everything in the process, so
+concurrent annotation tasks together stay within each host's limit.
+
+Buckets are per process, though, and several worker processes can share one
+queue. Each process therefore paces a host at its published limit divided by
+``WORKER_PROCESSES``, which keeps all workers together within the limit.
+"""
+
+import asyncio
+import threading
+import time
+
+from lib.core.environment import env
+
+NCBI_HOST = 'eutils.ncbi.nlm.nih.gov'
+ENSEMBL_HOST = 'rest.ensembl.org'
+GNOMAD_HOST = 'gnomad.broadinstitute.org'
+
+
+class TokenBucket:
+    """Token bucket admitting ``rate`` requests per second, bursting to ``burst``.
+
+    Each caller reserves the next free slot and then sleeps until it, so one
+    bucket paces callers on any event loop and in any thread.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        # Theoretical arrival time of the next request at the steady rate.
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            next_at = max(self._next_at, now)
+            self._next_at = next_at + 1 / self.rate
+        return max(0.0, next_at - now - (self.burst - 1) / self.rate)
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_blocking(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def host_rate_limits() -> dict[str, float]:
+    """Requests per second this process may send per host; other hosts are not
+    limited."""
+    limits = {
+        # NCBI E-utilities: 3 requests/s without an API key, 10 with one.
+        NCBI_HOST: 10.0 if env.NCBI_API_KEY else 3.0,
+        ENSEMBL_HOST: env.ENSEMBL_REQUESTS_PER_S,
+        GNOMAD_HOST: env.GNOMAD_REQUESTS_PER_S,
+    }
+    processes = max(env.WORKER_PROCESSES, 1)
+    return {host: rate / processes for host, rate in limits.items()}
+
+
+_buckets: dict[str, TokenBucket | None] = {}
+
+
+def host_bucket(host: str) -> TokenBucket | None:
+    """The process-wide bucket for a host, or ``None`` if it is not limited."""
+    if host not in _buckets:
+        rate = host_rate_limits().get(host)
+        # setdefault so threads racing to create a bucket all get the same one.
+        _buckets.setdefault(host, TokenBucket(rate) if rate else None)
+    return _buckets[host]
+
+
+async def wait_for_host(host: str) -> None:
+    """Wait until a request to ``host`` is within its rate limit."""
+    bucket = host_bucket(host)
+    if bucket is not None:
+        await bucket.acquire()
+
+
+def wait_for_host_blocking(host: str) -> None:
+    """``wait_for_host`` for synchronous callers."""
+    bucket = host_bucket(host)
+    if bucket is not None:
+        bucket.acquire_blocking()
@@ -1,8 +1,14 @@
 import asyncio
 import html
 import json
+import logging
+import multiprocessing
+import os
 import shutil
 import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from enum import StrEnum
 from io import BytesIO
 from pathlib import Path
@@ -31,6 +37,8 @@ from pydantic import BaseModel
 from xldown import excel_to_markdown
 
 from lib.agents.table_correction_agent import correct_tables
+from lib.core.environment import env
+from lib.misc.pdf.passages import build_passage_index
 from lib.misc.pdf.paths import (
     pdf_extraction_success_path,
     pdf_image_caption_path,
@@ -51,6 +59,13 @@ from lib.models.paper import FileFormat
 
 IMAGE_RESOLUTION_SCALE = 4.0
 
+logger = logging.getLogger(__name__)
+
+_parse_pool: ProcessPoolExecutor | None = None
+# Converters owned by this (parse pool) process, reused across documents so
+# docling's layout and table models load once per process.
+_converters: dict[InputFormat, DocumentConverter] = {}
+
 
 class Polygon(BaseModel):
     """Polygon with 4 corner coordinates (top-left, top-right, bottom-right, bottom-left)."""
@@ -180,54 +195,99 @@ def _parse_xlsx_content(paper_id: int, content: bytes) -> None:
         pdf_markdown_path(paper_id, supplement=True).write_text(md_text)
 
 
-async def parse_content(
-    paper_id: int,
-    force: bool = False,
-    supplement_format: FileFormat | None = None,
-) -> None:
-    supplement = supplement_format is not None
-
-    if (
-        not force
-        and pdf_extraction_success_path(paper_id, supplement=supplement).exists()
-    ):
+def get_converter(input_format: InputFormat) -> DocumentConverter:
+    """Return this process's converter for ``input_format``, loading its models once."""
+    if input_format not in _converters:
+        format_options: dict[InputFormat, FormatOption]
+        if input_format == InputFormat.DOCX:
+            format_options = {InputFormat.DOCX: WordFormatOption()}
+        else:
+            format_options = {
+                InputFormat.PDF: PdfFormatOption(
+                    backend=PyPdfiumDocumentBackend,
+                    pipeline_options=PdfPipelineOptions(
+                        images_scale=IMAGE_RESOLUTION_SCALE,
+                        generate_page_images=True,
+                        generate_picture_images=True,
+                    ),
+                ),
+            }
+        converter = DocumentConverter(format_options=format_options)
+        converter.initialize_pipeline(input_format)
+        _converters[input_format] = converter
+    return _converters[input_format]
+
+
+def _init_parse_process() -> None:
+    """Parse pool initializer: load the PDF and DOCX models before the first document."""
+    start = time.perf_counter()
+    try:
+        for input_format in (InputFormat.PDF, InputFormat.DOCX):
+            get_converter(input_format)
+    except Exception:
+        # Leave it to the first conversion to retry and surface the error on its task.
+        logger.exception(f'Parse process {os.getpid()} failed to warm up converters')
         return
+    logger.info(
+        f'Parse process {os.getpid()} warmed docling converters in '
+        f'{time.perf_counter() - start:.1f}s'
+    )
 
+
+def _parse_process_ready() -> None:
+    pass
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Return the singleton process pool that runs document conversion.
+
+    Uses the ``spawn`` start method: forking a process that already runs an
+    event loop, threads, and a SQLite engine is not safe. Each process is
+    replaced after ``PDF_PARSE_MAX_DOCS_PER_PROCESS`` documents, which bounds
+    memory growth from docling's cached models and pages.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=env.PDF_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_parse_process,
+            max_tasks_per_child=env.PDF_PARSE_MAX_DOCS_PER_PROCESS,
+        )
+    return _parse_pool
+
+
+def warm_parse_pool() -> None:
+    """Start every parse process now so model loading happens before the first paper."""
+    pool = get_parse_pool()
+    for _ in range(env.PDF_PARSE_WORKERS):
+        pool.submit(_parse_process_ready)
+
+
+def convert_document(paper_id: int, supplement_format: FileFormat | None) -> None:
+    """Convert the raw upload and write every parse artifact except table corrections.
+
+    Synchronous and CPU-bound; ``parse_content`` runs it in the parse pool.
+    """
+    supplement = supplement_format is not None
     raw = pdf_raw_path(
         paper_id,
         supplement=supplement,
         file_format=supplement_format.value if supplement_format else None,
     )
-    if not raw.exists():
-        return
-
     content = raw.read_bytes()
 
     if supplement_format == FileFormat.XLSX:
         _parse_xlsx_content(paper_id, content)
-        pdf_extraction_success_path(paper_id, supplement=True).touch()
         return
 
     pdf_images_dir(paper_id, supplement=supplement).mkdir(parents=True, exist_ok=True)
     pdf_tables_dir(paper_id, supplement=supplement).mkdir(parents=True, exist_ok=True)
     pdf_sections_dir(paper_id, supplement=supplement).mkdir(parents=True, exist_ok=True)
 
-    format_options: dict[InputFormat, FormatOption]
-    if supplement_format == FileFormat.DOCX:
-        format_options = {InputFormat.DOCX: WordFormatOption()}
-    else:
-        format_options = {
-            InputFormat.PDF: PdfFormatOption(
-                backend=PyPdfiumDocumentBackend,
-                pipeline_options=PdfPipelineOptions(
-                    images_scale=IMAGE_RESOLUTION_SCALE,
-                    generate_page_images=True,
-                    generate_picture_images=True,
-                ),
-            ),
-        }
-
-    doc_converter = DocumentConverter(format_options=format_options)
+    doc_converter = get_converter(
+        InputFormat.DOCX if supplement_format == FileFormat.DOCX else InputFormat.PDF
+    )
 
     document: DoclingDocument = doc_converter.convert(
         source=DocumentStream(name='content', stream=BytesIO(content)),
@@ -296,7 +356,56 @@ async def parse_content(
         ) as fp:
             fp.write(caption)
 
-    await correct_tables(paper_id, supplement=supplement)
+
+def _convert_in_pool(
+    caa_root: str, paper_id: int, supplement_format: FileFormat | None
+) -> None:
+    # Pool processes load env from the environment; follow the parent's root.
+    env.CAA_ROOT = caa_root
+    convert_document(paper_id, supplement_format)
+
+
+async def parse_content(
+    paper_id: int,
+    force: bool = False,
+    supplement_format: FileFormat | None = None,
+) -> None:
+    supplement = supplement_format is not None
+
+    if (
+        not force
+        and pdf_extraction_success_path(paper_id, supplement=supplement).exists()
+    ):
+        return
+
+    raw = pdf_raw_path(
+        paper_id,
+        supplement=supplement,
+        file_format=supplement_format.value if supplement_format else None,
+    )
+    if not raw.exists():
+        return
+
+    # Conversion is CPU-bound for tens of seconds; keep it off the event loop.
+    global _parse_pool
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            get_parse_pool(),
+            _convert_in_pool,
+            env.CAA_ROOT,
+            paper_id,
+            supplement_format,
+        )
+    except BrokenProcessPool:
+        # A conversion process died (e.g. OOM); start a fresh pool next time.
+        _parse_pool = None
+        raise
+
+    if supplement_format != FileFormat.XLSX:
+        await correct_tables(paper_id, supplement=supplement)
+
+    # Index the corrected text; a supplement parse re-indexes the whole paper.
+    build_passage_index(paper_id)
 
     with open(pdf_extraction_success_path(paper_id, supplement=supplement), 'w') as fp:
         fp.write('')
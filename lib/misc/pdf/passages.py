@@ -0,0 +1,344 @@
+"""Per-paper passage index for retrieving entity-specific context.
+
+At parse time the paper's markdown (main text, then supplement) is split into
+passages: headings, paragraphs, and individual table rows. Per-entity agents
+(one patient, one family) then get only the passages that mention the entity
+instead of the whole paper; see ``select_passages``.
+
+Passage ids are stable for a parse, so each sentence of a paragraph and each
+table row also has a stable anchor (``p12.0``, ``p40``) that agents can cite
+instead of quoting; see ``passage_anchors`` and ``lib.agents.evidence_anchors``.
+"""
+
+import json
+import re
+from typing import Any, Literal
+
+from pydantic import BaseModel
+
+from lib.misc.pdf.paths import (
+    SUPPLEMENTARY_MATERIAL_HEADER,
+    pdf_markdown_path,
+    pdf_passages_path,
+    raw_md,
+)
+
+# Rough size of a token in characters, for budgeting prompt excerpts.
+CHARS_PER_TOKEN = 4
+
+_HEADING = re.compile(r'^#{1,6} (.+)')
+# Headings that section classification applies to, as in relevant_sections_md.
+_CLASSIFIED_HEADING = re.compile(r'^#{1,3} (.+)')
+_TABLE_SEPARATOR = re.compile(r'^\|[\s:|-]+\|$')
+# Sentence boundary: terminal punctuation, whitespace, then an uppercase letter,
+# digit or opening bracket/quote.
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9(\["])')
+_PEDIGREE_ID = re.compile(r'^([IVX]+)\s*[-:.]?\s*(\d+)$', re.IGNORECASE)
+_LABELLED_ID = re.compile(
+    r'^(patient|pt|case|subject|individual|family|fam|kindred|pedigree|p|f)'
+    r'\s*\.?\s*#?\s*(\d+[a-z]?)$',
+    re.IGNORECASE,
+)
+_PATIENT_LABELS = ('Patient', 'Pt', 'Case', 'Subject', 'Individual', 'P')
+_FAMILY_LABELS = ('Family', 'Fam', 'Kindred', 'Pedigree', 'F')
+_FAMILY_LABEL_NAMES = {name.lower() for name in _FAMILY_LABELS}
+
+
+class Passage(BaseModel):
+    """One heading, paragraph, or table row of a paper's markdown."""
+
+    id: int
+    kind: Literal['heading', 'paragraph', 'table_row']
+    supplement: bool
+    text: str
+    # For table rows: the table's header and separator lines, and which table.
+    table_id: int | None = None
+    table_header: str | None = None
+
+    @property
+    def tokens(self) -> int:
+        return len(self.text) // CHARS_PER_TOKEN + 1
+
+
+def split_passages(markdown: str, supplement: bool, start_id: int = 0) -> list[Passage]:
+    """Split markdown into heading, paragraph, and table-row passages, in order."""
+    passages: list[Passage] = []
+    # Offset like the passage ids, so table ids stay unique across documents.
+    table_id = start_id
+    paragraph: list[str] = []
+
+    def add(
+        kind: Literal['heading', 'paragraph', 'table_row'], text: str, **kw: Any
+    ) -> None:
+        passages.append(
+            Passage(
+                id=start_id + len(passages),
+                kind=kind,
+                supplement=supplement,
+                text=text,
+                **kw,
+            )
+        )
+
+    def flush_paragraph() -> None:
+        if paragraph:
+            add('paragraph', '\n'.join(paragraph))
+            paragraph.clear()
+
+    lines = markdown.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].rstrip()
+        if not line.strip():
+            flush_paragraph()
+            i += 1
+        elif _HEADING.match(line):
+            flush_paragraph()
+            add('heading', line)
+            i += 1
+        elif line.startswith('|'):
+            flush_paragraph()
+            rows = []
+            while i < len(lines) and lines[i].startswith('|'):
+                rows.append(lines[i].rstrip())
+                i += 1
+            has_header = len(rows) > 1 and _TABLE_SEPARATOR.match(rows[1])
+            header = '\n'.join(rows[:2]) if has_header else None
+            for row in rows[2:] if has_header else rows:
+                add('table_row', row, table_id=table_id, table_header=header)
+            table_id += 1
+        else:
+            paragraph.append(line)
+            i += 1
+    flush_paragraph()
+    return passages
+
+
+def build_passage_index(paper_id: int) -> list[Passage]:
+    """Split the paper (and supplement, if parsed) into passages and save them."""
+    passages = split_passages(raw_md(paper_id), supplement=False)
+    if pdf_markdown_path(paper_id, supplement=True).exists():
+        passages.append(
+            Passage(
+                id=len(passages),
+                kind='heading',
+                supplement=True,
+                text=SUPPLEMENTARY_MATERIAL_HEADER,
+            )
+        )
+        passages += split_passages(
+            raw_md(paper_id, supplement=True), supplement=True, start_id=len(passages)
+        )
+    pdf_passages_path(paper_id).write_text(
+        json.dumps([p.model_dump() for p in passages])
+    )
+    return passages
+
+
+def load_passages(paper_id: int) -> list[Passage]:
+    """The paper's passage index, built now for papers parsed before indexing."""
+    path = pdf_passages_path(paper_id)
+    if path.exists():
+        return [Passage.model_validate(p) for p in json.loads(path.read_text())]
+    if not pdf_markdown_path(paper_id).exists():
+        return []
+    return build_passage_index(paper_id)
+
+
+class Anchor(BaseModel):
+    """A citable span of a passage: one sentence of a paragraph, or a table row."""
+
+    passage: Passage
+    start: int
+    end: int
+
+    @property
+    def text(self) -> str:
+        return self.passage.text[self.start : self.end]
+
+
+def sentence_spans(text: str) -> list[tuple[int, int]]:
+    """Character spans of the sentences in a paragraph."""
+    spans, start = [], 0
+    for m in _SENTENCE_BREAK.finditer(text):
+        spans.append((start, m.start()))
+        start = m.end()
+    spans.append((start, len(text)))
+    return spans
+
+
+def passage_anchors(passage: Passage) -> list[tuple[str, Anchor]]:
+    """Anchor ids of a passage, in order; headings are not citable."""
+    if passage.kind == 'table_row':
+        return [
+            (f'p{passage.id}', Anchor(passage=passage, start=0, end=len(passage.text)))
+        ]
+    if passage.kind == 'paragraph':
+        return [
+            (f'p{passage.id}.{n}', Anchor(passage=passage, start=start, end=end))
+            for n, (start, end) in enumerate(sentence_spans(passage.text))
+        ]
+    return []
+
+
+def anchor_index(passages: list[Passage]) -> dict[str, Anchor]:
+    """Every anchor of the given passages, by id."""
+    return {
+        anchor_id: anchor
+        for passage in passages
+        for anchor_id, anchor in passage_anchors(passage)
+    }
+
+
+def identifier_aliases(identifier: str) -> set[str]:
+    """Spellings a paper may use for a patient, family, or pedigree identifier.
+
+    ``II-1`` also matches ``II:1`` and ``II.1``; ``Patient 3`` also matches
+    ``P3``, ``Case 3``, ``Pt. 3`` and so on. Identifiers too short or generic
+    to match reliably (a bare number, one character) yield no aliases.
+    """
+    identifier = identifier.strip()
+    if len(identifier) < 2 or identifier.isdigit():
+        return set()
+    aliases = {identifier}
+    if m := _PEDIGREE_ID.match(identifier):
+        generation, member = m.group(1).upper(), m.group(2)
+        aliases |= {f'{generation}{sep}{member}' for sep in ('-', ':', '.', ' ', '')}
+    elif m := _LABELLED_ID.match(identifier):
+        label, number = m.group(1).lower(), m.group(2)
+        labels = _FAMILY_LABELS if label in _FAMILY_LABEL_NAMES else _PATIENT_LABELS
+        for name in labels:
+            aliases |= {f'{name} {number}', f'{name}{number}', f'{name}. {number}'}
+    return aliases
+
+
+def relevant_passages(
+    passages: list[Passage], section_classifications: dict | None
+) -> list[Passage]:
+    """Passages outside sections classified irrelevant, as in ``relevant_sections_md``."""
+    skipped = _skipped_passage_ids(passages, section_classifications)
+    return [p for p in passages if p.id not in skipped]
+
+
+def _skipped_passage_ids(
+    passages: list[Passage], section_classifications: dict | None
+) -> set[int]:
+    """Passages in sections classified irrelevant (see ``relevant_sections_md``)."""
+    if section_classifications is None:
+        return set()
+    classified: dict[str, bool] = {
+        s['header'].lower(): s.get('relevant', True)
+        for s in section_classifications.get('sections', [])
+    }
+    skipped, skip = set(), False
+    for passage in passages:
+        if passage.supplement:
+            break
+        header = _CLASSIFIED_HEADING.match(passage.text)
+        if passage.kind == 'heading' and header:
+            header_text = header.group(1).strip().lower()
+            if header_text in classified:
+                skip = not classified[header_text]
+        if skip:
+            skipped.add(passage.id)
+    return skipped
+
+
+def select_passages(
+    passages: list[Passage],
+    identifiers: list[str],
+    max_tokens: int,
+    section_classifications: dict | None = None,
+) -> list[Passage] | None:
+    """Passages mentioning any of the identifiers, within a token budget.
+
+    Passages matching more identifiers win when the budget is tight. Each
+    kept passage brings its section heading (and a table row its table's
+    header) along, counted against the budget. Returns ``None`` when nothing
+    is selected, so the caller can fall back to the full text.
+    """
+    # One pattern per identifier, matching any of its aliases as a whole word.
+    patterns = [
+        re.compile(
+            '|'.join(rf'(?<![\w-]){re.escape(a)}(?![\w-])' for a in sorted(aliases)),
+            re.IGNORECASE,
+        )
+        for aliases in map(identifier_aliases, identifiers)
+        if aliases
+    ]
+    if not patterns:
+        return None
+    skipped = _skipped_passage_ids(passages, section_classifications)
+
+    hits: list[tuple[int, Passage]] = []
+    # Section heading of each passage; headings give the excerpts their context.
+    headings: dict[int, Passage] = {}
+    heading: Passage | None = None
+    for passage in passages:
+        if passage.kind == 'heading':
+            heading = passage
+            continue
+        if heading is not None:
+            headings[passage.id] = heading
+        if passage.id in skipped:
+            continue
+        n = sum(1 for pattern in patterns if pattern.search(passage.text))
+        if n:
+            hits.append((n, passage))
+
+    selected: dict[int, Passage] = {}
+    tables: set[int] = set()
+    budget = max_tokens
+    for _, passage in sorted(hits, key=lambda hit: (-hit[0], hit[1].id)):
+        cost = passage.tokens
+        heading = headings.get(passage.id)
+        if heading is not None and heading.id not in selected:
+            cost += heading.tokens
+        new_table = passage.table_header is not None and passage.table_id not in tables
+        if new_table:
+            cost += len(passage.table_header or '') // CHARS_PER_TOKEN + 1
+        if cost > budget:
+            continue
+        selected[passage.id] = passage
+        if heading is not None:
+            selected.setdefault(heading.id, heading)
+        if new_table and passage.table_id is not None:
+            tables.add(passage.table_id)
+        budget -= cost
+    if not selected:
+        return None
+    return sorted(selected.values(), key=lambda p: p.id)
+
+
+def _anchored_text(passage: Passage) -> str:
+    """Passage text with ``[anchor]`` markers before each sentence or row."""
+    return ' '.join(
+        f'[{anchor_id}] {anchor.text}' for anchor_id, anchor in passage_anchors(passage)
+    )
+
+
+def render_passages(passages: list[Passage], anchored: bool = False) -> str:
+    """Markdown for selected passages, with each table's header shown once.
+
+    With ``anchored``, every sentence and table row is prefixed with its anchor.
+    """
+    blocks: list[str] = []
+    table_id: int | None = None
+    for passage in passages:
+        text = (
+            _anchored_text(passage)
+            if anchored and passage.kind != 'heading'
+            else passage.text
+        )
+        if passage.kind == 'table_row':
+            if passage.table_id != table_id and passage.table_header:
+                blocks.append(f'{passage.table_header}\n{text}')
+            elif blocks and passage.table_id == table_id:
+                blocks[-1] += f'\n{text}'
+            else:
+                blocks.append(text)
+            table_id = passage.table_id
+        else:
+            blocks.append(text)
+            table_id = None
+    return '\n\n'.join(blocks)
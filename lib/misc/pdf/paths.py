@@ -116,6 +116,11 @@ def paper_section_classification_path(paper_id: int) -> Path:
     return pdf_dir(paper_id) / 'paper_section_classification.json'
 
 
+def pdf_passages_path(paper_id: int) -> Path:
+    """Passage index of the paper and its supplement (see lib.misc.pdf.passages)."""
+    return pdf_dir(paper_id) / 'passages.json'
+
+
 def apply_table_corrections(
     paper_id: int, markdown: str, supplement: bool = False
 ) -> str:
@@ -10,8 +10,13 @@ from lib.models.conversation import (
     ChatMessageResp,
     ChatRoutingResponse,
     ConversationDB,
+    ConversationItemDB,
+)
+from lib.models.evidence_block import (
+    AnchoredEvidenceBlock,
+    EvidenceBlock,
+    HumanEvidenceBlock,
 )
-from lib.models.evidence_block import EvidenceBlock, HumanEvidenceBlock
 from lib.models.family import (
     Family,
     FamilyCreateRequest,
@@ -102,4 +107,4 @@ from lib.models.variant import (
     VariantResp,
     VariantUpdateRequest,
 )
-from lib.tasks.models import TaskDB, TaskResp
+from lib.tasks.models import TaskAttemptDB, TaskDB, TaskResp
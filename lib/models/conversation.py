@@ -43,6 +43,27 @@ class ConversationDB(Base):
     __table_args__ = (UniqueConstraint('paper_id'),)
 
 
+class ConversationItemDB(Base):
+    """One item of an agent conversation kept in our own DB.
+
+    With ``LLM_CONVERSATION_STORE=local``, task and chat conversations are
+    stored here instead of in OpenAI's Conversations API: items are the
+    Responses API input items of every turn, in order, keyed by the
+    conversation id recorded on the task (see ``lib.agents.conversations``).
+    """
+
+    __tablename__ = 'conversation_items'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    conversation_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    item: Mapped[dict] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+
 class ChatMessageRequest(BaseModel):
     message: str | None = None
 
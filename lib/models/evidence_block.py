@@ -53,6 +53,18 @@ class EvidenceBlock(ReasoningBlock[T]):
         return self
 
 
+class AnchoredEvidenceBlock(ReasoningBlock[T]):
+    """Compact ``EvidenceBlock`` for agent output: cites passage anchors instead
+    of a verbatim quote, which is reconstructed server-side."""
+
+    anchors: list[str] = []  # consecutive sentence/table-row anchors, e.g. p12.0
+    start: int | None = None  # optional character span within the anchored text
+    end: int | None = None
+    table_id: int | None = None
+    image_id: int | None = None
+    is_supplement: bool = False
+
+
 class HumanEvidenceBlock(EvidenceBlock[T]):
     human_edit_note: str | None = None  # optional annotation by human curator
     # Per-field edit attribution. ``edited_by_name`` is an immutable snapshot of
@@ -121,7 +121,7 @@ class MondoLinkingTarget(BaseModel):
     """Disease text target for paper- or occurrence-scoped MONDO linking.
 
     The full paper is supplied to the agent separately (via the cached
-    ``format_paper_context`` prefix), so only non-paper-body framing lives here.
+    ``build_fulltext_context`` prefix), so only non-paper-body framing lives here.
     """
 
     scope: MondoDiseaseScope
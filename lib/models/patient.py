@@ -444,6 +444,12 @@ def placeholder_demographics() -> 'PatientDemographics':
     )
 
 
+class BatchedPatientDemographics(PatientDemographics):
+    """Demographics for one patient of a batched extraction run."""
+
+    patient_id: int
+
+
 class FamilyEntry(BaseModel):
     """Family grouping with references to patients by their identifier."""
 
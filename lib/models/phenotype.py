@@ -51,6 +51,12 @@ class HPOTerm(BaseModel):
     name: str | None
 
 
+class PhenotypeHpoLink(ReasoningBlock[HPOTerm]):
+    """HPO mapping for one phenotype of a batched linking run."""
+
+    phenotype_id: int
+
+
 class PhenotypeDB(Base):
     __tablename__ = 'phenotypes'
 
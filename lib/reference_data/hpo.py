@@ -1,5 +1,7 @@
+import re
 import time
 from collections import defaultdict, namedtuple
+from collections.abc import Callable
 from pathlib import Path
 
 import hpotk
@@ -7,13 +9,22 @@ import requests
 from rapidfuzz import fuzz, process
 
 from lib.core.environment import env
-from lib.models import HpoCandidate
+from lib.models import HpoCandidate, HPOTerm
+from lib.models.evidence_block import ReasoningBlock
 
-# Lazy-loaded ontology
+# Lazy-loaded ontology, and the lookups built from it once per process
 _ontology: hpotk.MinimalOntology | None = None
+_term_lookup: defaultdict[str, list[hpotk.model._term_id.DefaultTermId]] | None = None
+_exact_index: dict[str, set[str]] | None = None
 
 MAX_AGE_S = 7 * 24 * 60 * 60  # 7 days
 
+# Start of the reasoning stored on links made without the agent; see
+# auto_link_hpo_term.
+AUTO_LINK_REASONING_PREFIX = 'Auto-linked without the agent'
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
 
 def ontology_path() -> Path:
     return env.reference_data_dir / 'hpo.json'
@@ -97,7 +108,7 @@ def find_matching_hpo_terms(
     matching too many queries.
     """
     if not term_lookup:
-        term_lookup = build_term_lookup()
+        term_lookup = get_term_lookup()
 
     query = phenotype_text.lower()
     all_terms = list(term_lookup.keys())
@@ -140,3 +151,81 @@ def find_matching_hpo_terms(
         )
 
     return candidates
+
+
+def normalize_term_text(text: str) -> str:
+    """Lowercase text with punctuation and whitespace runs collapsed to one space."""
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def build_exact_index(
+    term_lookup: defaultdict[str, list[hpotk.model._term_id.DefaultTermId]],
+) -> dict[str, set[str]]:
+    """HPO ids by normalized term name or synonym."""
+    index: defaultdict[str, set[str]] = defaultdict(set)
+    for name, term_ids in term_lookup.items():
+        index[normalize_term_text(name)].update(str(t) for t in term_ids)
+    return index
+
+
+def get_term_lookup() -> defaultdict[str, list[hpotk.model._term_id.DefaultTermId]]:
+    """Build and cache ``build_term_lookup()``; treat the result as read-only."""
+    global _term_lookup
+    if _term_lookup is None:
+        _term_lookup = build_term_lookup()
+    return _term_lookup
+
+
+def get_exact_index() -> dict[str, set[str]]:
+    """Build and cache ``build_exact_index`` of the cached term lookup."""
+    global _exact_index
+    if _exact_index is None:
+        _exact_index = build_exact_index(get_term_lookup())
+    return _exact_index
+
+
+def hpo_term_name(hpo_id: str) -> str | None:
+    """The HPO term's primary name."""
+    return get_ontology().get_term_name(hpo_id)
+
+
+def auto_link_hpo_term(
+    concept: str,
+    candidates: list[HpoCandidate],
+    exact_index: dict[str, set[str]],
+    min_similarity: float,
+    term_name: Callable[[str], str | None] = hpo_term_name,
+) -> ReasoningBlock[HPOTerm] | None:
+    """Link a phenotype concept without the agent when the match is unambiguous.
+
+    A concept is linked when its normalized text is the name or a synonym of
+    exactly one HPO term, or else when its best fuzzy candidate scores at least
+    ``min_similarity`` and strictly beats the runner-up. Returns ``None`` for
+    the agent to decide.
+    """
+    exact = exact_index.get(normalize_term_text(concept), set())
+    if len(exact) == 1:
+        (hpo_id,) = exact
+        reasoning = f'exact match of "{concept}" to an HPO term name or synonym'
+    elif exact:
+        return None
+    else:
+        ranked = sorted(candidates, key=lambda c: c.similarity_score, reverse=True)
+        if (
+            not ranked
+            or ranked[0].similarity_score < min_similarity
+            or (
+                len(ranked) > 1
+                and ranked[1].similarity_score >= ranked[0].similarity_score
+            )
+        ):
+            return None
+        hpo_id = ranked[0].id
+        reasoning = (
+            f'"{concept}" matches "{ranked[0].name}" with similarity '
+            f'{ranked[0].similarity_score:.0f}'
+        )
+    return ReasoningBlock[HPOTerm](
+        value=HPOTerm(id=hpo_id, name=term_name(hpo_id)),
+        reasoning=f'{AUTO_LINK_REASONING_PREFIX}: {reasoning}.',
+    )
@@ -11,15 +11,21 @@ from lib.tasks.misc import (
 from lib.tasks.models import (
     TASK_SUCCESSORS,
     InferredPaperStatus,
+    TaskAttemptDB,
+    TaskAttemptOutcome,
     TaskCreateRequest,
     TaskDB,
+    TaskPriority,
     TaskResp,
     TaskStatus,
     TaskType,
 )
 
 __all__ = [
+    'TaskAttemptDB',
+    'TaskAttemptOutcome',
     'TaskDB',
+    'TaskPriority',
     'TaskStatus',
     'TaskType',
     'TASK_SUCCESSORS',
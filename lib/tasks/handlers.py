@@ -3,8 +3,7 @@ import json
 import logging
 from typing import Any, Awaitable, Callable
 
-from agents import Agent, RunConfig, Runner
-from openai import AsyncOpenAI
+from agents import Agent, RunConfig
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
@@ -15,12 +14,18 @@ from lib.agents.compound_het_agent import (
 from lib.agents.compound_het_agent import (
     agent as compound_het_agent,
 )
+from lib.agents.conversations import create_conversation
+from lib.agents.evidence_anchors import run_evidence_agent
 from lib.agents.hpo_linking_agent import (
+    HPO_BATCH_LINKING_AGENT_INSTRUCTIONS,
     HPO_LINKING_AGENT_INSTRUCTIONS,
 )
 from lib.agents.hpo_linking_agent import (
     agent as hpo_linking_agent,
 )
+from lib.agents.hpo_linking_agent import (
+    batch_agent as hpo_batch_linking_agent,
+)
 from lib.agents.mondo_linking_agent import (
     MONDO_LINKING_AGENT_INSTRUCTIONS,
 )
@@ -41,10 +46,14 @@ from lib.agents.paper_section_classifier_agent import (
 )
 from lib.agents.patient_demographics_agent import (
     PATIENT_DEMOGRAPHICS_AGENT_INSTRUCTIONS,
+    PATIENT_DEMOGRAPHICS_BATCH_AGENT_INSTRUCTIONS,
 )
 from lib.agents.patient_demographics_agent import (
     agent as patient_demographics_agent,
 )
+from lib.agents.patient_demographics_agent import (
+    batch_agent as patient_demographics_batch_agent,
+)
 from lib.agents.patient_extraction_agent import (
     PATIENT_EXTRACTION_AGENT_INSTRUCTIONS,
 )
@@ -67,6 +76,7 @@ from lib.agents.pedigree_describer_agent import (
     PEDIGREE_DESCRIBER_AGENT_INSTRUCTIONS,
     pedigree_describer_agent_for_paper,
 )
+from lib.agents.runner import RunUsage, run_agent
 from lib.agents.segregation_analysis_computed_agent import (
     SEGREGATION_ANALYSIS_COMPUTED_AGENT_INSTRUCTIONS,
 )
@@ -105,10 +115,8 @@ from lib.core.environment import env
 from lib.core.logging import setup_logging
 from lib.misc.pdf.parse import parse_content
 from lib.misc.pdf.paths import (
-    fulltext_md,
     pdf_image_caption_path,
     pdf_image_path,
-    relevant_sections_md,
 )
 from lib.models import (
     AnnotatedVariantDB,
@@ -146,45 +154,43 @@ from lib.models.mondo import (
     MondoLinkingTarget,
 )
 from lib.models.paper import FileFormat
-from lib.models.patient import ProbandStatus
-from lib.models.phenotype import HPOTerm
+from lib.models.patient import BatchedPatientDemographics, ProbandStatus
+from lib.models.phenotype import HpoCandidate, HPOTerm, PhenotypeHpoLink
 from lib.models.variant import HarmonizedVariant, Variant
-from lib.reference_data.hpo import build_term_lookup, find_matching_hpo_terms
+from lib.reference_data.hpo import (
+    auto_link_hpo_term,
+    find_matching_hpo_terms,
+    get_exact_index,
+    get_term_lookup,
+)
 from lib.reference_data.mondo import get_mondo_term
-from lib.tasks.models import TaskType
+from lib.tasks.misc import enqueue_task
+from lib.tasks.models import TaskPriority, TaskType
+from lib.tasks.prompts import (
+    build_entity_context,
+    build_followup_prompt,
+    build_fulltext_context,
+    build_paper_context,
+    build_paper_prompt,
+)
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Patients per agent run in batched demographics extraction.
+DEMOGRAPHICS_BATCH_SIZE = 10
+
 
 def log_cache_metrics(task_type: str, result: Any) -> None:
     """Log prompt cache metrics from agent response."""
-    if not hasattr(result, 'raw_responses') or not result.raw_responses:
-        return
-
-    total_input = 0
-    total_cache_read = 0
-
-    for resp in result.raw_responses:
-        if not hasattr(resp, 'usage'):
-            continue
-
-        usage = resp.usage
-        input_tokens = usage.input_tokens or 0
-        cache_read = (
-            usage.input_tokens_details.cached_tokens
-            if usage.input_tokens_details and usage.input_tokens_details.cached_tokens
-            else 0
-        )
+    usage = RunUsage()
+    usage.add(result)
 
-        total_input += input_tokens
-        total_cache_read += cache_read
-
-    if total_input > 0:
-        cache_pct = (total_cache_read / total_input * 100) if total_input > 0 else 0
+    if usage.input_tokens > 0:
+        cache_pct = usage.cached_tokens / usage.input_tokens * 100
         logger.info(
             f'[CACHE] {task_type}: '
-            f'input={total_input} cached={total_cache_read} '
+            f'input={usage.input_tokens} cached={usage.cached_tokens} '
             f'({cache_pct:.1f}%)'
         )
 
@@ -193,41 +199,7 @@ async def ensure_conversation_id(conversation_id: str | None) -> str:
     """Create a new conversation if needed, otherwise return the provided ID."""
     if conversation_id:
         return conversation_id
-
-    client = AsyncOpenAI(api_key=env.OPENAI_API_KEY)
-    conversation = await client.conversations.create()
-    return conversation.id
-
-
-def build_followup_prompt(additional_context: str) -> str:
-    """Build a follow-up prompt for continuing an existing agent conversation.
-
-    Args:
-        additional_context: Context/feedback to provide to the agent
-
-    Returns:
-        Formatted follow-up prompt
-    """
-    return f'Please review your previous analysis in light of the following additional context:\n\n{additional_context}'
-
-
-def format_paper_context(paper_markdown: str, gene_symbol: str | None = None) -> str:
-    """Format paper and gene context for inclusion in message input.
-
-    Args:
-        paper_markdown: The full paper content
-        gene_symbol: Optional gene symbol to include
-
-    Returns:
-        Formatted paper context string
-    """
-    sections = [
-        'PAPER AND GENE CONTEXT',
-        f'Paper (fulltext md):\n{paper_markdown}',
-    ]
-    if gene_symbol:
-        sections.append(f'Gene: {gene_symbol}')
-    return '\n\n'.join(sections)
+    return await create_conversation()
 
 
 async def handle_pdf_parsing(task_id: int) -> None:
@@ -271,12 +243,14 @@ async def handle_paper_section_classifier(task_id: int) -> None:
         agent = paper_classifier_agent
     else:
         # Initial query: build full message with paper + instructions
-        paper_markdown = fulltext_md(paper_id, supplement_format)
-        paper_context = format_paper_context(paper_markdown, gene_symbol)
-        message = f'{paper_context}\n\n{PAPER_CLASSIFIER_AGENT_INSTRUCTIONS}'
+        # Classification needs the full text, so this prefix is not shared.
+        paper_context = build_fulltext_context(paper_id, supplement_format)
+        message = build_paper_prompt(
+            paper_context, {'Gene': gene_symbol}, PAPER_CLASSIFIER_AGENT_INSTRUCTIONS
+        )
         agent = paper_classifier_agent
 
-    result = await Runner.run(agent, message, conversation_id=stored_conv_id)
+    result = await run_agent(agent, message, conversation_id=stored_conv_id)
     log_cache_metrics('PAPER_SECTION_CLASSIFIER', result)
 
     with session_scope() as session:
@@ -329,16 +303,18 @@ async def handle_paper_metadata(task_id: int) -> None:
         agent = paper_extraction_agent
     else:
         # Initial query: build full message with paper + instructions
-        paper_markdown = relevant_sections_md(
+        paper_context = build_paper_context(
             paper_id, supplement_format, section_classifications
         )
-        paper_context = format_paper_context(paper_markdown, gene_symbol)
-        message = f'{paper_context}\n\n{PAPER_EXTRACTION_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context, {'Gene': gene_symbol}, PAPER_EXTRACTION_AGENT_INSTRUCTIONS
+        )
         agent = paper_extraction_agent
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('PAPER_METADATA', result)
@@ -384,16 +360,18 @@ async def handle_variant_extraction(task_id: int) -> None:
         agent = variant_extraction_agent
     else:
         # Initial query: build full message with paper + instructions
-        paper_markdown = relevant_sections_md(
+        paper_context = build_paper_context(
             paper_id, supplement_format, section_classifications
         )
-        paper_context = format_paper_context(paper_markdown, gene_symbol)
-        message = f'{paper_context}\n\n{VARIANT_EXTRACTION_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context, {'Gene': gene_symbol}, VARIANT_EXTRACTION_AGENT_INSTRUCTIONS
+        )
         agent = variant_extraction_agent
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('VARIANT_EXTRACTION', result)
@@ -460,7 +438,7 @@ async def handle_pedigree_description(task_id: int) -> None:
         # Initial query: build full message with pedigree images + instructions
         message = f'{combined_text}\n\n{PEDIGREE_DESCRIBER_AGENT_INSTRUCTIONS}'
 
-    result = await Runner.run(
+    result = await run_agent(
         pedigree_describer_agent_for_paper(paper_id),
         message,
         conversation_id=stored_conv_id,
@@ -519,20 +497,20 @@ async def handle_patient_extraction(task_id: int) -> None:
         agent = patient_extraction_agent
     else:
         # Initial query: build full message with paper + task input + instructions
-        paper_markdown = relevant_sections_md(
+        paper_context = build_paper_context(
             paper_id, supplement_format, section_classifications
         )
-        paper_context = format_paper_context(paper_markdown)
-        message = (
-            f'{paper_context}\n\n'
-            f'Pedigree Description:\n{pedigree_descriptions_output}\n\n'
-            f'{PATIENT_EXTRACTION_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {'Pedigree Description': pedigree_descriptions_output},
+            PATIENT_EXTRACTION_AGENT_INSTRUCTIONS,
         )
         agent = patient_extraction_agent
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('PATIENT_EXTRACTION', result)
@@ -577,7 +555,18 @@ async def handle_patient_extraction(task_id: int) -> None:
 
 
 async def handle_patient_demographics(task_id: int) -> None:
-    """Extract demographics for a single already-identified patient."""
+    """Extract demographics for a single already-identified patient.
+
+    Paper-scoped tasks (no ``patient_id``) cover every patient of the paper;
+    see ``handle_batched_patient_demographics``.
+    """
+    with session_scope() as session:
+        task = session.get(TaskDB, task_id)
+        is_batch = task is not None and task.patient_id is None
+    if is_batch:
+        await handle_batched_patient_demographics(task_id)
+        return
+
     paper_id: int
     patient_id: int | None = None
     supplement_format: FileFormat | None = None
@@ -649,23 +638,29 @@ async def handle_patient_demographics(task_id: int) -> None:
         message = build_followup_prompt(additional_context)
         agent = patient_demographics_agent
     else:
-        # Initial query: build full message with paper + patient data + instructions
-        paper_markdown = relevant_sections_md(
-            paper_id, supplement_format, section_classifications
+        # Initial query: build full message with the passages about the
+        # patient + patient data + instructions
+        paper_context = build_entity_context(
+            paper_id,
+            supplement_format,
+            section_classifications,
+            [i for i in (patient_data['identifier'], proband_identifier) if i],
         )
-        paper_context = format_paper_context(paper_markdown)
-        message = (
-            f'{paper_context}\n\n'
-            f'Patient JSON:\n{patient_data}\n\n'
-            f'Proband Identifier:\n{proband_identifier}\n\n'
-            f'Pedigree Description:\n{pedigree_descriptions_output}\n\n'
-            f'{PATIENT_DEMOGRAPHICS_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {
+                'Patient JSON': patient_data,
+                'Proband Identifier': proband_identifier,
+                'Pedigree Description': pedigree_descriptions_output,
+            },
+            PATIENT_DEMOGRAPHICS_AGENT_INSTRUCTIONS,
         )
         agent = patient_demographics_agent
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('PATIENT_DEMOGRAPHICS', result)
@@ -682,6 +677,158 @@ async def handle_patient_demographics(task_id: int) -> None:
         apply_patient_demographics(patient_row, result.final_output)
 
 
+async def _extract_demographics_chunk(
+    paper_id: int,
+    supplement_format: FileFormat | None,
+    section_classifications: dict | None,
+    patients: list[dict[str, Any]],
+    pedigree_description: dict | None,
+    additional_context: str | None,
+) -> list[BatchedPatientDemographics]:
+    """One agent run extracting demographics for a chunk of patients."""
+    identifiers = {p['identifier'] for p in patients} | {
+        p['proband_identifier'] for p in patients if p['proband_identifier']
+    }
+    paper_context = build_entity_context(
+        paper_id, supplement_format, section_classifications, sorted(identifiers)
+    )
+    message = build_paper_prompt(
+        paper_context,
+        {
+            'Patients JSON': json.dumps(patients, indent=2),
+            'Pedigree Description': pedigree_description,
+        },
+        PATIENT_DEMOGRAPHICS_BATCH_AGENT_INSTRUCTIONS,
+    )
+    if additional_context is not None:
+        message += f'\n\nAdditional context from the curator:\n{additional_context}'
+    result = await run_evidence_agent(
+        patient_demographics_batch_agent, message, paper_id
+    )
+    log_cache_metrics('PATIENT_DEMOGRAPHICS', result)
+    expected = {p['patient_id'] for p in patients}
+    return [d for d in result.final_output if d.patient_id in expected]
+
+
+async def handle_batched_patient_demographics(task_id: int) -> None:
+    """Extract demographics for all of a paper's patients in a few agent runs.
+
+    Patients are ordered by family and split into chunks of at most
+    ``DEMOGRAPHICS_BATCH_SIZE``; each chunk is one agent run over the passages
+    that mention its patients or their probands.
+    Chunks run concurrently and results are applied per patient. Batched runs
+    do not keep a conversation, so a follow-up re-runs the extraction with the
+    curator's context appended. Patients the agent leaves out, and those of a
+    chunk whose run failed, fall back to their own per-patient task.
+    """
+    with session_scope() as session:
+        task = session.get(TaskDB, task_id)
+        if not task:
+            return
+        paper_id = task.paper_id
+        priority = TaskPriority(task.priority)
+        user_id = task.updated_by_user_id
+        additional_context = task.additional_context
+
+        paper = session.get(PaperDB, paper_id)
+        supplement_format = paper.supplement_format if paper else None
+        section_classifications = paper.section_classifications if paper else None
+
+        patient_rows = (
+            session.query(PatientDB)
+            .filter(PatientDB.paper_id == paper_id)
+            .order_by(PatientDB.family_id, PatientDB.id)
+            .all()
+        )
+        # Proband of each family, so relationship_to_proband is consistent.
+        proband_identifiers = {
+            p.family_id: p.identifier
+            for p in patient_rows
+            if p.proband_status == ProbandStatus.Proband.value
+        }
+        patients = [
+            {
+                'patient_id': p.id,
+                'identifier': p.identifier,
+                'identifier_quote': p.identifier_evidence['quote'],
+                'proband_status': p.proband_status,
+                'proband_identifier': proband_identifiers.get(p.family_id),
+            }
+            for p in patient_rows
+        ]
+
+        pedigree_row = (
+            session.query(PedigreeDB).filter(PedigreeDB.paper_id == paper_id).first()
+        )
+        pedigree_description = (
+            {
+                'image_id': pedigree_row.image_id,
+                'description': pedigree_row.description,
+            }
+            if pedigree_row
+            else None
+        )
+
+    if not patients:
+        return
+
+    chunks = [
+        patients[i : i + DEMOGRAPHICS_BATCH_SIZE]
+        for i in range(0, len(patients), DEMOGRAPHICS_BATCH_SIZE)
+    ]
+    results = await asyncio.gather(
+        *(
+            _extract_demographics_chunk(
+                paper_id,
+                supplement_format,
+                section_classifications,
+                chunk,
+                pedigree_description,
+                additional_context,
+            )
+            for chunk in chunks
+        ),
+        return_exceptions=True,
+    )
+    demographics: dict[int, BatchedPatientDemographics] = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logger.warning(
+                f'Task {task_id}: batched demographics failed for patients '
+                f'{[p["patient_id"] for p in chunk]}',
+                exc_info=result,
+            )
+            continue
+        demographics.update((d.patient_id, d) for d in result)
+
+    with session_scope() as session:
+        task = session.get(TaskDB, task_id)
+        if not task:
+            return
+        for patient_id, patient_demographics in demographics.items():
+            patient_row = session.get(PatientDB, patient_id)
+            if patient_row:
+                apply_patient_demographics(patient_row, patient_demographics)
+
+        missing = sorted({p['patient_id'] for p in patients} - demographics.keys())
+        if missing:
+            logger.warning(
+                f'Task {task_id}: no batched demographics for patients {missing}; '
+                'extracting them individually'
+            )
+            for patient_id in missing:
+                enqueue_task(
+                    session,
+                    paper_id=paper_id,
+                    task_type=TaskType.PATIENT_DEMOGRAPHICS,
+                    priority=priority,
+                    patient_id=patient_id,
+                    updated_by_user_id=user_id,
+                )
+
+
 async def handle_segregation_evidence_extraction(task_id: int) -> None:
     """Extract segregation evidence from paper for a specific family."""
     paper_id: int = 0
@@ -761,21 +908,28 @@ async def handle_segregation_evidence_extraction(task_id: int) -> None:
         message = build_followup_prompt(additional_context)
         agent = segregation_evidence_extractor
     else:
-        # Initial query: build full message with paper + family data + instructions
-        paper_markdown = relevant_sections_md(
-            paper_id, supplement_format, section_classifications
+        # Initial query: build full message with the passages about the family
+        # + family data + instructions
+        paper_context = build_entity_context(
+            paper_id,
+            supplement_format,
+            section_classifications,
+            [
+                family_info['family_identifier'],
+                *(p['identifier'] for p in family_info['patients']),
+            ],
         )
-        paper_context = format_paper_context(paper_markdown)
-        message = (
-            f'{paper_context}\n\n'
-            f'Family Structure: {json.dumps(family_info, indent=2, default=str)}\n\n'
-            f'{SEGREGATION_EVIDENCE_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {'Family Structure': json.dumps(family_info, indent=2, default=str)},
+            SEGREGATION_EVIDENCE_AGENT_INSTRUCTIONS,
         )
         agent = segregation_evidence_extractor
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('SEGREGATION_EVIDENCE_EXTRACTION', result)
@@ -897,17 +1051,20 @@ async def handle_segregation_analysis_computed(task_id: int) -> None:
         message = build_followup_prompt(additional_context)
     else:
         # Initial query: build full message with paper + family data + instructions
-        paper_markdown = relevant_sections_md(
+        paper_context = build_paper_context(
             paper_id, supplement_format, section_classifications
         )
-        paper_context = format_paper_context(paper_markdown)
-        message = (
-            f'{paper_context}\n\n'
-            f'Family Structure and Data: {json.dumps(family_info, indent=2, default=str)}\n\n'
-            f'{SEGREGATION_ANALYSIS_COMPUTED_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {
+                'Family Structure and Data': json.dumps(
+                    family_info, indent=2, default=str
+                )
+            },
+            SEGREGATION_ANALYSIS_COMPUTED_AGENT_INSTRUCTIONS,
         )
 
-    result = await Runner.run(
+    result = await run_agent(
         segregation_analysis_computed_agent,
         message,
         conversation_id=stored_conv_id,
@@ -981,7 +1138,7 @@ async def handle_variant_harmonization(task_id: int) -> None:
             f'{VARIANT_HARMONIZATION_AGENT_INSTRUCTIONS}'
         )
 
-    result = await Runner.run(
+    result = await run_agent(
         variant_harmonization_agent,
         message,
         max_turns=15,
@@ -1093,12 +1250,9 @@ async def handle_variant_annotation(task_id: int) -> None:
         ]
         variant_ids = [r.variant_id for r in rows]
 
-    # Offload blocking enrichment to thread (outside session context)
-    enriched_variants = await asyncio.to_thread(
-        enrich_variants_batch,
-        harmonized_variants,
-        gene_symbol,
-    )
+    # Lookups run concurrently on the event loop (outside session context),
+    # rate-limited per upstream host across all annotation tasks in the process
+    enriched_variants = await enrich_variants_batch(harmonized_variants, gene_symbol)
 
     # Store results in new session
     with session_scope() as session:
@@ -1205,22 +1359,24 @@ async def handle_patient_variant_occurrence(task_id: int) -> None:
         agent = patient_variant_occurrence_agent
     else:
         # Initial query: build full message with paper + variant/patient data + instructions
-        paper_markdown = relevant_sections_md(
+        paper_context = build_paper_context(
             paper_id, supplement_format, section_classifications
         )
-        paper_context = format_paper_context(paper_markdown)
-        message = (
-            f'{paper_context}\n\n'
-            f'Variants JSON:\n{structured_variants}\n\n'
-            f'Patients JSON:\n{structured_patients}\n\n'
-            f'Pedigree Description:\n{pedigree_descriptions_output}\n\n'
-            f'{PATIENT_VARIANT_OCCURRENCE_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {
+                'Variants JSON': structured_variants,
+                'Patients JSON': structured_patients,
+                'Pedigree Description': pedigree_descriptions_output,
+            },
+            PATIENT_VARIANT_OCCURRENCE_AGENT_INSTRUCTIONS,
         )
         agent = patient_variant_occurrence_agent
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('PATIENT_VARIANT_OCCURRENCE', result)
@@ -1327,24 +1483,31 @@ async def handle_compound_het_evaluation(task_id: int) -> None:
             for link in het_links
         ]
 
-        # Get paper markdown
-        paper_markdown = relevant_sections_md(
-            paper_id, supplement_format, section_classifications
+        paper_context = build_entity_context(
+            paper_id,
+            supplement_format,
+            section_classifications,
+            [
+                patient.identifier,
+                *(v['description'] for v in variants_json if v['description']),
+            ],
         )
-        paper_context = format_paper_context(paper_markdown)
 
-        message = (
-            f'{paper_context}\n\n'
-            f'Patient: {patient.identifier}\n\n'
-            f'Pedigree Description:\n{pedigree_description}\n\n'
-            f'Heterozygous Variants for This Patient:\n'
-            f'{json.dumps(variants_json, indent=2)}\n\n'
-            f'{COMPOUND_HET_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {
+                'Patient': patient.identifier,
+                'Pedigree Description': pedigree_description,
+                'Heterozygous Variants for This Patient': json.dumps(
+                    variants_json, indent=2
+                ),
+            },
+            COMPOUND_HET_AGENT_INSTRUCTIONS,
         )
 
         agent_to_use = compound_het_agent
 
-    result = await Runner.run(
+    result = await run_agent(
         agent_to_use,
         message,
         conversation_id=stored_conv_id,
@@ -1440,21 +1603,25 @@ async def handle_phenotype_extraction(task_id: int) -> None:
         message = build_followup_prompt(additional_context)
         agent = patient_phenotype_linking_agent
     else:
-        # Initial query: build full message with paper + patient data + instructions
-        paper_markdown = relevant_sections_md(
-            paper_id, supplement_format, section_classifications
+        # Initial query: build full message with the passages about the
+        # patient + patient data + instructions
+        paper_context = build_entity_context(
+            paper_id,
+            supplement_format,
+            section_classifications,
+            [patient_data['identifier']],
         )
-        paper_context = format_paper_context(paper_markdown)
-        message = (
-            f'{paper_context}\n\n'
-            f'Structured Patient JSON:\n{[patient_data]}\n\n'
-            f'{PATIENT_PHENOTYPE_LINKING_AGENT_INSTRUCTIONS}'
+        message = build_paper_prompt(
+            paper_context,
+            {'Structured Patient JSON': [patient_data]},
+            PATIENT_PHENOTYPE_LINKING_AGENT_INSTRUCTIONS,
         )
         agent = patient_phenotype_linking_agent
 
-    result = await Runner.run(
+    result = await run_evidence_agent(
         agent,
         message,
+        paper_id,
         conversation_id=stored_conv_id,
     )
     log_cache_metrics('PHENOTYPE_EXTRACTION', result)
@@ -1479,12 +1646,55 @@ async def handle_phenotype_extraction(task_id: int) -> None:
             session.add(phenotype_to_db(paper_id, phenotype))
 
 
+def _hpo_linking_input(phenotype_row: PhenotypeDB, term_lookup: Any) -> dict[str, Any]:
+    """Phenotype JSON for the HPO linker, with locally matched candidate terms."""
+    candidates = find_matching_hpo_terms(
+        str(phenotype_row.concept), term_lookup=term_lookup
+    )
+    return {
+        'phenotype_id': phenotype_row.id,
+        'concept': phenotype_row.concept,
+        'negated': phenotype_row.negated,
+        'uncertain': phenotype_row.uncertain,
+        'family_history': phenotype_row.family_history,
+        'candidates': [c.model_dump() for c in candidates],
+    }
+
+
+def _auto_hpo_link(
+    phenotype_data: dict[str, Any], exact_index: dict[str, set[str]]
+) -> ReasoningBlock[HPOTerm] | None:
+    """An HPO link made without the agent, for unambiguous matches only.
+
+    Negated and family-history phenotypes are left to the agent (or, when
+    batched, stored unlinked).
+    """
+    if (
+        not env.HPO_AUTO_LINK
+        or phenotype_data['negated']
+        or phenotype_data['family_history']
+    ):
+        return None
+    return auto_link_hpo_term(
+        str(phenotype_data['concept']),
+        [HpoCandidate.model_validate(c) for c in phenotype_data['candidates']],
+        exact_index,
+        env.HPO_AUTO_LINK_MIN_SIMILARITY,
+    )
+
+
 async def handle_hpo_linking(task_id: int) -> None:
-    """Link a phenotype to HPO terms."""
+    """Link a phenotype to HPO terms.
+
+    Unambiguous matches are linked without the agent (see ``_auto_hpo_link``).
+    Tasks scoped to a patient (no ``phenotype_id``) link all of that patient's
+    phenotypes at once; see ``handle_batched_hpo_linking``.
+    """
     phenotype_id: int | None = None
     stored_conv_id: str | None = None
     additional_context: str | None = None
     phenotype_data: dict | None = None
+    auto_link: ReasoningBlock[HPOTerm] | None = None
 
     with session_scope() as session:
         task = session.get(TaskDB, task_id)
@@ -1492,43 +1702,49 @@ async def handle_hpo_linking(task_id: int) -> None:
             return
 
         phenotype_id = task.phenotype_id
-        if phenotype_id is None:
-            raise ValueError(f'Task {task_id}: HPO_LINKING requires phenotype_id')
+        is_batch = phenotype_id is None and task.patient_id is not None
+        if phenotype_id is None and not is_batch:
+            raise ValueError(
+                f'Task {task_id}: HPO_LINKING requires phenotype_id or patient_id'
+            )
 
         stored_conv_id = task.conversation_id
         additional_context = task.additional_context
 
-        phenotype_row = session.get(PhenotypeDB, phenotype_id)
-        if not phenotype_row:
-            return
-
-        term_lookup = build_term_lookup()
-        candidates = find_matching_hpo_terms(
-            str(phenotype_row.concept), term_lookup=term_lookup
-        )
+        phenotype_row = session.get(PhenotypeDB, phenotype_id) if phenotype_id else None
+        if phenotype_row:
+            phenotype_data = _hpo_linking_input(phenotype_row, get_term_lookup())
+            if additional_context is None:
+                auto_link = _auto_hpo_link(phenotype_data, get_exact_index())
 
-        phenotype_data = {
-            'phenotype_id': phenotype_row.id,
-            'concept': phenotype_row.concept,
-            'negated': phenotype_row.negated,
-            'uncertain': phenotype_row.uncertain,
-            'family_history': phenotype_row.family_history,
-            'candidates': [c.model_dump() for c in candidates],
-        }
+    if is_batch:
+        await handle_batched_hpo_linking(task_id)
+        return
+    if phenotype_id is None or phenotype_data is None:
+        return
 
-    stored_conv_id = await ensure_conversation_id(stored_conv_id)
+    if auto_link is not None:
+        logger.info(f'Task {task_id}: auto-linked phenotype {phenotype_id}')
+        with session_scope() as session:
+            session.query(HpoDB).filter(HpoDB.phenotype_id == phenotype_id).delete()
+            session.add(hpo_to_db(phenotype_id, auto_link))
+        return
 
-    if additional_context is not None:
+    if additional_context is not None and stored_conv_id is not None:
         # Follow-up: agent has context from conversation
         message = build_followup_prompt(additional_context)
     else:
-        # Initial query: build full message with phenotype data + instructions
+        # Initial query (or a follow-up on an auto-linked phenotype, which has
+        # no conversation): full message with phenotype data + instructions
         message = (
             f'Phenotype JSON:\n{json.dumps(phenotype_data, indent=2)}\n\n'
             f'{HPO_LINKING_AGENT_INSTRUCTIONS}'
         )
+        if additional_context is not None:
+            message += f'\n\nAdditional context from the curator:\n{additional_context}'
+    stored_conv_id = await ensure_conversation_id(stored_conv_id)
 
-    result = await Runner.run(
+    result = await run_agent(
         hpo_linking_agent,
         message,
         max_turns=15,
@@ -1556,6 +1772,134 @@ async def handle_hpo_linking(task_id: int) -> None:
         session.add(hpo_to_db(phenotype_id, result.final_output))
 
 
+async def handle_batched_hpo_linking(task_id: int) -> None:
+    """Link all of a patient's phenotypes to HPO terms in one agent run.
+
+    Candidates are matched locally for every phenotype and the agent returns
+    one mapping per phenotype, stored per ``HpoDB`` row. Negated and
+    family-history phenotypes are never mapped, so they are stored unlinked
+    without asking the model, and unambiguous matches are auto-linked (see
+    ``_auto_hpo_link``); the agent only sees the rest. Phenotypes the agent
+    leaves out of its answer fall back to their own per-phenotype HPO_LINKING
+    task.
+    """
+    with session_scope() as session:
+        task = session.get(TaskDB, task_id)
+        if not task or task.patient_id is None:
+            return
+        paper_id = task.paper_id
+        patient_id = task.patient_id
+        priority = TaskPriority(task.priority)
+        user_id = task.updated_by_user_id
+        stored_conv_id = task.conversation_id
+        additional_context = task.additional_context
+
+        phenotypes = (
+            session.query(PhenotypeDB)
+            .filter(PhenotypeDB.patient_id == patient_id)
+            .order_by(PhenotypeDB.id)
+            .all()
+        )
+        term_lookup = get_term_lookup()
+        links = [
+            PhenotypeHpoLink(
+                phenotype_id=p.id,
+                value=HPOTerm(id=None, name=None),
+                reasoning='Phenotype is negated or describes family history, '
+                'so it is not mapped to an HPO term.',
+            )
+            for p in phenotypes
+            if p.negated or p.family_history
+        ]
+        batch = []
+        auto_linked = 0
+        exact_index = get_exact_index()
+        for p in phenotypes:
+            if p.negated or p.family_history:
+                continue
+            phenotype_data = _hpo_linking_input(p, term_lookup)
+            auto_link = (
+                _auto_hpo_link(phenotype_data, exact_index)
+                if additional_context is None
+                else None
+            )
+            if auto_link is None:
+                batch.append(phenotype_data)
+            else:
+                links.append(
+                    PhenotypeHpoLink(phenotype_id=p.id, **auto_link.model_dump())
+                )
+                auto_linked += 1
+        if auto_linked:
+            logger.info(
+                f'Task {task_id}: auto-linked {auto_linked}/{auto_linked + len(batch)} '
+                'phenotypes'
+            )
+
+    expected = {p['phenotype_id'] for p in batch}
+    if batch:
+        if additional_context is not None and stored_conv_id is not None:
+            # Follow-up: agent has context from conversation
+            message = build_followup_prompt(additional_context)
+        else:
+            message = (
+                f'Phenotypes JSON:\n{json.dumps(batch, indent=2)}\n\n'
+                f'{HPO_BATCH_LINKING_AGENT_INSTRUCTIONS}'
+            )
+            if additional_context is not None:
+                message += (
+                    f'\n\nAdditional context from the curator:\n{additional_context}'
+                )
+        stored_conv_id = await ensure_conversation_id(stored_conv_id)
+        result = await run_agent(
+            hpo_batch_linking_agent,
+            message,
+            # Tool exploration grows with the number of phenotypes.
+            max_turns=15 + len(batch),
+            conversation_id=stored_conv_id,
+            run_config=RunConfig(
+                trace_metadata={
+                    'paper_id': str(paper_id),
+                    'patient_id': str(patient_id),
+                    'phenotypes': str(len(batch)),
+                },
+            ),
+        )
+        log_cache_metrics('HPO_LINKING', result)
+        links += [link for link in result.final_output if link.phenotype_id in expected]
+
+    # Store results in new session
+    with session_scope() as session:
+        task = session.get(TaskDB, task_id)
+        if not task:
+            return
+
+        task.conversation_id = stored_conv_id
+
+        linked = {link.phenotype_id: link for link in links}
+        # Idempotent: delete-then-insert
+        session.query(HpoDB).filter(HpoDB.phenotype_id.in_(linked)).delete()
+        for phenotype_id, link in linked.items():
+            session.add(hpo_to_db(phenotype_id, link))
+
+        # A follow-up may deliberately answer for only some phenotypes.
+        missing = sorted(expected - linked.keys())
+        if missing and additional_context is None:
+            logger.warning(
+                f'Task {task_id}: batched HPO linking skipped phenotypes {missing}; '
+                'linking them individually'
+            )
+            for phenotype_id in missing:
+                enqueue_task(
+                    session,
+                    paper_id=paper_id,
+                    task_type=TaskType.HPO_LINKING,
+                    priority=priority,
+                    phenotype_id=phenotype_id,
+                    updated_by_user_id=user_id,
+                )
+
+
 def _build_mondo_linking_target(
     session: Session, task: TaskDB
 ) -> MondoLinkingTarget | None:
@@ -1630,21 +1974,22 @@ async def handle_mondo_linking(task_id: int) -> None:
             # Lead with the shared paper-context prefix so the API can reuse the
             # cache the other paper agents already warmed, then append the
             # MONDO-specific target and instructions.
-            paper_markdown = fulltext_md(target.paper_id, supplement_format)
-            paper_context = format_paper_context(paper_markdown, target.gene_symbol)
+            paper_context = build_fulltext_context(target.paper_id, supplement_format)
             target_payload = {
                 'scope': target.scope.value,
                 'patient_variant_occurrence_id': target.patient_variant_occurrence_id,
                 'disease_text': target.disease_text,
                 'inheritance_mode': target.inheritance_mode,
             }
-            message = (
-                f'{paper_context}\n\n'
-                f'MONDO linking target JSON:\n'
-                f'{json.dumps(target_payload, indent=2)}\n\n'
-                f'{MONDO_LINKING_AGENT_INSTRUCTIONS}'
+            message = build_paper_prompt(
+                paper_context,
+                {
+                    'Gene': target.gene_symbol,
+                    'MONDO linking target JSON': json.dumps(target_payload, indent=2),
+                },
+                MONDO_LINKING_AGENT_INSTRUCTIONS,
             )
-        result = await Runner.run(
+        result = await run_agent(
             mondo_linking_agent,
             message,
             max_turns=25,
@@ -1,5 +1,7 @@
+import datetime
 from typing import Literal
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from lib.models.agent_run import AgentRunDB
@@ -11,10 +13,12 @@ from lib.tasks.models import (
     TASK_SUCCESSORS,
     InferredPaperStatus,
     TaskDB,
+    TaskPriority,
     TaskResp,
     TaskStatus,
     TaskType,
 )
+from lib.tasks.wakeup import notify_workers_on_commit
 
 
 def enqueue_task(
@@ -29,15 +33,18 @@ def enqueue_task(
     skip_successors: bool = False,
     additional_context: str | None = None,
     updated_by_user_id: int | None = None,
+    priority: TaskPriority = TaskPriority.BULK,
 ) -> TaskDB:
     """Create or reset a task to PENDING status.
 
     Checks for existing task and updates it, or creates new one.
     If task is currently running, returns it unchanged.
-    Returns the task (either newly created or reset).
+    Returns the task (either newly created or reset). Workers are woken once the
+    enclosing transaction commits.
 
     ``updated_by_user_id`` records who triggered the task; leave ``None`` for
     machine enqueues (worker successors) so they stay unattributed.
+    ``priority`` picks the scheduling lane (see ``TaskPriority``).
     """
     # Get latest agent run
     latest_run = session.query(AgentRunDB).order_by(AgentRunDB.id.desc()).first()
@@ -66,15 +73,18 @@ def enqueue_task(
             return existing_task
         # Reset existing task
         existing_task.status = TaskStatus.PENDING
+        existing_task.enqueued_at = datetime.datetime.now(datetime.timezone.utc)
         existing_task.tries = 0
         existing_task.error_message = None
         existing_task.skip_successors = skip_successors
         existing_task.additional_context = additional_context
         existing_task.updated_by_user_id = updated_by_user_id
+        existing_task.priority = priority
         # Clear conversation_id if not providing new context (start fresh).
         if additional_context is None:
             existing_task.conversation_id = None
         session.flush()
+        notify_workers_on_commit(session)
         return existing_task
     else:
         # Create new task
@@ -91,9 +101,11 @@ def enqueue_task(
             skip_successors=skip_successors,
             additional_context=additional_context,
             updated_by_user_id=updated_by_user_id,
+            priority=priority,
         )
         session.add(new_task)
         session.flush()
+        notify_workers_on_commit(session)
         return new_task
 
 
@@ -104,6 +116,7 @@ def enqueue_all_instances(
     skip_successors: bool = False,
     additional_context: str | None = None,
     updated_by_user_id: int | None = None,
+    priority: TaskPriority = TaskPriority.BULK,
 ) -> list[TaskDB]:
     """Re-queue all instances of a task type for a paper.
 
@@ -126,16 +139,20 @@ def enqueue_all_instances(
         for task in existing_tasks:
             if task.status not in (TaskStatus.RUNNING, TaskStatus.QUEUED):
                 task.status = TaskStatus.PENDING
+                task.enqueued_at = datetime.datetime.now(datetime.timezone.utc)
                 task.tries = 0
                 task.error_message = None
                 task.skip_successors = skip_successors
                 task.additional_context = additional_context
                 task.updated_by_user_id = updated_by_user_id
+                task.priority = priority
                 # Clear conversation_id if not providing new context (start fresh)
                 if additional_context is None:
                     task.conversation_id = None
                 results.append(task)
         session.flush()
+        if results:
+            notify_workers_on_commit(session)
         return results if results else existing_tasks
     else:
         # No existing tasks, create a global one
@@ -146,6 +163,7 @@ def enqueue_all_instances(
             skip_successors=skip_successors,
             additional_context=additional_context,
             updated_by_user_id=updated_by_user_id,
+            priority=priority,
         )
         return [task]
 
@@ -167,8 +185,8 @@ def _task_completed(session: Session, paper_id: int, task_type: TaskType) -> boo
 def _patient_demographics_ready(session: Session, paper_id: int) -> bool:
     """Whether patient identity + all per-patient demographics are complete.
 
-    True once PATIENT_EXTRACTION has completed and every per-patient
-    PATIENT_DEMOGRAPHICS task (if any) has completed. With zero patients there
+    True once PATIENT_EXTRACTION has completed and every PATIENT_DEMOGRAPHICS
+    task (batched or per-patient, if any) has completed. With zero patients there
     are no demographics tasks, so this reduces to "patient extraction done",
     preserving the pre-split behavior for papers with no extractable patients.
     """
@@ -195,10 +213,13 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
     The triggering user (``task.updated_by_user_id``) is propagated to successor
     tasks so the attribution chain is preserved end-to-end. Tasks triggered by the
     worker itself (initial pipeline runs) have no user and stay unattributed.
+    The task's priority lane is propagated the same way, so a curator's rerun
+    stays interactive all the way down the pipeline.
     """
     from lib.models import FamilyDB, PatientDB, PhenotypeDB, VariantDB
 
     user_id = task.updated_by_user_id
+    priority = TaskPriority(task.priority)
 
     match task.type:
         case TaskType.PDF_PARSING:
@@ -206,6 +227,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.PAPER_CLASSIFIER,
+                priority=priority,
                 updated_by_user_id=user_id,
             )
 
@@ -214,18 +236,21 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.PAPER_METADATA,
+                priority=priority,
                 updated_by_user_id=user_id,
             )
             enqueue_task(
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.VARIANT_EXTRACTION,
+                priority=priority,
                 updated_by_user_id=user_id,
             )
             enqueue_task(
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.PEDIGREE_DESCRIPTION,
+                priority=priority,
                 updated_by_user_id=user_id,
             )
 
@@ -234,22 +259,24 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.PATIENT_EXTRACTION,
+                priority=priority,
                 updated_by_user_id=user_id,
             )
 
         case TaskType.PATIENT_EXTRACTION:
-            # Expand to per-patient PATIENT_DEMOGRAPHICS tasks
+            # One paper-scoped PATIENT_DEMOGRAPHICS task covers every patient
+            # (batched; see handle_batched_patient_demographics)
             patients = (
                 session.query(PatientDB)
                 .filter(PatientDB.paper_id == task.paper_id)
                 .all()
             )
-            for patient in patients:
+            if patients:
                 enqueue_task(
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.PATIENT_DEMOGRAPHICS,
-                    patient_id=patient.id,
+                    priority=priority,
                     updated_by_user_id=user_id,
                 )
 
@@ -262,18 +289,41 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.PATIENT_VARIANT_OCCURRENCES,
+                    priority=priority,
                     updated_by_user_id=user_id,
                 )
 
         case TaskType.PATIENT_DEMOGRAPHICS:
-            # Per-patient PHENOTYPE_EXTRACTION for this patient
-            enqueue_task(
-                session,
-                paper_id=task.paper_id,
-                task_type=TaskType.PHENOTYPE_EXTRACTION,
-                patient_id=task.patient_id,
-                updated_by_user_id=user_id,
-            )
+            # Per-patient PHENOTYPE_EXTRACTION for this patient, or for every
+            # patient a paper-scoped batch covered. Patients the batch handed
+            # off to their own demographics task are enqueued when that ends.
+            if task.patient_id is not None:
+                patient_ids = [task.patient_id]
+            else:
+                handed_off = select(TaskDB.patient_id).where(
+                    TaskDB.paper_id == task.paper_id,
+                    TaskDB.type == TaskType.PATIENT_DEMOGRAPHICS,
+                    TaskDB.patient_id.is_not(None),
+                    TaskDB.status != TaskStatus.COMPLETED,
+                )
+                patient_ids = [
+                    patient_id
+                    for (patient_id,) in session.query(PatientDB.id)
+                    .filter(
+                        PatientDB.paper_id == task.paper_id,
+                        PatientDB.id.not_in(handed_off),
+                    )
+                    .all()
+                ]
+            for patient_id in patient_ids:
+                enqueue_task(
+                    session,
+                    paper_id=task.paper_id,
+                    task_type=TaskType.PHENOTYPE_EXTRACTION,
+                    priority=priority,
+                    patient_id=patient_id,
+                    updated_by_user_id=user_id,
+                )
 
             # Fan-in: once all patients have demographics and variants are
             # extracted, patient-variant occurrences can run.
@@ -284,6 +334,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.PATIENT_VARIANT_OCCURRENCES,
+                    priority=priority,
                     updated_by_user_id=user_id,
                 )
 
@@ -299,6 +350,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.VARIANT_HARMONIZATION,
+                    priority=priority,
                     variant_id=variant.id,
                     updated_by_user_id=user_id,
                 )
@@ -310,6 +362,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.PATIENT_VARIANT_OCCURRENCES,
+                    priority=priority,
                     updated_by_user_id=user_id,
                 )
 
@@ -318,6 +371,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.VARIANT_ANNOTATION,
+                priority=priority,
                 variant_id=task.variant_id,
                 updated_by_user_id=user_id,
             )
@@ -332,6 +386,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.SEGREGATION_EVIDENCE_EXTRACTION,
+                    priority=priority,
                     family_id=family.id,
                     updated_by_user_id=user_id,
                 )
@@ -355,6 +410,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.COMPOUND_HET_EVALUATION,
+                    priority=priority,
                     patient_id=patient_id,
                     updated_by_user_id=user_id,
                 )
@@ -365,6 +421,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.MONDO_LINKING,
+                priority=priority,
             )
 
             # Expand to per-occurrence MONDO_LINKING tasks for extracted disease names.
@@ -380,6 +437,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.MONDO_LINKING,
+                    priority=priority,
                     patient_variant_occurrence_id=occurrence.id,
                 )
 
@@ -388,26 +446,29 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.SEGREGATION_ANALYSIS_COMPUTED,
+                priority=priority,
                 family_id=task.family_id,
                 updated_by_user_id=user_id,
             )
 
         case TaskType.PHENOTYPE_EXTRACTION:
-            # Expand to per-phenotype HPO_LINKING tasks (filtered by this patient's phenotypes)
-            phenotypes = (
-                session.query(PhenotypeDB)
+            # One batched HPO_LINKING task links all of this patient's phenotypes
+            has_phenotypes = (
+                session.query(PhenotypeDB.id)
                 .filter(
                     PhenotypeDB.paper_id == task.paper_id,
                     PhenotypeDB.patient_id == task.patient_id,
                 )
-                .all()
+                .first()
+                is not None
             )
-            for phenotype in phenotypes:
+            if has_phenotypes:
                 enqueue_task(
                     session,
                     paper_id=task.paper_id,
                     task_type=TaskType.HPO_LINKING,
-                    phenotype_id=phenotype.id,
+                    priority=priority,
+                    patient_id=task.patient_id,
                     updated_by_user_id=user_id,
                 )
 
@@ -416,6 +477,7 @@ def enqueue_successors(session: Session, task: TaskDB) -> None:
                 session,
                 paper_id=task.paper_id,
                 task_type=TaskType.MONDO_LINKING,
+                priority=priority,
             )
 
         case (
@@ -583,3 +645,19 @@ def get_all_successor_levels(task_type: TaskType) -> list[list[TaskType]]:
         current_level = next_level
 
     return levels
+
+
+def critical_path_score(task_type: TaskType) -> int:
+    """How much pipeline work a task type unblocks, for scheduling order.
+
+    Ranks by downstream depth (number of successor levels), breaking ties by
+    fan-out (number of distinct downstream task types). Leaf tasks score 0.
+    """
+    levels = get_all_successor_levels(task_type)
+    descendants = sum(len(level) for level in levels)
+    return len(levels) * len(TaskType) + descendants
+
+
+CRITICAL_PATH_SCORES: dict[TaskType, int] = {
+    task_type: critical_path_score(task_type) for task_type in TaskType
+}
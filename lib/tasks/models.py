@@ -1,5 +1,5 @@
-from datetime import datetime
-from enum import StrEnum
+from datetime import datetime, timezone
+from enum import IntEnum, StrEnum
 from typing import TYPE_CHECKING
 
 from pydantic import BaseModel
@@ -71,6 +71,26 @@ class TaskStatus(StrEnum):
     FAILED = 'Failed'
 
 
+class TaskAttemptOutcome(StrEnum):
+    COMPLETED = 'Completed'
+    FAILED = 'Failed'
+    # The handler finished, but the lease had already been reclaimed.
+    LEASE_LOST = 'Lease Lost'
+    # The worker stopped heartbeating and the lease was reclaimed.
+    LEASE_EXPIRED = 'Lease Expired'
+
+
+class TaskPriority(IntEnum):
+    """Scheduling lane of a task; higher values are claimed first.
+
+    INTERACTIVE is for work a curator is waiting on (API reruns, chat actions)
+    and is propagated to successors; workers also reserve slots for it.
+    """
+
+    BULK = 0
+    INTERACTIVE = 10
+
+
 class InferredPaperStatus(StrEnum):
     """Inferred overall status of a paper based on its task states.
 
@@ -176,12 +196,30 @@ class TaskDB(Base):
         index=True,
     )
     tries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    priority: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=TaskPriority.BULK, server_default='0'
+    )
     error_message: Mapped[str | None] = mapped_column(String, nullable=True)
     skip_successors: Mapped[bool] = mapped_column(
         Boolean, nullable=False, default=False, server_default='0'
     )
     conversation_id: Mapped[str | None] = mapped_column(String, nullable=True)
     additional_context: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Worker process (host:pid) that last claimed this task.
+    worker_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Token of the claim currently holding the task; set only while QUEUED/RUNNING.
+    lease_owner: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Last lease renewal by the owning worker; stale heartbeats are reclaimed.
+    heartbeat_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # When the task last became PENDING (enqueue, reset, or retry); the start of
+    # the next attempt's queue wait.
+    enqueued_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        default=lambda: datetime.now(timezone.utc),
+    )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
@@ -213,6 +251,64 @@ class TaskDB(Base):
     )
 
 
+class TaskAttemptDB(Base):
+    """One execution attempt of a task; rows are appended, never reset.
+
+    Opened when a worker starts the task and closed with the outcome, so
+    ``tasks`` keeps only the latest state while this table keeps the timeline.
+    """
+
+    __tablename__ = 'task_attempts'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    task_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey('tasks.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+    )
+    type: Mapped[TaskType] = mapped_column(
+        SQLEnum(TaskType), nullable=False, index=True
+    )
+    attempt: Mapped[int] = mapped_column(Integer, nullable=False)
+    worker_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    queued_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    claimed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, index=True
+    )
+    outcome: Mapped[TaskAttemptOutcome | None] = mapped_column(
+        SQLEnum(TaskAttemptOutcome), nullable=True
+    )
+    error_message: Mapped[str | None] = mapped_column(String, nullable=True)
+    # LLM usage summed over every agent run the attempt made.
+    requests: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+    input_tokens: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+    cached_tokens: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+    output_tokens: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+    # Models that answered the attempt's agent runs, comma-separated in order
+    # of first use, and how many runs escalated from the cascade's fast model.
+    models: Mapped[str | None] = mapped_column(String, nullable=True)
+    escalations: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default='0'
+    )
+
+
 class TaskResp(BaseModel):
     id: int
     paper_id: int
@@ -229,10 +325,57 @@ class TaskResp(BaseModel):
     phenotype_id: int | None
     patient_variant_occurrence_id: int | None
     updated_at: datetime
+    priority: int = TaskPriority.BULK
+    worker_id: str | None = None
     updated_by_user_id: int | None = None
     updated_by: UserSummaryResp | None = None
 
 
+class TaskTypeStatsResp(BaseModel):
+    """Attempt timings for one task type over a window; durations in seconds."""
+
+    type: TaskType
+    attempts: int
+    completed: int
+    failed: int
+    # Attempts beyond a task's first (retries, reruns after lease expiry).
+    retries: int
+    # Completed attempts per hour over the window.
+    throughput_per_hour: float
+    queue_wait_p50_s: float | None
+    queue_wait_p95_s: float | None
+    run_time_p50_s: float | None
+    run_time_p95_s: float | None
+    # Enqueue to finish.
+    latency_p50_s: float | None
+    latency_p95_s: float | None
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+    # Share of input tokens served from the provider's prompt cache.
+    cached_input_ratio: float | None
+    # Agent runs re-run on the main model after the fast model's answer was
+    # rejected (see LLM_FAST_MODEL).
+    escalations: int = 0
+
+
+class HpoAutoLinkStatsResp(BaseModel):
+    """Phenotypes whose HPO link was stored over a window, and how many were
+    auto-linked without the agent."""
+
+    phenotypes: int
+    auto_linked: int
+    # Share of phenotypes linked by the fast path.
+    hit_rate: float | None
+
+
+class TaskStatsResp(BaseModel):
+    since: datetime
+    until: datetime
+    types: list[TaskTypeStatsResp]
+    hpo_auto_link: HpoAutoLinkStatsResp | None = None
+
+
 class TaskCreateRequest(BaseModel):
     type: TaskType
     family_id: int | None = None
@@ -0,0 +1,167 @@
+"""Prompt assembly for agent runs over a paper's text.
+
+Every initial run over a paper leads with the same bytes: the paper-context
+block from ``build_paper_context``, built from the paper's relevant sections.
+Task-specific input (patient JSON, gene, pedigree description, ...) and the
+agent's instructions follow it, so the provider's prompt cache can reuse the
+paper prefix across all of a paper's tasks. Runs for a paper also share
+``paper_prompt_cache_key``, which routes them to the same cache.
+
+Agents that read the whole paper (section classification, MONDO linking and
+paper chat) get ``build_fulltext_context`` instead; their prefix is the full
+text and so is not shared with the relevant-sections runs.
+
+Per-entity agents (one patient or family) instead get ``build_entity_context``:
+only the passages that mention the entity, which is far smaller than the paper.
+
+With ``COMPACT_EVIDENCE`` both are rendered from the passage index with an
+anchor before every sentence and table row, for agents to cite in place of
+verbatim quotes (see ``lib.agents.evidence_anchors``).
+"""
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+from lib.core.environment import env
+from lib.misc.pdf.passages import (
+    load_passages,
+    relevant_passages,
+    render_passages,
+    select_passages,
+)
+from lib.misc.pdf.paths import fulltext_md, relevant_sections_md
+
+if TYPE_CHECKING:
+    from lib.models.paper import FileFormat
+
+logger = logging.getLogger(__name__)
+
+
+def build_followup_prompt(additional_context: str) -> str:
+    """Build a follow-up prompt for continuing an existing agent conversation.
+
+    Args:
+        additional_context: Context/feedback to provide to the agent
+
+    Returns:
+        Formatted follow-up prompt
+    """
+    return f'Please review your previous analysis in light of the following additional context:\n\n{additional_context}'
+
+
+def build_paper_context(
+    paper_id: int,
+    supplement_format: 'FileFormat | None' = None,
+    section_classifications: dict | None = None,
+) -> str:
+    """The shared paper prefix: relevant sections plus supplement, nothing task-specific.
+
+    Args:
+        paper_id: ID of the paper
+        supplement_format: Format of supplement if present
+        section_classifications: ``paper.section_classifications``; the full
+            text is used until sections have been classified
+
+    Returns:
+        Formatted paper context string
+    """
+    passages = load_passages(paper_id) if env.COMPACT_EVIDENCE else []
+    if passages:
+        paper_markdown = render_passages(
+            relevant_passages(passages, section_classifications), anchored=True
+        )
+    else:
+        paper_markdown = relevant_sections_md(
+            paper_id, supplement_format, section_classifications
+        )
+    return _paper_context(paper_markdown)
+
+
+def build_fulltext_context(
+    paper_id: int, supplement_format: 'FileFormat | None' = None
+) -> str:
+    """The paper context for agents that read the whole, unfiltered paper.
+
+    Args:
+        paper_id: ID of the paper
+        supplement_format: Format of supplement if present
+
+    Returns:
+        Formatted paper context string
+    """
+    return _paper_context(fulltext_md(paper_id, supplement_format))
+
+
+def _paper_context(paper_markdown: str) -> str:
+    return f'PAPER AND GENE CONTEXT\n\nPaper (fulltext md):\n{paper_markdown}'
+
+
+def build_entity_context(
+    paper_id: int,
+    supplement_format: 'FileFormat | None',
+    section_classifications: dict | None,
+    identifiers: list[str],
+) -> str:
+    """Paper excerpts mentioning the given identifiers, or the full paper context.
+
+    Passages are retrieved from the paper's passage index by identifier and
+    alias match within ``RETRIEVAL_CONTEXT_MAX_TOKENS``. Falls back to
+    ``build_paper_context`` when retrieval is disabled or nothing matches.
+
+    Args:
+        paper_id: ID of the paper
+        supplement_format: Format of supplement if present
+        section_classifications: ``paper.section_classifications``
+        identifiers: Patient, family or variant identifiers the task is about
+
+    Returns:
+        Formatted paper context string
+    """
+    selected = (
+        select_passages(
+            load_passages(paper_id),
+            identifiers,
+            env.RETRIEVAL_CONTEXT_MAX_TOKENS,
+            section_classifications,
+        )
+        if env.RETRIEVAL_CONTEXT_MAX_TOKENS > 0
+        else None
+    )
+    if selected is None:
+        return build_paper_context(paper_id, supplement_format, section_classifications)
+    logger.info(
+        f'Paper {paper_id}: {len(selected)} passages '
+        f'(~{sum(p.tokens for p in selected)} tokens) mention {identifiers}'
+    )
+    return (
+        'PAPER EXCERPTS\n\n'
+        'Passages of the paper and supplement that mention '
+        f'{", ".join(identifiers)}, in document order:\n'
+        f'{render_passages(selected, anchored=env.COMPACT_EVIDENCE)}'
+    )
+
+
+def build_paper_prompt(
+    paper_context: str, task_inputs: dict[str, Any], instructions: str
+) -> str:
+    """Message for an initial run: paper prefix, then task inputs, then instructions.
+
+    Args:
+        paper_context: ``build_paper_context`` or ``build_entity_context``
+            output for the task's paper
+        task_inputs: Labelled task-specific inputs, in order; values are
+            included as formatted by the caller
+        instructions: The agent's task instructions
+
+    Returns:
+        The message to send to the agent
+    """
+    sections = [paper_context]
+    sections.extend(f'{label}:\n{value}' for label, value in task_inputs.items())
+    sections.append(instructions)
+    return '\n\n'.join(sections)
+
+
+def paper_prompt_cache_key(paper_id: int) -> str:
+    """Prompt cache key shared by every agent run for a paper."""
+    return f'paper-{paper_id}'
@@ -0,0 +1,433 @@
+"""Lease-based task claiming shared by any number of worker processes.
+
+Every state transition a worker makes is a single conditional ``UPDATE``, so two
+processes pointed at the same database can never both claim, start, or finish
+the same task. A claim stamps the task with the claiming process's ``worker_id``
+and a fresh ``lease_owner`` token; starting and releasing the task only succeed
+while that token still holds the lease. The owning worker renews
+``heartbeat_at`` while it holds the lease, and a lease is considered dead once
+its heartbeat goes stale. Lease recovery clears the token, so a worker whose
+lease expired cannot overwrite the task's new state.
+
+Each start opens a ``TaskAttemptDB`` row that is closed with the attempt's
+outcome, timings, and LLM usage, giving a per-attempt history alongside the
+task's latest state.
+"""
+
+import datetime
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.orm import Session
+
+from lib.agents.runner import RunUsage
+from lib.tasks.misc import CRITICAL_PATH_SCORES
+from lib.tasks.models import (
+    TaskAttemptDB,
+    TaskAttemptOutcome,
+    TaskDB,
+    TaskPriority,
+    TaskStatus,
+    TaskType,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ClaimedTask:
+    id: int
+    type: TaskType
+    lease_owner: str
+    priority: int = TaskPriority.BULK
+    claimed_at: datetime.datetime | None = None
+
+
+def worker_identity() -> str:
+    """Identity recorded on claimed tasks: ``host:pid``."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def claim_tasks(
+    session: Session,
+    worker_id: str,
+    capacity: dict[TaskType, int],
+    limit: int,
+    lane: TaskPriority | None = None,
+    paper_cap: int | None = None,
+) -> list[ClaimedTask]:
+    """Atomically claim up to ``limit`` PENDING tasks, at most ``capacity[t]`` per type.
+
+    Within each type, candidates are ordered highest priority first and then
+    round-robin across papers (every paper's oldest task, then every paper's
+    second oldest, ...), so one paper's large fan-out cannot starve papers
+    queued after it. Across types, tasks that unblock more downstream work
+    (``CRITICAL_PATH_SCORES``) go first within a priority. The chosen rows are
+    flipped to QUEUED by one ``UPDATE ... RETURNING`` that re-checks
+    ``status = PENDING``; rows another worker claimed first are simply skipped.
+
+    ``lane`` restricts the claim to INTERACTIVE (priority >= INTERACTIVE) or
+    BULK (below it) tasks. ``paper_cap`` bounds how many tasks of one paper may
+    be QUEUED/RUNNING at once across all workers, counting this claim.
+    """
+    capacity = {t: n for t, n in capacity.items() if n > 0}
+    if not capacity or limit <= 0:
+        return []
+
+    filters = [TaskDB.status == TaskStatus.PENDING, TaskDB.type.in_(capacity)]
+    if lane == TaskPriority.INTERACTIVE:
+        filters.append(TaskDB.priority >= TaskPriority.INTERACTIVE)
+    elif lane == TaskPriority.BULK:
+        filters.append(TaskDB.priority < TaskPriority.INTERACTIVE)
+
+    criticality = case(
+        *(
+            (TaskDB.type == task_type, score)
+            for task_type, score in CRITICAL_PATH_SCORES.items()
+        ),
+        else_=0,
+    )
+    # Position of each pending task within its paper: per type for the
+    # round-robin, and across types (most blocking first) for the per-paper cap.
+    per_paper = (
+        select(
+            TaskDB.id,
+            TaskDB.type,
+            TaskDB.priority,
+            TaskDB.paper_id,
+            criticality.label('criticality'),
+            func.row_number()
+            .over(
+                partition_by=(TaskDB.type, TaskDB.paper_id),
+                order_by=(TaskDB.priority.desc(), TaskDB.id),
+            )
+            .label('paper_round'),
+            func.row_number()
+            .over(
+                partition_by=TaskDB.paper_id,
+                order_by=(TaskDB.priority.desc(), criticality.desc(), TaskDB.id),
+            )
+            .label('paper_rank'),
+        )
+        .where(*filters)
+        .subquery()
+    )
+    eligible = []
+    if paper_cap is not None:
+        paper_in_flight = (
+            select(TaskDB.paper_id, func.count().label('n'))
+            .where(TaskDB.status.in_([TaskStatus.QUEUED, TaskStatus.RUNNING]))
+            .group_by(TaskDB.paper_id)
+            .subquery()
+        )
+        in_flight = func.coalesce(
+            select(paper_in_flight.c.n)
+            .where(paper_in_flight.c.paper_id == per_paper.c.paper_id)
+            .scalar_subquery(),
+            0,
+        )
+        eligible.append(per_paper.c.paper_rank <= paper_cap - in_flight)
+    ranked = (
+        select(
+            per_paper.c.id,
+            per_paper.c.type,
+            per_paper.c.priority,
+            per_paper.c.criticality,
+            func.row_number()
+            .over(
+                partition_by=per_paper.c.type,
+                order_by=(
+                    per_paper.c.priority.desc(),
+                    per_paper.c.paper_round,
+                    per_paper.c.id,
+                ),
+            )
+            .label('rank'),
+        )
+        .where(*eligible)
+        .subquery()
+    )
+    type_limit = case(
+        *((ranked.c.type == task_type, n) for task_type, n in capacity.items()),
+        else_=0,
+    )
+    candidates = (
+        select(ranked.c.id)
+        .where(ranked.c.rank <= type_limit)
+        .order_by(
+            ranked.c.priority.desc(),
+            ranked.c.criticality.desc(),
+            ranked.c.rank,
+            ranked.c.id,
+        )
+        .limit(limit)
+    )
+
+    lease_owner = uuid.uuid4().hex
+    now = _now()
+    rows = session.execute(
+        update(TaskDB)
+        .where(TaskDB.id.in_(candidates), TaskDB.status == TaskStatus.PENDING)
+        .values(
+            status=TaskStatus.QUEUED,
+            worker_id=worker_id,
+            lease_owner=lease_owner,
+            heartbeat_at=now,
+            updated_at=now,
+        )
+        .returning(TaskDB.id, TaskDB.type, TaskDB.priority)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return [
+        ClaimedTask(
+            id=row.id,
+            type=row.type,
+            lease_owner=lease_owner,
+            priority=row.priority,
+            claimed_at=now,
+        )
+        for row in rows
+    ]
+
+
+def start_task(
+    session: Session,
+    task_id: int,
+    lease_owner: str,
+    claimed_at: datetime.datetime | None = None,
+) -> TaskAttemptDB | None:
+    """Move a claimed task from QUEUED to RUNNING and open its attempt record.
+
+    Returns ``None`` if the lease was lost (recovered by another worker) before
+    the task started.
+    """
+    now = _now()
+    started = session.execute(
+        update(TaskDB)
+        .where(
+            TaskDB.id == task_id,
+            TaskDB.lease_owner == lease_owner,
+            TaskDB.status == TaskStatus.QUEUED,
+        )
+        .values(
+            status=TaskStatus.RUNNING,
+            tries=TaskDB.tries + 1,
+            heartbeat_at=now,
+            updated_at=now,
+        )
+        .returning(TaskDB.type, TaskDB.tries, TaskDB.worker_id, TaskDB.enqueued_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if started is None:
+        return None
+    attempt = TaskAttemptDB(
+        task_id=task_id,
+        type=started.type,
+        attempt=started.tries,
+        worker_id=started.worker_id,
+        queued_at=started.enqueued_at,
+        claimed_at=claimed_at,
+        started_at=now,
+    )
+    session.add(attempt)
+    session.flush()
+    return attempt
+
+
+def release_task(
+    session: Session,
+    task_id: int,
+    lease_owner: str,
+    status: TaskStatus,
+    error_message: str | None = None,
+) -> TaskDB | None:
+    """Record a RUNNING task's outcome and give up its lease.
+
+    Returns ``None`` without writing anything if the lease was lost while the
+    handler ran.
+    """
+    released = session.execute(
+        update(TaskDB)
+        .where(
+            TaskDB.id == task_id,
+            TaskDB.lease_owner == lease_owner,
+            TaskDB.status == TaskStatus.RUNNING,
+        )
+        .values(
+            status=status,
+            error_message=error_message,
+            lease_owner=None,
+            heartbeat_at=None,
+            updated_at=_now(),
+        )
+        .returning(TaskDB.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if released is None:
+        return None
+    return session.get(TaskDB, task_id)
+
+
+def finish_attempt(
+    session: Session,
+    attempt_id: int,
+    outcome: TaskAttemptOutcome,
+    error_message: str | None = None,
+    usage: RunUsage | None = None,
+) -> None:
+    """Close an attempt record with its outcome and the LLM usage it incurred.
+
+    An attempt already closed by lease recovery keeps its LEASE_EXPIRED
+    outcome and finish time; only the usage is filled in.
+    """
+    usage = usage or RunUsage()
+    session.execute(
+        update(TaskAttemptDB)
+        .where(TaskAttemptDB.id == attempt_id)
+        .values(
+            requests=usage.requests,
+            input_tokens=usage.input_tokens,
+            cached_tokens=usage.cached_tokens,
+            output_tokens=usage.output_tokens,
+            models=','.join(usage.models) or None,
+            escalations=usage.escalations,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    session.execute(
+        update(TaskAttemptDB)
+        .where(TaskAttemptDB.id == attempt_id, TaskAttemptDB.finished_at.is_(None))
+        .values(finished_at=_now(), outcome=outcome, error_message=error_message)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _expire_open_attempts(
+    session: Session, task_ids: list[int], now: datetime.datetime
+) -> None:
+    if not task_ids:
+        return
+    session.execute(
+        update(TaskAttemptDB)
+        .where(
+            TaskAttemptDB.task_id.in_(task_ids),
+            TaskAttemptDB.finished_at.is_(None),
+        )
+        .values(finished_at=now, outcome=TaskAttemptOutcome.LEASE_EXPIRED)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def renew_leases(session: Session, lease_owners: set[str]) -> set[int]:
+    """Refresh ``heartbeat_at`` on every task still held by one of ``lease_owners``.
+
+    Returns the ids of the tasks renewed; any task the caller believes it holds
+    but that is missing from the result has lost its lease.
+    """
+    if not lease_owners:
+        return set()
+    rows = session.execute(
+        update(TaskDB)
+        .where(
+            TaskDB.lease_owner.in_(lease_owners),
+            TaskDB.status.in_([TaskStatus.RUNNING, TaskStatus.QUEUED]),
+        )
+        .values(heartbeat_at=_now())
+        .returning(TaskDB.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return {row.id for row in rows}
+
+
+def recover_expired_leases(
+    session: Session, lease_timeout_s: int, max_retries: int
+) -> int:
+    """Return QUEUED/RUNNING tasks whose heartbeat went stale to PENDING, or fail them.
+
+    A lease expires once its last heartbeat (or, for rows claimed before
+    heartbeats existed, its last update) is older than ``lease_timeout_s``.
+    Tasks with retries left go back to PENDING; the rest are marked FAILED.
+    Either way the lease token is cleared so the original worker can no longer
+    write to the task. Returns the number of tasks made PENDING again.
+    """
+    now = _now()
+    expired = and_(
+        TaskDB.status.in_([TaskStatus.RUNNING, TaskStatus.QUEUED]),
+        func.coalesce(TaskDB.heartbeat_at, TaskDB.updated_at)
+        < now - datetime.timedelta(seconds=lease_timeout_s),
+    )
+    reset = session.execute(
+        update(TaskDB)
+        .where(expired, TaskDB.tries < max_retries)
+        .values(
+            status=TaskStatus.PENDING,
+            conversation_id=None,
+            lease_owner=None,
+            heartbeat_at=None,
+            enqueued_at=now,
+            updated_at=now,
+        )
+        .returning(TaskDB.id, TaskDB.type, TaskDB.tries)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for row in reset:
+        logger.info(
+            f'Resetting timed-out task {row.id} ({row.type}) (attempt {row.tries + 1}/{max_retries + 1})'
+        )
+    abandoned = session.execute(
+        update(TaskDB)
+        .where(expired, TaskDB.tries >= max_retries)
+        .values(
+            status=TaskStatus.FAILED,
+            error_message=f'Task missed its lease heartbeat ({lease_timeout_s}s) and max retries',
+            lease_owner=None,
+            heartbeat_at=None,
+            updated_at=now,
+        )
+        .returning(TaskDB.id, TaskDB.type, TaskDB.tries)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for row in abandoned:
+        logger.info(
+            f'Abandoning timed-out task {row.id} ({row.type}) (exhausted retries at {row.tries})'
+        )
+    _expire_open_attempts(session, [row.id for row in (*reset, *abandoned)], now)
+    return len(reset)
+
+
+def requeue_failed_tasks(session: Session, retry_delay_s: int, max_retries: int) -> int:
+    """Return FAILED tasks with retries left to PENDING once ``retry_delay_s`` has passed.
+
+    Returns the number of tasks made PENDING again.
+    """
+    now = _now()
+    retried = session.execute(
+        update(TaskDB)
+        .where(
+            TaskDB.status == TaskStatus.FAILED,
+            TaskDB.tries <= max_retries,
+            TaskDB.updated_at < now - datetime.timedelta(seconds=retry_delay_s),
+        )
+        .values(
+            status=TaskStatus.PENDING,
+            error_message=None,
+            conversation_id=None,
+            enqueued_at=now,
+            updated_at=now,
+        )
+        .returning(TaskDB.id, TaskDB.type, TaskDB.tries)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for row in retried:
+        logger.info(
+            f'Retrying task {row.id} ({row.type}) (attempt {row.tries + 1}/{max_retries + 1})'
+        )
+    return len(retried)
@@ -0,0 +1,138 @@
+"""Per-type latency and throughput computed from the task attempt history."""
+
+import datetime
+import math
+from collections import defaultdict
+
+from sqlalchemy import and_, func, not_, or_, select
+from sqlalchemy.orm import Session
+
+from lib.models.phenotype import HpoDB, PhenotypeDB
+from lib.reference_data.hpo import AUTO_LINK_REASONING_PREFIX
+from lib.tasks.models import (
+    HpoAutoLinkStatsResp,
+    TaskAttemptDB,
+    TaskAttemptOutcome,
+    TaskStatsResp,
+    TaskType,
+    TaskTypeStatsResp,
+)
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile (``q`` in 0-100) of ``values``; ``None`` if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+
+def _seconds(
+    start: datetime.datetime | None, end: datetime.datetime | None
+) -> float | None:
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+
+def task_type_stats(
+    session: Session, since: datetime.datetime, until: datetime.datetime
+) -> TaskStatsResp:
+    """Summarise the attempts that finished in ``[since, until)``, per task type.
+
+    Queue wait runs from enqueue to start, run time from start to finish, and
+    latency from enqueue to finish. Types without finished attempts are omitted.
+    """
+    attempts = session.scalars(
+        select(TaskAttemptDB).where(
+            TaskAttemptDB.finished_at >= since, TaskAttemptDB.finished_at < until
+        )
+    ).all()
+    by_type: dict[TaskType, list[TaskAttemptDB]] = defaultdict(list)
+    for attempt in attempts:
+        by_type[attempt.type].append(attempt)
+
+    hours = (until - since).total_seconds() / 3600
+    types = []
+    for task_type in TaskType:
+        rows = by_type.get(task_type)
+        if not rows:
+            continue
+        waits = [
+            s for r in rows if (s := _seconds(r.queued_at, r.started_at)) is not None
+        ]
+        run_times = [
+            s for r in rows if (s := _seconds(r.started_at, r.finished_at)) is not None
+        ]
+        latencies = [
+            s for r in rows if (s := _seconds(r.queued_at, r.finished_at)) is not None
+        ]
+        completed = sum(1 for r in rows if r.outcome == TaskAttemptOutcome.COMPLETED)
+        input_tokens = sum(r.input_tokens for r in rows)
+        cached_tokens = sum(r.cached_tokens for r in rows)
+        types.append(
+            TaskTypeStatsResp(
+                type=task_type,
+                attempts=len(rows),
+                completed=completed,
+                failed=sum(1 for r in rows if r.outcome == TaskAttemptOutcome.FAILED),
+                retries=sum(1 for r in rows if r.attempt > 1),
+                throughput_per_hour=round(completed / hours, 3) if hours else 0.0,
+                queue_wait_p50_s=percentile(waits, 50),
+                queue_wait_p95_s=percentile(waits, 95),
+                run_time_p50_s=percentile(run_times, 50),
+                run_time_p95_s=percentile(run_times, 95),
+                latency_p50_s=percentile(latencies, 50),
+                latency_p95_s=percentile(latencies, 95),
+                input_tokens=input_tokens,
+                cached_tokens=cached_tokens,
+                output_tokens=sum(r.output_tokens for r in rows),
+                cached_input_ratio=(
+                    round(cached_tokens / input_tokens, 3) if input_tokens else None
+                ),
+                escalations=sum(r.escalations for r in rows),
+            )
+        )
+    return TaskStatsResp(
+        since=since,
+        until=until,
+        types=types,
+        hpo_auto_link=hpo_auto_link_stats(session, since, until),
+    )
+
+
+def hpo_auto_link_stats(
+    session: Session, since: datetime.datetime, until: datetime.datetime
+) -> HpoAutoLinkStatsResp:
+    """Hit rate of the HPO auto-link fast path over links stored in ``[since, until)``.
+
+    Negated and family-history phenotypes are stored unlinked without either
+    path, so they are left out of the rate.
+    """
+    linkable = (
+        select(func.count(HpoDB.id))
+        .join(PhenotypeDB, PhenotypeDB.id == HpoDB.phenotype_id)
+        .where(
+            HpoDB.updated_at >= since,
+            HpoDB.updated_at < until,
+            not_(
+                and_(
+                    HpoDB.hpo_id.is_(None),
+                    or_(PhenotypeDB.negated, PhenotypeDB.family_history),
+                )
+            ),
+        )
+    )
+    phenotypes = session.scalar(linkable) or 0
+    auto_linked = (
+        session.scalar(
+            linkable.where(HpoDB.reasoning.startswith(AUTO_LINK_REASONING_PREFIX))
+        )
+        or 0
+    )
+    return HpoAutoLinkStatsResp(
+        phenotypes=phenotypes,
+        auto_linked=auto_linked,
+        hit_rate=round(auto_linked / phenotypes, 3) if phenotypes else None,
+    )
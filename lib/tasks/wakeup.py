@@ -0,0 +1,89 @@
+"""Local wakeup channel between task producers and worker processes.
+
+Each worker binds a Unix datagram socket in ``env.wakeup_dir``. Producers (the
+API, the chat agent's ``queue_task`` tool, and workers enqueueing successors)
+send a one-byte datagram to every socket there once the transaction that made
+work runnable has committed. Delivery is best-effort: a lost wakeup only delays
+the task until the worker's fallback poll.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from lib.core.environment import env
+
+logger = logging.getLogger(__name__)
+
+_NOTIFY_ON_COMMIT_KEY = 'notify_workers_on_commit'
+
+
+def wakeup_socket_path(pid: int | None = None) -> Path:
+    """Path of the wakeup socket owned by worker process ``pid`` (default: self)."""
+    return env.wakeup_dir / f'{pid or os.getpid()}.sock'
+
+
+def notify_workers() -> None:
+    """Wake every listening worker. Never raises."""
+    for path in env.wakeup_dir.glob('*.sock'):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            try:
+                sock.sendto(b'1', str(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker exited without unbinding (e.g. killed); drop its socket.
+                path.unlink(missing_ok=True)
+            except BlockingIOError:
+                # Receive buffer full: that worker already has wakeups pending.
+                pass
+            except OSError as e:
+                logger.warning(f'Failed to wake worker at {path}: {e}')
+
+
+def notify_workers_on_commit(session: Session) -> None:
+    """Wake workers once the current transaction on ``session`` commits.
+
+    Notifying before commit would let a worker poll before the new rows are
+    visible, so the datagram is deferred to ``after_commit``. Repeated calls
+    within one transaction register a single notification.
+    """
+    if session.info.get(_NOTIFY_ON_COMMIT_KEY):
+        return
+    session.info[_NOTIFY_ON_COMMIT_KEY] = True
+
+    def _after_commit(session: Session) -> None:
+        session.info.pop(_NOTIFY_ON_COMMIT_KEY, None)
+        notify_workers()
+
+    event.listen(session, 'after_commit', _after_commit, once=True)
+
+
+def listen_for_wakeups(wakeup: asyncio.Event) -> socket.socket:
+    """Bind this process's wakeup socket and set ``wakeup`` whenever it is poked.
+
+    Must be called from within the running event loop. The caller owns the
+    returned socket; unlink ``wakeup_socket_path()`` on shutdown.
+    """
+    path = wakeup_socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(str(path))
+    sock.setblocking(False)
+
+    def _drain() -> None:
+        # Coalesce a burst of datagrams into a single wakeup.
+        while True:
+            try:
+                sock.recv(64)
+            except BlockingIOError:
+                break
+        wakeup.set()
+
+    asyncio.get_running_loop().add_reader(sock.fileno(), _drain)
+    return sock
@@ -0,0 +1,48 @@
+"""add tasks.worker_id and tasks.lease_owner
+
+``worker_id`` records which worker process (``host:pid``) last claimed a task;
+``lease_owner`` is the token of the claim currently holding it, set while the
+task is QUEUED/RUNNING and cleared on release or lease recovery. Together they
+let several worker processes share one queue without double-running tasks.
+
+The batch alter is wrapped in ``PRAGMA foreign_keys = OFF/ON`` per project
+convention (see b2c3d4e5f6a7).
+
+Revision ID: 1a2b3c4d5e6f
+Revises: fc41fce7ba4b
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '1a2b3c4d5e6f'
+down_revision: Union[str, None] = 'fc41fce7ba4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('worker_id', sa.String(), nullable=True))
+            batch_op.add_column(sa.Column('lease_owner', sa.String(), nullable=True))
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.drop_column('lease_owner')
+            batch_op.drop_column('worker_id')
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
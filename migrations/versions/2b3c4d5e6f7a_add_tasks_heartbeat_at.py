@@ -0,0 +1,46 @@
+"""add tasks.heartbeat_at
+
+Workers renew ``heartbeat_at`` on every task they hold a lease on; lease
+recovery now keys off a stale heartbeat instead of ``updated_at`` age.
+
+The batch alter is wrapped in ``PRAGMA foreign_keys = OFF/ON`` per project
+convention (see b2c3d4e5f6a7).
+
+Revision ID: 2b3c4d5e6f7a
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '2b3c4d5e6f7a'
+down_revision: Union[str, None] = '1a2b3c4d5e6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True)
+            )
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.drop_column('heartbeat_at')
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
@@ -0,0 +1,47 @@
+"""add tasks.priority
+
+Scheduling lane for a task (0 = bulk, 10 = interactive); workers claim higher
+priorities first and reserve slots for the interactive lane. Existing rows
+become bulk.
+
+The batch alter is wrapped in ``PRAGMA foreign_keys = OFF/ON`` per project
+convention (see b2c3d4e5f6a7).
+
+Revision ID: 3c4d5e6f7a8b
+Revises: 2b3c4d5e6f7a
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3c4d5e6f7a8b'
+down_revision: Union[str, None] = '2b3c4d5e6f7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('priority', sa.Integer(), nullable=False, server_default='0')
+            )
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.drop_column('priority')
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
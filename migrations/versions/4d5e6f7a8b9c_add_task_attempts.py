@@ -0,0 +1,108 @@
+"""add task_attempts and tasks.enqueued_at
+
+``task_attempts`` is an append-only history with one row per task execution
+attempt: enqueue/claim/start/finish timestamps, the worker, the outcome, and
+the LLM usage. ``tasks.enqueued_at`` records when a task last became PENDING so
+each attempt's queue wait can be measured. Existing tasks have no history and
+a NULL ``enqueued_at``.
+
+The batch alter is wrapped in ``PRAGMA foreign_keys = OFF/ON`` per project
+convention (see b2c3d4e5f6a7).
+
+Revision ID: 4d5e6f7a8b9c
+Revises: 3c4d5e6f7a8b
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4d5e6f7a8b9c'
+down_revision: Union[str, None] = '3c4d5e6f7a8b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TASK_TYPES = (
+    'PDF Parsing',
+    'Paper Classifier',
+    'General Paper Question',
+    'Paper Metadata',
+    'Variant Extraction',
+    'Pedigree Description',
+    'Patient Extraction',
+    'Patient Demographics',
+    'Segregation Evidence Extraction',
+    'Segregation Analysis Computed',
+    'Variant Harmonization',
+    'Variant Annotation',
+    'Patient Variant Occurrences',
+    'Compound Het Evaluation',
+    'Phenotype Extraction',
+    'HPO Linking',
+    'MONDO Linking',
+)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('enqueued_at', sa.DateTime(timezone=True), nullable=True)
+            )
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
+
+    op.create_table(
+        'task_attempts',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.Enum(*_TASK_TYPES, name='tasktype'), nullable=False),
+        sa.Column('attempt', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('queued_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            'outcome',
+            sa.Enum(
+                'Completed',
+                'Failed',
+                'Lease Lost',
+                'Lease Expired',
+                name='taskattemptoutcome',
+            ),
+            nullable=True,
+        ),
+        sa.Column('error_message', sa.String(), nullable=True),
+        sa.Column('requests', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('input_tokens', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('cached_tokens', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('output_tokens', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_task_attempts_task_id', 'task_attempts', ['task_id'])
+    op.create_index('ix_task_attempts_type', 'task_attempts', ['type'])
+    op.create_index('ix_task_attempts_finished_at', 'task_attempts', ['finished_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_attempts_finished_at', table_name='task_attempts')
+    op.drop_index('ix_task_attempts_type', table_name='task_attempts')
+    op.drop_index('ix_task_attempts_task_id', table_name='task_attempts')
+    op.drop_table('task_attempts')
+
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('tasks', schema=None) as batch_op:
+            batch_op.drop_column('enqueued_at')
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
@@ -0,0 +1,50 @@
+"""add conversation_items
+
+Locally stored agent conversations (``LLM_CONVERSATION_STORE=local``): one row
+per Responses API input item, keyed by the conversation id recorded on the
+task or chat conversation.
+
+Revision ID: 5e6f7a8b9c0d
+Revises: 4d5e6f7a8b9c
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5e6f7a8b9c0d'
+down_revision: Union[str, None] = '4d5e6f7a8b9c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_items',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('conversation_id', sa.String(), nullable=False),
+        sa.Column('item', sa.JSON(), nullable=False),
+        sa.Column(
+            'created_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('(CURRENT_TIMESTAMP)'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_conversation_items_conversation_id',
+        'conversation_items',
+        ['conversation_id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        'ix_conversation_items_conversation_id', table_name='conversation_items'
+    )
+    op.drop_table('conversation_items')
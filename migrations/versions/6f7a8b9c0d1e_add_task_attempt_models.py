@@ -0,0 +1,47 @@
+"""add task_attempts models and escalations
+
+The models that answered each attempt's agent runs, and how many runs the
+model cascade escalated from the fast model to the main deployment.
+
+Revision ID: 6f7a8b9c0d1e
+Revises: 5e6f7a8b9c0d
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6f7a8b9c0d1e'
+down_revision: Union[str, None] = '5e6f7a8b9c0d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('task_attempts', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('models', sa.String(), nullable=True))
+            batch_op.add_column(
+                sa.Column(
+                    'escalations', sa.Integer(), nullable=False, server_default='0'
+                )
+            )
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text('PRAGMA foreign_keys = OFF'))
+    try:
+        with op.batch_alter_table('task_attempts', schema=None) as batch_op:
+            batch_op.drop_column('escalations')
+            batch_op.drop_column('models')
+    finally:
+        connection.execute(sa.text('PRAGMA foreign_keys = ON'))
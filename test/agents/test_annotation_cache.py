@@ -0,0 +1,83 @@
+import sqlite3
+import time
+
+from lib.agents import annotation_cache
+from lib.agents.annotation_cache import (
+    AnnotationCache,
+    lookup_key,
+    normalize_identifier,
+)
+from lib.bin import invalidate_annotation_cache
+
+
+def _cache(tmp_path, **kwargs) -> AnnotationCache:
+    return AnnotationCache(
+        tmp_path / 'annotations.sqlite3',
+        ttl_s=kwargs.get('ttl_s', {'gnomad': 3600, 'clinvar': 3600, 'vep': 3600}),
+        negative_ttl_s=kwargs.get('negative_ttl_s', 60),
+    )
+
+
+def test_identifiers_are_normalized():
+    assert normalize_identifier(' RS80357906 ') == 'rs80357906'
+    assert normalize_identifier('ca000123') == 'CA000123'
+    assert normalize_identifier('chr17-43045712-t-c') == '17-43045712-T-C'
+    assert normalize_identifier('NM_007294.4:c.68_69del') == 'NM_007294.4:c.68_69del'
+    assert normalize_identifier('CASK') == 'CASK'
+    assert lookup_key('RS1', None, 'c.1A>G') == 'rs1|c.1A>G'
+
+
+def test_entries_expire_by_source_and_not_found_ttl(tmp_path, monkeypatch):
+    cache = _cache(
+        tmp_path, ttl_s={'gnomad': 100, 'clinvar': 10, 'vep': 10}, negative_ttl_s=5
+    )
+    cache.put('gnomad', '1-1-A-G', {'gnomad_top_level_af': 0.1})
+    cache.put('clinvar', 'rs1', {'pathogenicity': 'Benign'})
+    cache.put('vep', 'rs1|BRCA1', {})
+
+    assert cache.get('vep', 'rs1|BRCA1') == {}
+    assert cache.get('vep', 'rs2|BRCA1') is None
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 20)
+    assert cache.get('gnomad', '1-1-A-G') == {'gnomad_top_level_af': 0.1}
+    assert cache.get('clinvar', 'rs1') is None
+    assert cache.get('vep', 'rs1|BRCA1') is None
+    assert cache.purge_expired() == 2
+
+
+def test_invalidation_cli(tmp_path, monkeypatch, capsys):
+    cache = _cache(tmp_path)
+    monkeypatch.setattr(invalidate_annotation_cache, 'annotation_cache', cache)
+    cache.put('clinvar', 'rs1|CA1', {'pathogenicity': 'Benign'})
+    cache.put('vep', 'rs1|BRCA1', {})
+    cache.put('vep', 'rs12|BRCA1', {'revel': 0.2})
+    cache.put('gnomad', '1-1-A-G', {})
+
+    invalidate_annotation_cache.main(['RS1', '--source', 'clinvar'])
+    assert cache.get('clinvar', 'rs1|CA1') is None
+    assert cache.get('vep', 'rs1|BRCA1') == {}
+
+    invalidate_annotation_cache.main(['--not-found-only'])
+    assert cache.get('vep', 'rs1|BRCA1') is None
+    assert cache.get('gnomad', '1-1-A-G') is None
+    assert cache.get('vep', 'rs12|BRCA1') == {'revel': 0.2}
+    assert 'Dropped 2 annotation cache entries.' in capsys.readouterr().out
+
+
+def test_locked_cache_degrades_to_misses_quickly(tmp_path, monkeypatch):
+    monkeypatch.setattr(annotation_cache, 'BUSY_TIMEOUT_S', 0.05)
+    cache = _cache(tmp_path)
+    cache.put('vep', 'rs1|BRCA1', {'revel': 0.2})
+    # Another process holding the write lock.
+    other = sqlite3.connect(cache.path)
+    other.execute('BEGIN EXCLUSIVE')
+
+    start = time.monotonic()
+    cache.put('vep', 'rs2|BRCA1', {'revel': 0.3})
+    assert cache.get('vep', 'rs1|BRCA1') is None
+    assert time.monotonic() - start < 5
+
+    other.rollback()
+    other.close()
+    assert cache.get('vep', 'rs1|BRCA1') == {'revel': 0.2}
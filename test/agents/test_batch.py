@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+from agents import Agent, ModelSettings, function_tool
+from openai.types.shared import Reasoning
+from pydantic import BaseModel
+
+from lib.agents import runner
+from lib.agents.batch import BatchCollector, LocalBatchClient, batch_request_body
+from lib.agents.runner import RunUsage, batch_responses, run_agent, run_usage
+
+
+class Answer(BaseModel):
+    value: int
+
+
+def _agent(**kwargs) -> Agent:
+    return Agent(
+        name='answer_agent',
+        instructions='Answer.',
+        model='gpt-test',
+        output_type=Answer,
+        **kwargs,
+    )
+
+
+@function_tool
+def lookup(term: str) -> str:
+    """Look up a term."""
+    return term
+
+
+def test_only_single_call_agents_are_batchable():
+    body = batch_request_body(_agent(), 'paper text')
+
+    assert body is not None
+    assert body['model'] == 'gpt-test'
+    assert body['instructions'] == 'Answer.'
+    assert body['text']['format']['type'] == 'json_schema'
+    assert 'temperature' not in body
+    assert batch_request_body(_agent(tools=[lookup]), 'paper text') is None
+    dynamic = Agent(
+        name='answer_agent', instructions=lambda ctx, agent: 'Answer.', model='m'
+    )
+    assert batch_request_body(dynamic, 'paper text') is None
+
+
+def test_batch_request_body_carries_model_settings():
+    settings = ModelSettings(
+        temperature=0.0,
+        max_tokens=2000,
+        verbosity='low',
+        reasoning=Reasoning(effort='minimal'),
+        extra_args={'service_tier': 'flex'},
+    )
+
+    body = batch_request_body(_agent(model_settings=settings), 'paper text')
+
+    assert body['temperature'] == 0.0
+    assert body['max_output_tokens'] == 2000
+    assert body['reasoning'] == {'effort': 'minimal'}
+    assert body['text']['verbosity'] == 'low'
+    assert body['text']['format']['type'] == 'json_schema'
+    assert body['service_tier'] == 'flex'
+
+
+def test_run_agent_collects_bulk_runs_into_one_batch(monkeypatch):
+    submitted = []
+
+    async def responder(body):
+        submitted.append(body['input'])
+        return {
+            'id': f'resp_{len(submitted)}',
+            'status': 'completed',
+            'output': [
+                {
+                    'type': 'message',
+                    'content': [
+                        {
+                            'type': 'output_text',
+                            'text': json.dumps({'value': len(body['input'])}),
+                        }
+                    ],
+                }
+            ],
+            'usage': {
+                'input_tokens': 10,
+                'input_tokens_details': {'cached_tokens': 4},
+                'output_tokens': 2,
+                'total_tokens': 12,
+            },
+        }
+
+    client = LocalBatchClient(responder)
+    monkeypatch.setattr(
+        runner,
+        'batch_collector',
+        BatchCollector(
+            lambda: client, max_requests=3, collect_window_s=60, poll_interval_s=0
+        ),
+    )
+
+    async def fail_run(*args, **kwargs):
+        raise AssertionError('batched runs must not call the model directly')
+
+    monkeypatch.setattr(runner.Runner, 'run', fail_run)
+
+    async def _run_all() -> tuple[list[int], RunUsage]:
+        usage = RunUsage()
+        run_usage.set(usage)
+        batch_responses.set(True)
+        results = await asyncio.gather(
+            *(run_agent(_agent(), 'x' * n, max_turns=3) for n in (1, 2, 3))
+        )
+        return [r.final_output.value for r in results], usage
+
+    values, usage = asyncio.run(_run_all())
+
+    # Reaching max_requests submits the job without waiting out the window.
+    assert values == [1, 2, 3]
+    assert sorted(submitted) == ['x', 'xx', 'xxx']
+    assert len(client._batches) == 1
+    assert (usage.requests, usage.input_tokens, usage.cached_tokens) == (3, 30, 12)
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from lib.agents import conversations, runner
+from lib.agents.conversations import (
+    append_to_conversation,
+    conversation_items,
+    create_conversation,
+)
+from lib.agents.runner import AdaptiveLimiter, run_agent
+from lib.tasks.prompts import build_followup_prompt
+
+
+@pytest.fixture
+def local_store(db_session, monkeypatch):
+    monkeypatch.setattr(conversations.env, 'LLM_CONVERSATION_STORE', 'local')
+    monkeypatch.setattr(
+        runner, 'llm_limiter', AdaptiveLimiter(initial=4, minimum=1, maximum=8)
+    )
+
+
+def _message(role, content):
+    return {'type': 'message', 'role': role, 'content': content}
+
+
+def test_followups_replay_local_history(monkeypatch, local_store):
+    inputs = []
+
+    async def fake_run(agent, input, **kwargs):
+        assert 'conversation_id' not in kwargs
+        inputs.append(input)
+        answer = _message('assistant', f'answer {len(inputs)}')
+        return SimpleNamespace(
+            raw_responses=[],
+            final_output=answer['content'],
+            to_input_list=lambda: [*input, answer],
+        )
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    agent = SimpleNamespace(name='test_agent')
+
+    async def _run() -> str:
+        conversation_id = await create_conversation()
+        await run_agent(agent, 'paper', conversation_id=conversation_id)
+        await run_agent(
+            agent,
+            build_followup_prompt('Patient II-1 is affected.'),
+            conversation_id=conversation_id,
+        )
+        return conversation_id
+
+    conversation_id = asyncio.run(_run())
+
+    assert conversation_id.startswith('local_')
+    followup = inputs[1]
+    assert [item['content'] for item in followup[:2]] == ['paper', 'answer 1']
+    assert 'Patient II-1 is affected.' in followup[2]['content']
+    assert len(conversation_items(conversation_id)) == 4
+
+
+def test_replayed_items_go_to_the_conversations_store(local_store):
+    async def _run() -> str:
+        conversation_id = await create_conversation()
+        await append_to_conversation(
+            conversation_id, [_message('user', 'q'), _message('assistant', 'a')]
+        )
+        return conversation_id
+
+    conversation_id = asyncio.run(_run())
+
+    assert conversation_items(conversation_id) == [
+        _message('user', 'q'),
+        _message('assistant', 'a'),
+    ]
+    assert conversation_items('local_other') == []
+
+
+def test_helpers_share_one_client_per_event_loop():
+    async def _clients():
+        return conversations._client(), conversations._client()
+
+    first, second = asyncio.run(_clients())
+    other, _ = asyncio.run(_clients())
+
+    assert first is second
+    assert other is not first
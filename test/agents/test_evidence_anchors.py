@@ -0,0 +1,172 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from agents import Agent
+from pydantic import BaseModel, ValidationError
+
+from lib.agents import evidence_anchors
+from lib.agents.evidence_anchors import (
+    EVIDENCE_ANCHOR_INSTRUCTIONS,
+    compact_agent,
+    compact_output_type,
+    expand_evidence,
+    run_evidence_agent,
+)
+from lib.misc.pdf.passages import anchor_index, render_passages, split_passages
+from lib.misc.pdf.paths import pdf_markdown_path
+from lib.models.evidence_block import AnchoredEvidenceBlock, EvidenceBlock
+
+PAPER_MD = """## Results
+
+Patient 1 presented at 32. She carried c.68_69del. Her sister was unaffected.
+
+| Patient | Age |
+|---------|-----|
+| P1 | 32 |
+"""
+
+
+class Demographics(BaseModel):
+    identifier: str
+    age: EvidenceBlock[int | None]
+    notes: list[EvidenceBlock[str]] = []
+
+
+class Plain(BaseModel):
+    value: int
+
+
+def _anchored(**kwargs) -> AnchoredEvidenceBlock:
+    return AnchoredEvidenceBlock(reasoning='stated', **kwargs)
+
+
+def test_sentences_and_table_rows_get_stable_anchors():
+    passages = split_passages(PAPER_MD, supplement=False)
+    anchors = anchor_index(passages)
+
+    assert anchors['p1.1'].text == 'She carried c.68_69del.'
+    assert anchors['p2'].text == '| P1 | 32 |'
+    rendered = render_passages(passages, anchored=True)
+    assert '[p1.0] Patient 1 presented at 32. [p1.1] She carried' in rendered
+    assert '|---------|-----|\n[p2] | P1 | 32 |' in rendered
+    assert anchor_index(split_passages(PAPER_MD, supplement=False)).keys() == (
+        anchors.keys()
+    )
+
+
+def test_compact_output_type_swaps_evidence_blocks():
+    compact = compact_output_type(list[Demographics])
+    model = compact.__args__[0]
+
+    assert model.model_fields['age'].annotation == AnchoredEvidenceBlock[int | None]
+    assert model.model_fields['notes'].annotation == list[AnchoredEvidenceBlock[str]]
+    assert compact_output_type(list[Demographics]) == compact
+    assert compact_output_type(Plain) is Plain
+
+
+def test_expand_evidence_reconstructs_quotes():
+    anchors = anchor_index(split_passages(PAPER_MD, supplement=True))
+    model = compact_output_type(Demographics)
+    output = model(
+        identifier='Patient 1',
+        age=_anchored(value=32, anchors=['p1.0'], start=0, end=9),
+        notes=[
+            _anchored(value='carrier', anchors=['p1.1', 'p1.2']),
+            _anchored(value='table', anchors=['p2'], table_id=0),
+        ],
+    )
+
+    expanded = expand_evidence(output, Demographics, anchors)
+
+    assert isinstance(expanded, Demographics)
+    assert expanded.age.quote == 'Patient 1'
+    assert expanded.age.is_supplement
+    assert expanded.notes[0].quote == (
+        'She carried c.68_69del. Her sister was unaffected.'
+    )
+    assert expanded.notes[1].quote == '| P1 | 32 |'
+    assert expanded.notes[1].table_id == 0
+
+
+def test_expand_evidence_degrades_on_unknown_anchors():
+    anchors = anchor_index(split_passages(PAPER_MD, supplement=False))
+    model = compact_output_type(Demographics)
+    output = model(
+        identifier='P1',
+        age=_anchored(value=32, anchors=['p99.0', 'p2.0']),
+        notes=[_anchored(value='carrier', anchors=['p1', 'p1.7'])],
+    )
+
+    expanded = expand_evidence(output, Demographics, anchors)
+
+    # A table row cited as a sentence still resolves, and fills in table_id.
+    assert expanded.age.quote == '| P1 | 32 |'
+    assert expanded.age.table_id == 0
+    # A paragraph cited whole resolves to its sentences.
+    assert expanded.notes[0].quote.startswith('Patient 1 presented at 32.')
+    assert expanded.notes[0].table_id is None
+
+    # Evidence left with no source at all is still rejected.
+    unsupported = model(identifier='P1', age=_anchored(value=32, anchors=['p99.0']))
+    with pytest.raises(ValidationError):
+        expand_evidence(unsupported, Demographics, anchors)
+
+
+def test_run_evidence_agent_in_compact_mode(monkeypatch, mocked_root_dir):
+    markdown = pdf_markdown_path(1)
+    markdown.parent.mkdir(parents=True, exist_ok=True)
+    markdown.write_text(PAPER_MD)
+    agent = Agent(
+        name='demographics', instructions='Extract.', output_type=Demographics
+    )
+    calls = []
+
+    async def fake_run_agent(agent, input, **kwargs):
+        calls.append(agent)
+        return SimpleNamespace(
+            final_output=agent.output_type(
+                identifier='P1', age=_anchored(value=32, anchors=['p1.0'])
+            )
+        )
+
+    monkeypatch.setattr(evidence_anchors, 'run_agent', fake_run_agent)
+    monkeypatch.setattr(evidence_anchors.env, 'COMPACT_EVIDENCE', True)
+
+    result = asyncio.run(run_evidence_agent(agent, 'paper', 1))
+
+    assert calls == [compact_agent(agent)]
+    assert EVIDENCE_ANCHOR_INSTRUCTIONS in calls[0].instructions
+    assert result.final_output.age.quote == 'Patient 1 presented at 32.'
+    assert not result.final_output.age.is_supplement
+
+
+def test_run_evidence_agent_reruns_unsourced_output_with_quotes(
+    monkeypatch, mocked_root_dir
+):
+    markdown = pdf_markdown_path(1)
+    markdown.parent.mkdir(parents=True, exist_ok=True)
+    markdown.write_text(PAPER_MD)
+    agent = Agent(
+        name='demographics', instructions='Extract.', output_type=Demographics
+    )
+    calls = []
+
+    async def fake_run_agent(agent, input, **kwargs):
+        calls.append((agent, kwargs))
+        if agent.output_type is Demographics:
+            age = EvidenceBlock(value=32, reasoning='stated', quote='at 32')
+        else:
+            age = _anchored(value=32, anchors=['p99.0'])
+        return SimpleNamespace(final_output=agent.output_type(identifier='P1', age=age))
+
+    monkeypatch.setattr(evidence_anchors, 'run_agent', fake_run_agent)
+    monkeypatch.setattr(evidence_anchors.env, 'COMPACT_EVIDENCE', True)
+
+    result = asyncio.run(
+        run_evidence_agent(agent, 'paper', 1, conversation_id='conv_1')
+    )
+
+    assert [a for a, _ in calls] == [compact_agent(agent), agent]
+    assert calls[1][1] == {'conversation_id': 'conv_1'}
+    assert result.final_output.age.quote == 'at 32'
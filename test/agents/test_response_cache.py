@@ -0,0 +1,54 @@
+from agents import Agent
+from pydantic import BaseModel
+
+from lib.agents.response_cache import (
+    ResponseCache,
+    dump_output,
+    load_output,
+    response_cache_key,
+)
+
+
+class Answer(BaseModel):
+    value: int
+
+
+def _agent(**kwargs) -> Agent:
+    return Agent(
+        name='answer_agent', instructions='Answer.', output_type=Answer, **kwargs
+    )
+
+
+def test_key_covers_input_instructions_and_schema():
+    base = response_cache_key(_agent(), 'paper text')
+
+    assert response_cache_key(_agent(), 'paper text') == base
+    assert response_cache_key(_agent(), 'other paper') != base
+    assert response_cache_key(_agent(model='gpt-other'), 'paper text') != base
+    changed = Agent(
+        name='answer_agent', instructions='Answer briefly.', output_type=Answer
+    )
+    assert response_cache_key(changed, 'paper text') != base
+    # Dynamic instructions are not captured by the key, so never cached.
+    dynamic = Agent(name='answer_agent', instructions=lambda ctx, agent: 'Answer.')
+    assert response_cache_key(dynamic, 'paper text') is None
+
+
+def test_output_round_trips_through_json():
+    agent = _agent()
+    assert load_output(agent, dump_output(agent, Answer(value=3))) == Answer(value=3)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / 'responses.sqlite3', max_bytes=10)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    assert cache.get('a') == 'xxxx'  # 'b' is now least recently used
+
+    cache.put('c', 'xxxx')
+
+    assert cache.get('a') == 'xxxx'
+    assert cache.get('b') is None
+    assert cache.get('c') == 'xxxx'
+    cache.put('huge', 'x' * 11)
+    assert cache.get('huge') is None
@@ -0,0 +1,404 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from agents import Agent, ModelSettings, RunConfig
+from agents.exceptions import ModelBehaviorError
+from pydantic import BaseModel
+
+from lib.agents import runner
+from lib.agents.response_cache import ResponseCache
+from lib.agents.runner import (
+    AdaptiveLimiter,
+    RunUsage,
+    cache_responses,
+    cascade_model,
+    low_confidence,
+    prompt_cache_key,
+    run_agent,
+    run_usage,
+)
+
+
+def _rate_limit_error() -> openai.RateLimitError:
+    request = httpx.Request('POST', 'https://api.openai.com/v1/responses')
+    response = httpx.Response(429, request=request, headers={'retry-after': '0'})
+    return openai.RateLimitError('Rate limit reached', response=response, body=None)
+
+
+def _result(input_tokens: int, output_tokens: int) -> SimpleNamespace:
+    usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens)
+    return SimpleNamespace(raw_responses=[SimpleNamespace(usage=usage)])
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8)
+    monkeypatch.setattr(runner, 'llm_limiter', limiter)
+    monkeypatch.setattr(runner, 'BACKOFF_BASE_S', 0.0)
+    return limiter
+
+
+def test_limiter_increases_on_success_and_halves_on_throttle():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=5)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.snapshot().limit == 5
+
+    limiter.on_throttled()
+    snapshot = limiter.snapshot()
+    assert snapshot.limit == 2.5
+    assert snapshot.consecutive_failures == 1
+    assert snapshot.backoff_remaining_s > 0
+
+
+def test_limiter_blocks_past_concurrency_limit():
+    async def _run() -> list[int]:
+        limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+        order = []
+
+        async def worker(i: int) -> None:
+            await limiter.acquire()
+            order.append(i)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        await asyncio.gather(worker(1), worker(2))
+        assert limiter.snapshot().in_flight == 0
+        return order
+
+    assert asyncio.run(_run()) == [1, 2]
+
+
+def test_limiter_charges_usage_to_budget_windows():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=2, tokens_per_minute=100)
+    reservation = asyncio.run(limiter.acquire(tokens=20))
+    limiter.release(requests=1, tokens=150, reservation=reservation)
+
+    snapshot = limiter.snapshot()
+    assert snapshot.requests_last_minute == 1
+    assert snapshot.tokens_last_minute == 150
+    # Token budget exhausted: new runs wait for the window to roll over.
+    assert limiter._admission_delay(time.monotonic()) > 50
+
+
+def test_limiter_reserves_budget_for_runs_in_flight():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=4, tokens_per_minute=100)
+
+    async def _run() -> None:
+        await limiter.acquire(tokens=60)
+        await limiter.acquire(tokens=60)
+        # The two estimates use up the budget before either run finishes.
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(limiter.acquire(tokens=60), 0.05)
+
+    asyncio.run(_run())
+    snapshot = limiter.snapshot()
+    assert (snapshot.in_flight, snapshot.tokens_last_minute) == (2, 120)
+
+
+def test_run_agent_retries_rate_limits(monkeypatch, limiter):
+    calls = []
+
+    async def fake_run(agent, input, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise _rate_limit_error()
+        return _result(10, 5)
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    agent = SimpleNamespace(name='test_agent')
+
+    result = asyncio.run(run_agent(agent, 'hi', max_turns=3))
+
+    assert result.raw_responses
+    assert calls == [{'max_turns': 3}, {'max_turns': 3}]
+    snapshot = limiter.snapshot()
+    assert snapshot.in_flight == 0
+    assert snapshot.tokens_last_minute == 15
+    assert snapshot.limit < 4
+
+
+def test_run_agent_adds_usage_to_task_accumulator(monkeypatch, limiter):
+    async def fake_run(agent, input, **kwargs):
+        return _result(10, 5)
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    agent = SimpleNamespace(name='test_agent')
+
+    async def _run() -> RunUsage:
+        usage = RunUsage()
+        run_usage.set(usage)
+        # Concurrent runs in child tasks share the accumulator.
+        await asyncio.gather(run_agent(agent, 'a'), run_agent(agent, 'b'))
+        return usage
+
+    assert asyncio.run(_run()) == RunUsage(
+        requests=2, input_tokens=20, cached_tokens=0, output_tokens=10
+    )
+
+
+def test_run_agent_gives_up_after_max_retries(monkeypatch, limiter):
+    async def fake_run(agent, input, **kwargs):
+        raise _rate_limit_error()
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    monkeypatch.setattr(runner.env, 'LLM_MAX_THROTTLE_RETRIES', 1)
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run_agent(SimpleNamespace(name='test_agent'), 'hi'))
+    assert limiter.snapshot().in_flight == 0
+
+
+def test_limiter_admits_higher_priority_waiters_first():
+    async def _run() -> list[str]:
+        limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+        await limiter.acquire()
+        order = []
+
+        async def waiter(name: str, priority: int) -> None:
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        tasks = [
+            asyncio.create_task(waiter('bulk', 0)),
+            asyncio.create_task(waiter('interactive', 10)),
+        ]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(_run()) == ['interactive', 'bulk']
+
+
+class _Output(BaseModel):
+    value: int
+
+
+def test_run_agent_serves_repeat_runs_from_cache(monkeypatch, limiter, tmp_path):
+    calls, replayed = [], []
+
+    async def fake_run(agent, input, **kwargs):
+        calls.append(input)
+        result = _result(10, 5)
+        result.final_output = _Output(value=len(calls))
+        return result
+
+    async def fake_replay(conversation_id, input, raw_output):
+        replayed.append((conversation_id, input, raw_output))
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    monkeypatch.setattr(runner, 'replay_into_conversation', fake_replay)
+    monkeypatch.setattr(
+        runner, 'response_cache', ResponseCache(tmp_path / 'cache.sqlite3', 10_000)
+    )
+    agent = Agent(name='test_agent', instructions='Extract.', output_type=_Output)
+
+    async def _run(cached: bool, input: str) -> _Output:
+        cache_responses.set(cached)
+        result = await run_agent(agent, input, conversation_id='conv_1')
+        return result.final_output
+
+    assert asyncio.run(_run(True, 'paper')) == _Output(value=1)
+    assert asyncio.run(_run(True, 'paper')) == _Output(value=1)
+    assert replayed == [('conv_1', 'paper', '{"value":1}')]
+    # Different input, or caching disabled (e.g. a follow-up), calls the model.
+    assert asyncio.run(_run(True, 'other paper')) == _Output(value=2)
+    assert asyncio.run(_run(False, 'paper')) == _Output(value=3)
+    assert calls == ['paper', 'other paper', 'paper']
+
+
+def test_run_agent_routes_paper_runs_to_one_prompt_cache(monkeypatch, limiter):
+    configs = []
+
+    async def fake_run(agent, input, **kwargs):
+        configs.append(kwargs.get('run_config'))
+        return _result(10, 5)
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    agent = SimpleNamespace(name='test_agent')
+
+    async def _run() -> None:
+        await run_agent(agent, 'a')
+        prompt_cache_key.set('paper-7')
+        await run_agent(agent, 'b')
+        await run_agent(
+            agent,
+            'c',
+            run_config=RunConfig(
+                model_settings=ModelSettings(temperature=0, extra_args={'x': 1})
+            ),
+        )
+
+    asyncio.run(_run())
+
+    assert configs[0] is None
+    assert configs[1].model_settings.extra_args == {'prompt_cache_key': 'paper-7'}
+    # A caller's own settings are kept alongside the key.
+    assert configs[2].model_settings.temperature == 0
+    assert configs[2].model_settings.extra_args == {
+        'x': 1,
+        'prompt_cache_key': 'paper-7',
+    }
+
+
+class _Decision(BaseModel):
+    term: str | None
+    confidence: str | None
+
+
+def test_run_agent_cascade_escalates_on_low_confidence_or_invalid_output(
+    monkeypatch, limiter
+):
+    answers = {
+        'obvious': _Decision(term='Seizure', confidence='high'),
+        'unrated': _Decision(term='Ataxia', confidence=None),
+        'vague': _Decision(term=None, confidence='Low'),
+    }
+    calls = []
+    replayed = []
+
+    async def fake_run(agent, input, **kwargs):
+        calls.append((agent.model, input, kwargs.get('conversation_id')))
+        if agent.model == 'fast' and input == 'garbled':
+            raise ModelBehaviorError('Invalid JSON')
+        result = _result(10, 5)
+        result.final_output = (
+            answers.get(input)
+            if agent.model == 'fast'
+            else _Decision(term='X', confidence='high')
+        )
+        return result
+
+    async def fake_replay(conversation_id, input, raw_output):
+        replayed.append((conversation_id, input))
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    monkeypatch.setattr(runner, 'replay_into_conversation', fake_replay)
+    agent = Agent(name='linker', model='main', output_type=_Decision)
+
+    async def _run(input: str) -> tuple[_Decision, RunUsage]:
+        usage = RunUsage()
+        run_usage.set(usage)
+        cascade_model.set('fast')
+        result = await run_agent(agent, input, conversation_id='conv_1')
+        return result.final_output, usage
+
+    output, usage = asyncio.run(_run('obvious'))
+    assert output.term == 'Seizure'
+    assert (usage.models, usage.escalations) == (['fast'], 0)
+    # The fast run is kept out of the conversation until it is accepted.
+    assert calls == [('fast', 'obvious', None)]
+    assert replayed == [('conv_1', 'obvious')]
+
+    # Only an explicit 'low' escalates; a missing confidence is accepted.
+    calls.clear()
+    output, usage = asyncio.run(_run('unrated'))
+    assert output.term == 'Ataxia'
+    assert usage.escalations == 0
+
+    # A failed fast run answered nothing, so only the main model is recorded.
+    for input, models in (('vague', ['fast', 'main']), ('garbled', ['main'])):
+        calls.clear()
+        output, usage = asyncio.run(_run(input))
+        assert output.term == 'X'
+        assert (usage.models, usage.escalations) == (models, 1)
+        assert calls == [('fast', input, None), ('main', input, 'conv_1')]
+    assert len(replayed) == 2
+
+
+def test_low_confidence_reads_only_the_top_level_field():
+    class _Nested(BaseModel):
+        decisions: list[_Decision]
+
+    assert low_confidence(_Decision(term='X', confidence='low'))
+    assert not low_confidence(_Decision(term='X', confidence='uncertain'))
+    assert not low_confidence(
+        _Nested(decisions=[_Decision(term='X', confidence='low')])
+    )
+    assert not low_confidence([_Decision(term='X', confidence='low')])
+
+
+def test_run_agent_does_not_cache_fast_model_answers(monkeypatch, limiter, tmp_path):
+    calls = []
+
+    async def fake_run(agent, input, **kwargs):
+        calls.append(agent.model)
+        result = _result(10, 5)
+        confidence = 'low' if input == 'hard' else 'high'
+        result.final_output = _Decision(term=agent.model, confidence=confidence)
+        return result
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    monkeypatch.setattr(
+        runner, 'response_cache', ResponseCache(tmp_path / 'cache.sqlite3', 10_000)
+    )
+    agent = Agent(name='linker', model='main', output_type=_Decision)
+
+    async def _run(input: str) -> str | None:
+        cache_responses.set(True)
+        cascade_model.set('fast')
+        return (await run_agent(agent, input)).final_output.term
+
+    assert asyncio.run(_run('easy')) == 'fast'
+    assert asyncio.run(_run('easy')) == 'fast'
+    # An escalated answer comes from the agent's own model and is cached.
+    assert asyncio.run(_run('hard')) == 'main'
+    assert asyncio.run(_run('hard')) == 'main'
+    assert calls == ['fast', 'fast', 'fast', 'main']
+
+
+def test_throttled_retry_rolls_back_the_conversation(monkeypatch, limiter):
+    calls, deleted = [], []
+
+    async def fake_run(agent, input, hooks, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            response = SimpleNamespace(
+                output=[SimpleNamespace(id='fc_1'), SimpleNamespace(id='msg_2')]
+            )
+            await hooks.on_llm_end(None, agent, response)
+            raise _rate_limit_error()
+        return _result(10, 5)
+
+    async def fake_delete(conversation_id, first_item_id, preceding=0):
+        deleted.append((conversation_id, first_item_id, preceding))
+        return 3
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    monkeypatch.setattr(runner, 'delete_conversation_items_from', fake_delete)
+    agent = SimpleNamespace(name='test_agent')
+
+    asyncio.run(run_agent(agent, 'hi', conversation_id='conv_1'))
+
+    # The failed attempt's input message and outputs are dropped before the retry.
+    assert calls == [{'conversation_id': 'conv_1'}] * 2
+    assert deleted == [('conv_1', 'fc_1', 1)]
+
+
+def test_throttled_before_any_response_skips_the_rollback(monkeypatch, limiter):
+    calls, deleted = [], []
+
+    async def fake_run(agent, input, hooks, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise _rate_limit_error()
+        return _result(10, 5)
+
+    async def fake_delete(conversation_id, first_item_id, preceding=0):
+        deleted.append(conversation_id)
+        return 0
+
+    monkeypatch.setattr(runner.Runner, 'run', fake_run)
+    monkeypatch.setattr(runner, 'delete_conversation_items_from', fake_delete)
+    agent = SimpleNamespace(name='test_agent')
+
+    asyncio.run(run_agent(agent, 'hi', conversation_id='conv_1'))
+
+    assert len(calls) == 2
+    assert deleted == []
@@ -0,0 +1,327 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from lib.agents import variant_annotation_agent
+from lib.agents.annotation_cache import AnnotationCache
+from lib.agents.variant_annotation_agent import enrich_variants_batch
+from lib.core import http_client
+from lib.core.environment import env
+from lib.models.variant import HarmonizedVariant
+
+GNOMAD_PAYLOAD = {
+    'data': {
+        'variant': {
+            'variantId': '1-100-A-G',
+            'joint': {
+                'ac': 2,
+                'an': 10000,
+                'populations': [{'id': 'nfe', 'ac': 2, 'an': 4000}],
+            },
+        }
+    }
+}
+VEP_PAYLOAD = [
+    {
+        'transcript_consequences': [
+            {
+                'gene_symbol': 'BRCA1',
+                'mane_select': 'NM_007294.4',
+                'impact': 'MODERATE',
+                'exon': '5/23',
+                'revel': 0.8,
+            }
+        ]
+    }
+]
+CLINVAR_SEARCH = {'esearchresult': {'idlist': ['12345']}}
+CLINVAR_SUMMARY = {
+    'result': {
+        'uids': ['12345'],
+        '12345': {
+            'germline_classification': {
+                'description': 'Pathogenic',
+                'review_status': 'reviewed by expert panel',
+            },
+            'supporting_submissions': {'scv': ['SCV1', 'SCV2']},
+        },
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    async def _no_wait(host):
+        pass
+
+    monkeypatch.setattr(http_client, 'wait_for_host', _no_wait)
+    monkeypatch.setattr(http_client, 'BACKOFF_FACTOR_S', 0.0)
+    # One request per lookup unless a test opts into batching.
+    monkeypatch.setattr(env, 'ANNOTATION_BATCH_COLLECT_S', 0.0)
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch, tmp_path):
+    cache = AnnotationCache(
+        tmp_path / 'annotations.sqlite3',
+        ttl_s={'gnomad': 3600, 'clinvar': 3600, 'vep': 3600},
+        negative_ttl_s=60,
+    )
+    monkeypatch.setattr(variant_annotation_agent, 'annotation_cache', cache)
+    return cache
+
+
+def _client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _annotate(handler, variants):
+    async def _run():
+        async with _client(handler) as client:
+            return await enrich_variants_batch(variants, 'BRCA1', client)
+
+    return asyncio.run(_run())
+
+
+def _batch(monkeypatch, name: str, send, max_items: int) -> None:
+    monkeypatch.setattr(
+        variant_annotation_agent.env, 'ANNOTATION_BATCH_COLLECT_S', 0.05
+    )
+    batcher = variant_annotation_agent.LookupBatcher(name, send, max_items, 0.05)
+    monkeypatch.setattr(variant_annotation_agent, name, batcher)
+
+
+def _variant(n: int) -> HarmonizedVariant:
+    return HarmonizedVariant(
+        gnomad_style_coordinates=f'1-{n}-A-G', rsid=f'rs{n}', hgvs_c=f'c.{n}A>G'
+    )
+
+
+def test_lookups_run_concurrently_across_variants():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if request.url.host == 'gnomad.broadinstitute.org':
+            return httpx.Response(200, json=GNOMAD_PAYLOAD)
+        if request.url.host == 'rest.ensembl.org':
+            return httpx.Response(200, json=VEP_PAYLOAD)
+        if request.url.path.endswith('esearch.fcgi'):
+            return httpx.Response(200, json=CLINVAR_SEARCH)
+        return httpx.Response(200, json=CLINVAR_SUMMARY)
+
+    results = _annotate(handler, [_variant(n) for n in range(1, 6)])
+
+    assert len(results) == 5
+    # Three sources for each of five variants, all in flight together.
+    assert peak == 15
+    first = results[0]
+    assert first.gnomad_style_coordinates == '1-1-A-G'
+    assert first.gnomad_top_level_af == 2 / 10000
+    assert first.gnomad_popmax_population == 'nfe'
+    assert first.pathogenicity == 'Pathogenic'
+    assert first.stars == 3
+    assert first.submissions == 2
+    assert first.exon == '5/23'
+    assert first.revel == 0.8
+
+
+def test_failed_source_is_skipped_and_retries_are_bounded():
+    calls: dict[str, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls[request.url.host] = calls.get(request.url.host, 0) + 1
+        if request.url.host == 'rest.ensembl.org':
+            return httpx.Response(503)
+        if request.url.host == 'gnomad.broadinstitute.org':
+            raise httpx.ConnectError('unreachable', request=request)
+        body = (
+            CLINVAR_SEARCH
+            if request.url.path.endswith('esearch.fcgi')
+            else CLINVAR_SUMMARY
+        )
+        return httpx.Response(200, content=json.dumps(body))
+
+    [result] = _annotate(handler, [_variant(1)])
+
+    assert result.pathogenicity == 'Pathogenic'
+    assert result.revel is None
+    assert result.gnomad_top_level_af is None
+    assert calls['rest.ensembl.org'] == env.HTTP_MAX_RETRIES + 1
+    assert calls['gnomad.broadinstitute.org'] == env.HTTP_MAX_RETRIES + 1
+
+
+def test_throttled_request_is_retried_after_retry_after():
+    responses = iter(
+        [
+            httpx.Response(429, headers={'retry-after': '0'}),
+            httpx.Response(200, json=VEP_PAYLOAD),
+        ]
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return next(responses)
+
+    [result] = _annotate(handler, [HarmonizedVariant(hgvs_c='c.1A>G')])
+
+    assert result.revel == 0.8
+
+
+def test_reannotating_a_known_variant_hits_no_network(cache):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if request.url.host == 'gnomad.broadinstitute.org':
+            return httpx.Response(
+                200,
+                json={
+                    'errors': [{'message': 'Variant not found'}],
+                    'data': {'variant': None},
+                },
+            )
+        if request.url.host == 'rest.ensembl.org':
+            return httpx.Response(200, json=VEP_PAYLOAD)
+        if request.url.path.endswith('esearch.fcgi'):
+            return httpx.Response(200, json=CLINVAR_SEARCH)
+        return httpx.Response(503)
+
+    [first] = _annotate(handler, [_variant(1)])
+    requests_made = len(calls)
+    # Same variant spelled differently: rsIDs and coordinates are normalized.
+    variant = HarmonizedVariant(
+        gnomad_style_coordinates='chr1-1-a-g', rsid='RS1', hgvs_c='c.1A>G'
+    )
+    [second] = _annotate(handler, [variant])
+
+    # ClinVar failed (esummary 503) so it is retried; gnomAD's "not found"
+    # and VEP's answer are served from the cache.
+    assert calls[requests_made:] == ['eutils.ncbi.nlm.nih.gov'] * (
+        1 + env.HTTP_MAX_RETRIES + 1
+    )
+    assert cache.get('gnomad', '1-1-A-G') == {}
+    assert second.revel == first.revel == 0.8
+    assert second.gnomad_style_coordinates == 'chr1-1-a-g'
+    assert second.rsid == 'RS1'
+
+
+def test_vep_lookups_are_batched_and_demultiplexed(monkeypatch):
+    _batch(monkeypatch, 'vep_batcher', variant_annotation_agent._post_vep, 3)
+    posts: list[list[str]] = []
+    gets: list[str] = []
+
+    def entry(notation: str, revel: float) -> dict:
+        consequence = {**VEP_PAYLOAD[0]['transcript_consequences'][0], 'revel': revel}
+        return {'input': notation, 'transcript_consequences': [consequence]}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host != 'rest.ensembl.org':
+            return httpx.Response(200, json={})
+        if request.method == 'POST':
+            notations = json.loads(request.content)['hgvs_notations']
+            posts.append(notations)
+            # VEP leaves out notations it cannot parse.
+            return httpx.Response(
+                200,
+                json=[
+                    entry(n, int(n[2]) / 10)
+                    for n in reversed(notations)
+                    if n != 'c.4A>G'
+                ],
+            )
+        gets.append(request.url.path)
+        return httpx.Response(200, json=[entry('c.4A>G', 0.4)])
+
+    variants = [HarmonizedVariant(hgvs_c=f'c.{n}A>G') for n in range(1, 6)]
+    results = _annotate(handler, variants)
+
+    assert sorted(len(p) for p in posts) == [2, 3]
+    assert gets == ['/vep/human/hgvs/c.4A>G']
+    assert [r.revel for r in results] == [0.1, 0.2, 0.3, 0.4, 0.5]
+
+
+def test_gnomad_lookups_are_batched_with_per_variant_fallback(monkeypatch):
+    _batch(
+        monkeypatch, 'gnomad_batcher', variant_annotation_agent._query_gnomad_batch, 10
+    )
+    queries: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host != 'gnomad.broadinstitute.org':
+            return httpx.Response(200, json={})
+        body = json.loads(request.content)
+        queries.append(body['variables'])
+        if 'variantId' in body['variables']:
+            # Per-variant fallback for the variant the batch could not resolve.
+            return httpx.Response(200, json=GNOMAD_PAYLOAD)
+        joint = GNOMAD_PAYLOAD['data']['variant']
+        return httpx.Response(
+            200,
+            json={
+                'data': {'v0': joint, 'v1': None, 'v2': None},
+                'errors': [
+                    {'message': 'Variant not found', 'path': ['v1']},
+                    {'message': 'Internal server error', 'path': ['v2']},
+                ],
+            },
+        )
+
+    variants = [
+        HarmonizedVariant(gnomad_style_coordinates=f'1-{n}-A-G') for n in range(1, 4)
+    ]
+    results = _annotate(handler, variants)
+
+    assert queries == [
+        {'v0': '1-1-A-G', 'v1': '1-2-A-G', 'v2': '1-3-A-G'},
+        {'variantId': '1-3-A-G'},
+    ]
+    assert results[0].gnomad_top_level_af == 2 / 10000
+    assert results[1].gnomad_top_level_af is None
+    assert results[2].gnomad_top_level_af == 2 / 10000
+
+
+def test_clinvar_summaries_are_batched_by_uid(monkeypatch):
+    _batch(
+        monkeypatch,
+        'clinvar_summary_batcher',
+        variant_annotation_agent._fetch_clinvar_summaries,
+        10,
+    )
+    summaries: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith('esearch.fcgi'):
+            uid = request.url.params['term'].removeprefix('rs')
+            return httpx.Response(200, json={'esearchresult': {'idlist': [uid, '9']}})
+        if request.url.path.endswith('esummary.fcgi'):
+            summaries.append(request.url.params['id'])
+            record = CLINVAR_SUMMARY['result']['12345']
+            return httpx.Response(
+                200,
+                json={
+                    'result': {
+                        'uids': ['1', '2'],
+                        '1': record,
+                        '2': {
+                            **record,
+                            'germline_classification': {'description': 'Benign'},
+                        },
+                    }
+                },
+            )
+        return httpx.Response(200, json={})
+
+    variants = [HarmonizedVariant(rsid=f'rs{n}') for n in (1, 2)]
+    results = _annotate(handler, variants)
+
+    # One ESummary for both variants' most relevant records.
+    assert summaries == ['1,2']
+    assert [r.pathogenicity for r in results] == ['Pathogenic', 'Benign']
+    assert results[0].stars == 3
@@ -26,7 +26,7 @@ from lib.models import (
     VariantDB,
 )
 from lib.tasks import TaskCreateRequest
-from lib.tasks.models import TaskStatus, TaskType
+from lib.tasks.models import TaskPriority, TaskStatus, TaskType
 
 
 @pytest.fixture
@@ -1245,6 +1245,7 @@ def test_create_task_records_updated_by(client, seeded_paper, test_user):
     tasks = response.json()
     assert len(tasks) == 1
     assert tasks[0]['updated_by_user_id'] == test_user.id
+    assert tasks[0]['priority'] == TaskPriority.INTERACTIVE
     assert tasks[0]['updated_by'] == {
         'id': test_user.id,
         'email': 'tester@example.com',
@@ -1403,6 +1404,35 @@ def test_paper_metadata_successor_enqueues_mondo_linking(
         .one()
     )
     assert mondo_task.status == TaskStatus.PENDING
+    assert mondo_task.priority == TaskPriority.BULK
+
+
+def test_successors_inherit_interactive_priority(db_session, seeded_paper, agent_run):
+    from lib.tasks.misc import enqueue_successors
+
+    task = TaskDB(
+        paper_id=seeded_paper.id,
+        agent_run_id=agent_run.id,
+        type=TaskType.PAPER_CLASSIFIER,
+        status=TaskStatus.COMPLETED,
+        priority=TaskPriority.INTERACTIVE,
+    )
+    db_session.add(task)
+    db_session.flush()
+
+    enqueue_successors(db_session, task)
+
+    successors = (
+        db_session.query(TaskDB)
+        .filter(TaskDB.paper_id == seeded_paper.id, TaskDB.id != task.id)
+        .all()
+    )
+    assert {t.type for t in successors} == {
+        TaskType.PAPER_METADATA,
+        TaskType.VARIANT_EXTRACTION,
+        TaskType.PEDIGREE_DESCRIPTION,
+    }
+    assert all(t.priority == TaskPriority.INTERACTIVE for t in successors)
 
 
 def test_patient_variant_occurrence_successor_enqueues_paper_and_occurrence_mondo(
@@ -1635,3 +1665,114 @@ def test_update_segregation_evidence_records_attribution(
         ).status_code
         == 404
     )
+
+
+def test_task_stats_endpoint(client):
+    response = client.get('/tasks/stats', params={'window_hours': 2})
+    assert response.status_code == 200
+    data = response.json()
+    assert data['types'] == []
+    assert data['since'] < data['until']
+
+    assert client.get('/tasks/stats', params={'window_hours': 0}).status_code == 422
+
+
+def test_phenotype_extraction_enqueues_one_batched_hpo_linking_task(
+    db_session, seeded_paper, seeded_agent_run
+):
+    from lib.tasks.misc import enqueue_successors
+
+    family = db_session.query(FamilyDB).filter_by(paper_id=seeded_paper.id).first()
+    patient = PatientDB(
+        paper_id=seeded_paper.id,
+        family_id=family.id,
+        agent_run_id=seeded_agent_run.id,
+        identifier='P1',
+        **_patient_required_fields('P1'),
+    )
+    db_session.add(patient)
+    db_session.flush()
+    for concept in ('seizure', 'ataxia', 'hypotonia'):
+        db_session.add(
+            PhenotypeDB(
+                paper_id=seeded_paper.id,
+                patient_id=patient.id,
+                concept=concept,
+                concept_evidence={'value': concept, 'reasoning': 'stated'},
+            )
+        )
+    task = TaskDB(
+        paper_id=seeded_paper.id,
+        agent_run_id=seeded_agent_run.id,
+        type=TaskType.PHENOTYPE_EXTRACTION,
+        patient_id=patient.id,
+        status=TaskStatus.COMPLETED,
+    )
+    db_session.add(task)
+    db_session.flush()
+
+    enqueue_successors(db_session, task)
+
+    (hpo_task,) = (
+        db_session.query(TaskDB).filter(TaskDB.type == TaskType.HPO_LINKING).all()
+    )
+    assert hpo_task.patient_id == patient.id
+    assert hpo_task.phenotype_id is None
+
+
+def test_batched_demographics_fan_out_skips_handed_off_patients(
+    db_session, seeded_paper, seeded_agent_run
+):
+    from lib.tasks.misc import enqueue_successors
+
+    family = db_session.query(FamilyDB).filter_by(paper_id=seeded_paper.id).first()
+    patients = []
+    for identifier in ('P1', 'P2', 'P3'):
+        patient = PatientDB(
+            paper_id=seeded_paper.id,
+            family_id=family.id,
+            agent_run_id=seeded_agent_run.id,
+            identifier=identifier,
+            **_patient_required_fields(identifier),
+        )
+        db_session.add(patient)
+        patients.append(patient)
+    extraction = TaskDB(
+        paper_id=seeded_paper.id,
+        agent_run_id=seeded_agent_run.id,
+        type=TaskType.PATIENT_EXTRACTION,
+        status=TaskStatus.COMPLETED,
+    )
+    db_session.add(extraction)
+    db_session.flush()
+
+    enqueue_successors(db_session, extraction)
+    (batch,) = (
+        db_session.query(TaskDB)
+        .filter(TaskDB.type == TaskType.PATIENT_DEMOGRAPHICS)
+        .all()
+    )
+    assert batch.patient_id is None
+
+    # The batch handed P3 off to its own task, which is still pending.
+    db_session.add(
+        TaskDB(
+            paper_id=seeded_paper.id,
+            agent_run_id=seeded_agent_run.id,
+            type=TaskType.PATIENT_DEMOGRAPHICS,
+            patient_id=patients[2].id,
+        )
+    )
+    batch.status = TaskStatus.COMPLETED
+    db_session.flush()
+    enqueue_successors(db_session, batch)
+
+    phenotype_tasks = (
+        db_session.query(TaskDB)
+        .filter(TaskDB.type == TaskType.PHENOTYPE_EXTRACTION)
+        .all()
+    )
+    assert {t.patient_id for t in phenotype_tasks} == {
+        patients[0].id,
+        patients[1].id,
+    }
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from lib.core import http_client
+from lib.core.http_client import (
+    HttpStats,
+    async_client,
+    async_request,
+    http_session,
+    in_thread,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setattr(http_client, '_session', None)
+    monkeypatch.setattr(http_client, 'http_stats', HttpStats())
+    monkeypatch.setattr(http_client, 'BACKOFF_FACTOR_S', 0.0)
+
+
+@pytest.fixture
+def server():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        connections: set[tuple[str, int]] = set()
+
+        statuses: list[int] = []
+
+        def do_GET(self):
+            Handler.connections.add(self.client_address)
+            body = b'{"ok": true}'
+            self.send_response(Handler.statuses.pop(0) if Handler.statuses else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}', Handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_session_is_shared_and_keeps_connections_alive(server):
+    url, handler = server
+
+    def fetch():
+        return http_session().get(f'{url}/x').json()
+
+    assert fetch() == {'ok': True}
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    fetch()
+
+    assert http_session() is http_session()
+    # Six calls over at most one connection per concurrent caller.
+    assert len(handler.connections) <= 4
+    [stats] = http_client.http_stats.snapshot()
+    assert (stats.host, stats.requests, stats.errors) == ('127.0.0.1', 6, 0)
+
+
+def test_async_client_is_shared_within_an_event_loop():
+    async def clients():
+        return async_client(), async_client()
+
+    first, second = asyncio.run(clients())
+    other, _ = asyncio.run(clients())
+
+    assert first is second
+    assert other is not first
+
+
+def test_async_request_retries_and_counts(monkeypatch):
+    async def _no_wait(host):
+        pass
+
+    monkeypatch.setattr(http_client, 'wait_for_host', _no_wait)
+    statuses = iter([503, 429, 200, 404])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as c:
+            ok = await async_request(c, 'GET', 'https://rest.ensembl.org/a')
+            with pytest.raises(httpx.HTTPStatusError):
+                await async_request(c, 'GET', 'https://rest.ensembl.org/b')
+            return ok
+
+    assert asyncio.run(run()).status_code == 200
+    [stats] = http_client.http_stats.snapshot()
+    assert stats.host == 'rest.ensembl.org'
+    assert (stats.requests, stats.retries, stats.errors) == (2, 2, 1)
+
+
+def test_session_retries_wait_for_the_rate_limit(server, monkeypatch):
+    url, handler = server
+    handler.statuses = [503, 429]
+    waits: list[str] = []
+    monkeypatch.setattr(http_client, 'wait_for_host_blocking', waits.append)
+
+    assert http_session().get(f'{url}/x').json() == {'ok': True}
+
+    assert waits == ['127.0.0.1'] * 3
+    [stats] = http_client.http_stats.snapshot()
+    assert (stats.requests, stats.retries, stats.errors) == (1, 2, 0)
+
+
+def test_in_thread_runs_blocking_tools_off_the_event_loop():
+    def lookup(query: str) -> str:
+        """Look something up."""
+        return threading.current_thread().name
+
+    wrapped = in_thread(lookup)
+
+    async def run():
+        return threading.current_thread().name, await wrapped('x')
+
+    loop_thread, tool_thread = asyncio.run(run())
+    assert asyncio.iscoroutinefunction(wrapped)
+    assert tool_thread != loop_thread
+    assert wrapped.__doc__ == lookup.__doc__
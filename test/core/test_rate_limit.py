@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from lib.core import rate_limit
+from lib.core.rate_limit import NCBI_HOST, TokenBucket, host_bucket
+
+
+def test_bucket_spaces_requests_at_rate():
+    bucket = TokenBucket(rate=100.0)
+
+    async def _run() -> float:
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(6)))
+        return time.monotonic() - start
+
+    # The first request is immediate, the other five wait 10 ms apart.
+    assert asyncio.run(_run()) >= 0.045
+
+
+def test_bucket_admits_burst_without_waiting():
+    bucket = TokenBucket(rate=1.0, burst=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() > 0.9
+
+
+def test_ncbi_limit_depends_on_api_key(monkeypatch):
+    monkeypatch.setattr(rate_limit, '_buckets', {})
+    monkeypatch.setattr(rate_limit.env, 'NCBI_API_KEY', None)
+    assert host_bucket(NCBI_HOST).rate == 3.0
+
+    monkeypatch.setattr(rate_limit, '_buckets', {})
+    monkeypatch.setattr(rate_limit.env, 'NCBI_API_KEY', 'key')
+    assert host_bucket(NCBI_HOST).rate == 10.0
+    assert host_bucket('example.org') is None
+
+
+def test_limits_are_split_across_worker_processes(monkeypatch):
+    monkeypatch.setattr(rate_limit, '_buckets', {})
+    monkeypatch.setattr(rate_limit.env, 'NCBI_API_KEY', 'key')
+    monkeypatch.setattr(rate_limit.env, 'WORKER_PROCESSES', 4)
+
+    assert host_bucket(NCBI_HOST).rate == 2.5
@@ -0,0 +1,101 @@
+from lib.misc.pdf.passages import (
+    CHARS_PER_TOKEN,
+    identifier_aliases,
+    load_passages,
+    render_passages,
+    select_passages,
+    split_passages,
+)
+from lib.misc.pdf.paths import pdf_markdown_path, pdf_passages_path
+from lib.tasks.prompts import build_entity_context
+
+PAPER_MD = """# A BRCA1 case series
+
+## Methods
+
+Sequencing was performed on all samples.
+
+## Results
+
+Patient 1 presented with early-onset breast cancer at 32.
+
+P2 was diagnosed at 45 and is the sister of patient 1.
+
+| Patient | Age | Variant |
+|---------|-----|---------|
+| P1 | 32 | c.68_69del |
+| P2 | 45 | c.68_69del |
+| P3 | 51 | c.5266dup |
+
+## References
+
+1. Patient 1 in an unrelated cohort.
+"""
+
+
+def test_split_passages_keeps_table_header_with_rows():
+    passages = split_passages(PAPER_MD, supplement=False)
+
+    rows = [p for p in passages if p.kind == 'table_row']
+    assert [r.text.split('|')[1].strip() for r in rows] == ['P1', 'P2', 'P3']
+    assert rows[0].table_header.startswith('| Patient | Age')
+    assert [p.id for p in passages] == list(range(len(passages)))
+
+
+def test_aliases_cover_common_spellings():
+    assert {'P3', 'Case 3', 'Pt. 3'} <= identifier_aliases('Patient 3')
+    assert {'II:1', 'II.1', 'II-1'} <= identifier_aliases('II-1')
+    assert {'F2', 'Family 2'} <= identifier_aliases('Family 2')
+    assert identifier_aliases('3') == set()
+
+
+def test_select_passages_by_alias_within_budget_and_relevant_sections():
+    passages = split_passages(PAPER_MD, supplement=False)
+    classifications = {
+        'sections': [
+            {'header': 'Results', 'relevant': True},
+            {'header': 'References', 'relevant': False},
+        ]
+    }
+
+    selected = select_passages(passages, ['Patient 1'], 1000, classifications)
+    text = render_passages(selected)
+
+    assert 'early-onset breast cancer' in text
+    assert 'sister of patient 1' in text
+    assert '| P1 | 32 |' in text and '| Patient | Age' in text
+    assert 'P3' not in text
+    assert 'unrelated cohort' not in text
+    assert text.startswith('## Results')
+    # A tight budget keeps the best-matching passages; no match means fallback.
+    assert len(select_passages(passages, ['Patient 1'], 20)) < len(selected)
+    assert select_passages(passages, ['Patient 9'], 1000) is None
+
+
+def test_select_passages_budget_counts_headings_and_table_headers():
+    passages = split_passages(PAPER_MD, supplement=False)
+    for max_tokens in (12, 20, 40, 60, 1000):
+        selected = select_passages(passages, ['Patient 1'], max_tokens)
+        if selected is not None:
+            rendered = render_passages(selected)
+            assert len(rendered) // CHARS_PER_TOKEN <= max_tokens
+
+    # Matches that do not fit the budget select nothing: fall back.
+    oversized = split_passages('# R\n\nPatient 3 ' + 'x' * 40000, False)
+    assert select_passages(oversized, ['Patient 3'], 8000) is None
+
+
+def test_entity_context_falls_back_to_full_text(mocked_root_dir):
+    path = pdf_markdown_path(1)
+    path.parent.mkdir(parents=True)
+    path.write_text(PAPER_MD)
+
+    excerpt = build_entity_context(1, None, None, ['Patient 2'])
+    fallback = build_entity_context(1, None, None, ['Patient 9'])
+
+    assert pdf_passages_path(1).exists()
+    assert len(load_passages(1)) > 0
+    assert excerpt.startswith('PAPER EXCERPTS')
+    assert 'Patient 2' in excerpt and 'Methods' not in excerpt
+    assert fallback.startswith('PAPER AND GENE CONTEXT')
+    assert 'Sequencing was performed' in fallback
@@ -3,7 +3,13 @@ from collections import defaultdict
 import hpotk
 import pytest
 
-from lib.reference_data.hpo import find_matching_hpo_terms
+from lib.models import HpoCandidate
+from lib.reference_data.hpo import (
+    AUTO_LINK_REASONING_PREFIX,
+    auto_link_hpo_term,
+    build_exact_index,
+    find_matching_hpo_terms,
+)
 
 
 @pytest.fixture
@@ -130,3 +136,41 @@ def test_find_matching_hpo_terms_synonym_match(
     assert len(result) > 0
     # Should match with high score due to being in lookup
     assert result[0].similarity_score >= 95
+
+
+def test_auto_link_requires_a_unique_exact_or_clearly_best_match(
+    mock_term_lookup: defaultdict[str, list[hpotk.model._term_id.DefaultTermId]],
+) -> None:
+    mock_term_lookup['fits'] = [
+        hpotk.TermId.from_curie('HP:0000005'),
+        hpotk.TermId.from_curie('HP:0000006'),
+    ]
+    index = build_exact_index(mock_term_lookup)
+    names = {'HP:0000003': 'Intellectual disability', 'HP:0000005': 'Seizure'}
+
+    def link(concept: str, min_similarity: float = 100.0):
+        candidates = find_matching_hpo_terms(concept, term_lookup=mock_term_lookup)
+        return auto_link_hpo_term(
+            concept, candidates, index, min_similarity, term_name=names.get
+        )
+
+    exact = link('Intellectual-Disability ')
+    assert exact is not None
+    assert (exact.value.id, exact.value.name) == (
+        'HP:0000003',
+        'Intellectual disability',
+    )
+    assert exact.reasoning.startswith(AUTO_LINK_REASONING_PREFIX)
+    # Ambiguous exact matches and weak fuzzy matches are left to the agent.
+    assert link('fits') is None
+    assert link('seizure episodes') is None
+    fuzzy = link('seizure episodes', min_similarity=50.0)
+    assert fuzzy is not None and fuzzy.value.id == 'HP:0000005'
+
+
+def test_auto_link_skips_tied_fuzzy_candidates() -> None:
+    candidates = [
+        HpoCandidate(id='HP:0000001', name='a b', similarity_score=90.0),
+        HpoCandidate(id='HP:0000002', name='b a', similarity_score=90.0),
+    ]
+    assert auto_link_hpo_term('a b c', candidates, {}, 80.0, term_name=str) is None
@@ -0,0 +1,45 @@
+from lib.misc.pdf.paths import pdf_markdown_path
+from lib.tasks import prompts
+from lib.tasks.prompts import (
+    build_fulltext_context,
+    build_paper_context,
+    build_paper_prompt,
+)
+
+
+def test_paper_prompts_share_the_paper_prefix():
+    context = 'PAPER AND GENE CONTEXT\n\nPaper (fulltext md):\n# Title'
+
+    first = build_paper_prompt(context, {'Patient JSON': '{"id": 1}'}, 'Extract.')
+    second = build_paper_prompt(
+        context, {'Gene': 'BRCA1', 'Variants JSON': '[]'}, 'Link.'
+    )
+
+    assert first == f'{context}\n\nPatient JSON:\n{{"id": 1}}\n\nExtract.'
+    assert second.startswith(f'{context}\n\nGene:\nBRCA1\n\n')
+    assert second.endswith('\n\nLink.')
+
+
+def test_compact_evidence_paper_context_is_anchored(monkeypatch, mocked_root_dir):
+    markdown = pdf_markdown_path(1)
+    markdown.parent.mkdir(parents=True, exist_ok=True)
+    markdown.write_text('## Results\n\nPatient 1 was 32. She was affected.\n')
+    monkeypatch.setattr(prompts.env, 'COMPACT_EVIDENCE', True)
+
+    context = build_paper_context(1)
+
+    assert context.endswith(
+        '## Results\n\n[p1.0] Patient 1 was 32. [p1.1] She was affected.'
+    )
+
+
+def test_fulltext_context_is_the_unfiltered_paper(monkeypatch, mocked_root_dir):
+    markdown = pdf_markdown_path(1)
+    markdown.parent.mkdir(parents=True, exist_ok=True)
+    markdown.write_text('## Methods\n\nSequencing.\n\n## Results\n\nPatient 1.\n')
+    monkeypatch.setattr(prompts.env, 'COMPACT_EVIDENCE', True)
+
+    context = build_fulltext_context(1)
+
+    assert context.endswith('## Methods\n\nSequencing.\n\n## Results\n\nPatient 1.\n')
+    assert '[p1.0]' not in context
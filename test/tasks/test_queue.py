@@ -0,0 +1,296 @@
+import datetime
+
+import pytest
+
+from lib.agents.runner import RunUsage
+from lib.models import GeneDB, PaperDB
+from lib.tasks import enqueue_task
+from lib.tasks.misc import CRITICAL_PATH_SCORES
+from lib.tasks.models import (
+    TaskAttemptDB,
+    TaskAttemptOutcome,
+    TaskDB,
+    TaskPriority,
+    TaskStatus,
+    TaskType,
+)
+from lib.tasks.queue import (
+    claim_tasks,
+    finish_attempt,
+    recover_expired_leases,
+    release_task,
+    renew_leases,
+    start_task,
+)
+
+
+def _minutes_ago(minutes):
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        minutes=minutes
+    )
+
+
+@pytest.fixture
+def paper(db_session, agent_run):
+    gene = GeneDB(symbol='BRCA1')
+    db_session.add(gene)
+    db_session.flush()
+    paper = PaperDB(content_hash='abc123', gene_id=gene.id, filename='test.pdf')
+    db_session.add(paper)
+    db_session.flush()
+    return paper
+
+
+def test_claim_respects_per_type_and_total_limits(db_session, paper):
+    enqueue_task(db_session, paper.id, TaskType.PDF_PARSING)
+    enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    enqueue_task(db_session, paper.id, TaskType.PATIENT_EXTRACTION)
+    enqueue_task(db_session, paper.id, TaskType.VARIANT_EXTRACTION)
+
+    claims = claim_tasks(
+        db_session,
+        'host:1',
+        {
+            TaskType.PDF_PARSING: 0,
+            TaskType.PAPER_METADATA: 1,
+            TaskType.PATIENT_EXTRACTION: 1,
+            TaskType.VARIANT_EXTRACTION: 1,
+        },
+        limit=2,
+    )
+
+    assert len(claims) == 2
+    assert TaskType.PDF_PARSING not in {c.type for c in claims}
+    for claim in claims:
+        task = db_session.get(TaskDB, claim.id)
+        db_session.refresh(task)
+        assert task.status == TaskStatus.QUEUED
+        assert task.worker_id == 'host:1'
+        assert task.lease_owner == claim.lease_owner
+
+
+def test_claimed_tasks_are_not_claimed_twice(db_session, paper):
+    enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    capacity = {TaskType.PAPER_METADATA: 5}
+
+    first = claim_tasks(db_session, 'host:1', capacity, limit=5)
+    second = claim_tasks(db_session, 'host:2', capacity, limit=5)
+
+    assert len(first) == 1
+    assert second == []
+
+
+def test_release_is_rejected_after_lease_recovery(db_session, paper):
+    enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    (claim,) = claim_tasks(db_session, 'host:1', {TaskType.PAPER_METADATA: 1}, limit=1)
+    assert start_task(db_session, claim.id, claim.lease_owner) is not None
+
+    # Let the heartbeat go stale and have another worker recover the lease.
+    task = db_session.get(TaskDB, claim.id)
+    task.heartbeat_at = _minutes_ago(2)
+    db_session.flush()
+    recover_expired_leases(db_session, lease_timeout_s=60, max_retries=2)
+
+    assert (
+        release_task(db_session, claim.id, claim.lease_owner, TaskStatus.COMPLETED)
+        is None
+    )
+    db_session.refresh(task)
+    assert task.status == TaskStatus.PENDING
+    assert task.lease_owner is None
+
+
+def test_release_records_outcome_and_clears_lease(db_session, paper):
+    enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    (claim,) = claim_tasks(db_session, 'host:1', {TaskType.PAPER_METADATA: 1}, limit=1)
+    start_task(db_session, claim.id, claim.lease_owner)
+
+    task = release_task(
+        db_session, claim.id, claim.lease_owner, TaskStatus.FAILED, 'boom'
+    )
+
+    assert task is not None
+    db_session.refresh(task)
+    assert task.status == TaskStatus.FAILED
+    assert task.error_message == 'boom'
+    assert task.tries == 1
+    assert task.lease_owner is None
+
+
+def test_live_heartbeat_keeps_long_running_task(db_session, paper):
+    enqueue_task(db_session, paper.id, TaskType.PDF_PARSING)
+    (claim,) = claim_tasks(db_session, 'host:1', {TaskType.PDF_PARSING: 1}, limit=1)
+    start_task(db_session, claim.id, claim.lease_owner)
+    task = db_session.get(TaskDB, claim.id)
+    task.updated_at = _minutes_ago(45)
+    task.heartbeat_at = _minutes_ago(2)
+    db_session.flush()
+
+    assert renew_leases(db_session, {claim.lease_owner, 'someone-else'}) == {claim.id}
+    assert recover_expired_leases(db_session, lease_timeout_s=60, max_retries=2) == 0
+
+    db_session.refresh(task)
+    assert task.status == TaskStatus.RUNNING
+    assert task.lease_owner == claim.lease_owner
+
+
+def test_interactive_lane_is_claimed_first(db_session, paper):
+    bulk = enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    interactive = enqueue_task(
+        db_session,
+        paper.id,
+        TaskType.VARIANT_EXTRACTION,
+        priority=TaskPriority.INTERACTIVE,
+    )
+    capacity = {TaskType.PAPER_METADATA: 1, TaskType.VARIANT_EXTRACTION: 1}
+
+    assert [c.id for c in claim_tasks(db_session, 'host:1', capacity, limit=1)] == [
+        interactive.id
+    ]
+    assert (
+        claim_tasks(
+            db_session, 'host:1', capacity, limit=1, lane=TaskPriority.INTERACTIVE
+        )
+        == []
+    )
+    (claim,) = claim_tasks(
+        db_session, 'host:1', capacity, limit=1, lane=TaskPriority.BULK
+    )
+    assert claim.id == bulk.id
+    assert claim.priority == TaskPriority.BULK
+
+
+def _add_paper(db_session, gene_id, content_hash):
+    paper = PaperDB(
+        content_hash=content_hash, gene_id=gene_id, filename=f'{content_hash}.pdf'
+    )
+    db_session.add(paper)
+    db_session.flush()
+    return paper
+
+
+def _enqueue_bulk(db_session, paper, n):
+    # The dedup index treats NULL entity ids as distinct, so plain rows stand in
+    # for a per-entity fan-out without seeding the entities themselves.
+    tasks = [
+        TaskDB(paper_id=paper.id, agent_run_id=1, type=TaskType.PATIENT_DEMOGRAPHICS)
+        for _ in range(n)
+    ]
+    db_session.add_all(tasks)
+    db_session.flush()
+    return tasks
+
+
+def test_claim_round_robins_across_papers(db_session, paper):
+    small = _add_paper(db_session, paper.gene_id, 'small')
+    big_tasks = _enqueue_bulk(db_session, paper, 4)
+    small_tasks = _enqueue_bulk(db_session, small, 2)
+
+    claims = claim_tasks(
+        db_session, 'host:1', {TaskType.PATIENT_DEMOGRAPHICS: 3}, limit=3
+    )
+
+    # Without round-robin the big paper's first three tasks would all win.
+    assert {c.id for c in claims} == {
+        big_tasks[0].id,
+        small_tasks[0].id,
+        big_tasks[1].id,
+    }
+
+
+def test_claim_respects_per_paper_cap(db_session, paper):
+    small = _add_paper(db_session, paper.gene_id, 'small')
+    big_tasks = _enqueue_bulk(db_session, paper, 4)
+    small_tasks = _enqueue_bulk(db_session, small, 1)
+    capacity = {TaskType.PATIENT_DEMOGRAPHICS: 10}
+
+    first = claim_tasks(db_session, 'host:1', capacity, limit=10, paper_cap=2)
+    second = claim_tasks(db_session, 'host:2', capacity, limit=10, paper_cap=2)
+
+    assert {c.id for c in first} == {
+        big_tasks[0].id,
+        big_tasks[1].id,
+        small_tasks[0].id,
+    }
+    assert second == []
+
+
+def test_blocking_tasks_are_claimed_before_leaves(db_session, paper):
+    leaf = enqueue_task(db_session, paper.id, TaskType.MONDO_LINKING)
+    blocking = enqueue_task(db_session, paper.id, TaskType.PATIENT_EXTRACTION)
+    capacity = {TaskType.MONDO_LINKING: 1, TaskType.PATIENT_EXTRACTION: 1}
+
+    (claim,) = claim_tasks(db_session, 'host:1', capacity, limit=1)
+
+    assert claim.id == blocking.id
+    assert CRITICAL_PATH_SCORES[TaskType.PATIENT_EXTRACTION] > 0
+    assert CRITICAL_PATH_SCORES[TaskType.MONDO_LINKING] == 0
+    db_session.refresh(leaf)
+    assert leaf.status == TaskStatus.PENDING
+
+
+def test_attempt_records_timeline_worker_and_usage(db_session, paper):
+    task = enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    (claim,) = claim_tasks(db_session, 'host:1', {TaskType.PAPER_METADATA: 1}, limit=1)
+
+    attempt = start_task(db_session, claim.id, claim.lease_owner, claim.claimed_at)
+    release_task(db_session, claim.id, claim.lease_owner, TaskStatus.COMPLETED)
+    finish_attempt(
+        db_session,
+        attempt.id,
+        TaskAttemptOutcome.COMPLETED,
+        usage=RunUsage(
+            requests=2,
+            input_tokens=100,
+            cached_tokens=40,
+            output_tokens=7,
+            models=['gpt-fast', 'gpt-main'],
+            escalations=1,
+        ),
+    )
+
+    db_session.refresh(attempt)
+    assert attempt.task_id == task.id
+    assert attempt.type == TaskType.PAPER_METADATA
+    assert attempt.attempt == 1
+    assert attempt.worker_id == 'host:1'
+    assert (
+        attempt.queued_at
+        <= attempt.claimed_at
+        <= attempt.started_at
+        <= attempt.finished_at
+    )
+    assert attempt.outcome == TaskAttemptOutcome.COMPLETED
+    assert (attempt.requests, attempt.cached_tokens) == (2, 40)
+    assert (attempt.models, attempt.escalations) == ('gpt-fast,gpt-main', 1)
+
+
+def test_lease_recovery_closes_open_attempt(db_session, paper):
+    enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    (claim,) = claim_tasks(db_session, 'host:1', {TaskType.PAPER_METADATA: 1}, limit=1)
+    attempt = start_task(db_session, claim.id, claim.lease_owner)
+    task = db_session.get(TaskDB, claim.id)
+    task.heartbeat_at = _minutes_ago(2)
+    db_session.flush()
+
+    recover_expired_leases(db_session, lease_timeout_s=60, max_retries=2)
+    # The original worker finishes late: its outcome must not overwrite the
+    # expiry, but its usage is still recorded.
+    finish_attempt(
+        db_session,
+        attempt.id,
+        TaskAttemptOutcome.LEASE_LOST,
+        usage=RunUsage(requests=1, input_tokens=10),
+    )
+
+    db_session.refresh(attempt)
+    assert attempt.outcome == TaskAttemptOutcome.LEASE_EXPIRED
+    assert attempt.finished_at is not None
+    assert attempt.requests == 1
+
+    # The retry appends a second attempt instead of rewriting the first.
+    (retry,) = claim_tasks(db_session, 'host:2', {TaskType.PAPER_METADATA: 1}, limit=1)
+    second = start_task(db_session, retry.id, retry.lease_owner)
+    assert second.attempt == 2
+    assert second.worker_id == 'host:2'
+    assert db_session.query(TaskAttemptDB).count() == 2
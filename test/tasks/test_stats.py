@@ -0,0 +1,142 @@
+import datetime
+
+from lib.models import FamilyDB, GeneDB, PaperDB, PatientDB
+from lib.models.phenotype import HpoDB, PhenotypeDB
+from lib.reference_data.hpo import AUTO_LINK_REASONING_PREFIX
+from lib.tasks.models import TaskAttemptDB, TaskAttemptOutcome, TaskDB, TaskType
+from lib.tasks.stats import hpo_auto_link_stats, percentile, task_type_stats
+
+NOW = datetime.datetime(2026, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+def _at(seconds):
+    return NOW + datetime.timedelta(seconds=seconds)
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 21)]
+    assert percentile(values, 50) == 10
+    assert percentile(values, 95) == 19
+    assert percentile([3.0], 95) == 3
+    assert percentile([], 50) is None
+
+
+def test_task_type_stats_summarises_finished_attempts(db_session, agent_run):
+    gene = GeneDB(symbol='BRCA1')
+    db_session.add(gene)
+    db_session.flush()
+    paper = PaperDB(content_hash='abc123', gene_id=gene.id, filename='test.pdf')
+    db_session.add(paper)
+    db_session.flush()
+    task = TaskDB(
+        paper_id=paper.id, agent_run_id=agent_run.id, type=TaskType.HPO_LINKING
+    )
+    db_session.add(task)
+    db_session.flush()
+
+    def attempt(n, queued, started, finished, outcome, tokens=0, cached=0):
+        return TaskAttemptDB(
+            task_id=task.id,
+            type=TaskType.HPO_LINKING,
+            attempt=n,
+            queued_at=_at(queued),
+            started_at=_at(started),
+            finished_at=_at(finished) if finished is not None else None,
+            outcome=outcome,
+            input_tokens=tokens,
+            cached_tokens=cached,
+        )
+
+    db_session.add_all(
+        [
+            attempt(1, 0, 10, 40, TaskAttemptOutcome.FAILED, tokens=100, cached=60),
+            attempt(2, 70, 72, 82, TaskAttemptOutcome.COMPLETED, tokens=50),
+            # Still running, and finished before the window: both excluded.
+            attempt(3, 100, 101, None, None),
+            attempt(1, -7200, -7100, -7000, TaskAttemptOutcome.COMPLETED),
+        ]
+    )
+    db_session.flush()
+
+    stats = task_type_stats(db_session, _at(-3600), _at(3600))
+
+    (hpo,) = stats.types
+    assert hpo.type == TaskType.HPO_LINKING
+    assert (hpo.attempts, hpo.completed, hpo.failed, hpo.retries) == (2, 1, 1, 1)
+    assert hpo.throughput_per_hour == 0.5
+    assert (hpo.queue_wait_p50_s, hpo.queue_wait_p95_s) == (2, 10)
+    assert (hpo.run_time_p50_s, hpo.run_time_p95_s) == (10, 30)
+    assert (hpo.latency_p50_s, hpo.latency_p95_s) == (12, 40)
+    assert hpo.input_tokens == 150
+    assert hpo.cached_input_ratio == 0.4
+
+
+def _evidence(value):
+    return dict(value=value, reasoning='test evidence', quote='test context')
+
+
+def test_hpo_auto_link_rate_leaves_out_unmapped_phenotypes(db_session, agent_run):
+    gene = GeneDB(symbol='BRCA1')
+    db_session.add(gene)
+    db_session.flush()
+    paper = PaperDB(content_hash='abc123', gene_id=gene.id, filename='test.pdf')
+    db_session.add(paper)
+    db_session.flush()
+    family = FamilyDB(
+        paper_id=paper.id,
+        agent_run_id=agent_run.id,
+        identifier='Family 1',
+        identifier_evidence=_evidence('Family 1'),
+        consanguinity=False,
+        consanguinity_evidence=_evidence(False),
+    )
+    db_session.add(family)
+    db_session.flush()
+    unknown = ('proband_status', 'sex', 'country_of_origin', 'race', 'ethnicity')
+    patient = PatientDB(
+        paper_id=paper.id,
+        family_id=family.id,
+        agent_run_id=agent_run.id,
+        identifier='P1',
+        identifier_evidence=_evidence('P1'),
+        affected_status='Unknown',
+        affected_status_evidence=_evidence('Unknown'),
+        family_assignment_evidence=_evidence('Family 1'),
+        **{field: 'Unknown' for field in unknown},
+        **{f'{field}_evidence': _evidence('Unknown') for field in unknown},
+        **{
+            f'age_{age}_evidence': _evidence(None)
+            for age in ('diagnosis', 'report', 'death')
+        },
+    )
+    db_session.add(patient)
+    db_session.flush()
+
+    def link(hpo_id, reasoning, **flags):
+        phenotype = PhenotypeDB(
+            paper_id=paper.id,
+            patient_id=patient.id,
+            concept='Seizure',
+            concept_evidence=_evidence('Seizure'),
+            **flags,
+        )
+        db_session.add(phenotype)
+        db_session.flush()
+        db_session.add(
+            HpoDB(
+                phenotype_id=phenotype.id,
+                hpo_id=hpo_id,
+                reasoning=reasoning,
+                updated_at=_at(0),
+            )
+        )
+
+    link('HP:0001250', f'{AUTO_LINK_REASONING_PREFIX}: exact match')
+    link('HP:0001250', 'agent picked it')
+    link(None, 'not mapped', negated=True)
+    link(None, 'not mapped', family_history=True)
+    db_session.flush()
+
+    stats = hpo_auto_link_stats(db_session, _at(-3600), _at(3600))
+
+    assert (stats.phenotypes, stats.auto_linked, stats.hit_rate) == (2, 1, 0.5)
@@ -0,0 +1,53 @@
+import asyncio
+import socket
+
+from lib.models import GeneDB, PaperDB
+from lib.tasks import enqueue_task
+from lib.tasks.models import TaskType
+from lib.tasks.wakeup import listen_for_wakeups, notify_workers, wakeup_socket_path
+
+
+def test_listener_is_woken_by_notify(mocked_root_dir):
+    async def _run() -> bool:
+        wakeup = asyncio.Event()
+        sock = listen_for_wakeups(wakeup)
+        try:
+            notify_workers()
+            await asyncio.wait_for(wakeup.wait(), timeout=2)
+            return wakeup.is_set()
+        finally:
+            asyncio.get_running_loop().remove_reader(sock.fileno())
+            sock.close()
+            wakeup_socket_path().unlink(missing_ok=True)
+
+    assert asyncio.run(_run())
+
+
+def test_notify_removes_stale_socket(mocked_root_dir):
+    stale = wakeup_socket_path(pid=999999)
+    stale.parent.mkdir(parents=True, exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(str(stale))
+    sock.close()  # bound path remains but nobody is listening
+
+    notify_workers()
+
+    assert not stale.exists()
+
+
+def test_enqueue_notifies_only_after_commit(db_session, agent_run, monkeypatch):
+    calls = []
+    monkeypatch.setattr('lib.tasks.wakeup.notify_workers', lambda: calls.append(1))
+    gene = GeneDB(symbol='BRCA1')
+    db_session.add(gene)
+    db_session.flush()
+    paper = PaperDB(content_hash='abc123', gene_id=gene.id, filename='test.pdf')
+    db_session.add(paper)
+    db_session.flush()
+
+    enqueue_task(db_session, paper.id, TaskType.PDF_PARSING)
+    enqueue_task(db_session, paper.id, TaskType.PAPER_METADATA)
+    assert calls == []
+
+    db_session.commit()
+    assert calls == [1]